@@ -0,0 +1,100 @@
+"""
+Encode and decode throughput of BYTES tensors in open_inference.grpc.bytes_codec, against packing the length prefix of
+each element in a Python loop, and against the typed bytes_contents field of InferTensorContents, which
+open_inference.grpc.codec uses for messages of only BYTES tensors. Decoding bytes_contents includes parsing the
+serialized field, which is where protobuf builds its elements.
+
+    python benchmarks/bench_bytes_codec.py [--repeat N] [--elements N]
+"""
+
+import argparse
+import os
+import pathlib
+import random
+import string
+import struct
+import sys
+import timeit
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "generated"))
+
+import numpy as np  # noqa: E402
+
+from open_inference.grpc.bytes_codec import bytes_elements, decode_bytes_tensor, encode_bytes_tensor  # noqa: E402
+from open_inference.grpc.protocol import InferTensorContents  # noqa: E402
+
+_LENGTH_PREFIX = struct.Struct("<I")
+
+
+def loop_encode(values: np.ndarray) -> bytes:
+    items = [item.encode("utf-8") if isinstance(item, str) else bytes(item) for item in values.ravel().tolist()]
+    return b"".join(part for item in items for part in (_LENGTH_PREFIX.pack(len(item)), item))
+
+
+def loop_decode(buffer: bytes) -> List[bytes]:
+    items = []
+    offset = 0
+    while offset < len(buffer):
+        (length,) = _LENGTH_PREFIX.unpack_from(buffer, offset)
+        items.append(buffer[offset + _LENGTH_PREFIX.size : offset + _LENGTH_PREFIX.size + length])
+        offset += _LENGTH_PREFIX.size + length
+    return items
+
+
+def contents_encode(values: np.ndarray) -> InferTensorContents:
+    contents = InferTensorContents()
+    contents.bytes_contents.extend(bytes_elements(values))
+    return contents
+
+
+def contents_decode(serialized: bytes) -> np.ndarray:
+    items = InferTensorContents.FromString(serialized).bytes_contents
+    array = np.empty(len(items), dtype=object)
+    array[:] = list(items)
+    return array
+
+
+def tensors(elements: int) -> Dict[str, np.ndarray]:
+    words = ["".join(random.choices(string.ascii_lowercase, k=random.randint(1, 24))) for _ in range(elements)]
+    return {
+        "str objects, 1-24 chars": np.array(words, dtype=object),
+        "non-ASCII str objects": np.array([word + "é" for word in words], dtype=object),
+        "bytes objects, 16 bytes": np.array([os.urandom(16) for _ in range(elements)], dtype=object),
+        "fixed-width 'U24' strings": np.array(words),
+    }
+
+
+def best_time(function: Callable[[], Any], repeat: int) -> float:
+    number, _ = timeit.Timer(function).autorange()
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--elements", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(
+        f"{'tensor':<28} {'loop encode':>12} {'encode':>12} {'contents':>12}"
+        f" {'loop decode':>12} {'decode':>12} {'contents':>12}"
+    )
+    for name, values in tensors(args.elements).items():
+        buffer = encode_bytes_tensor(values)
+        assert buffer == loop_encode(values)
+        serialized = contents_encode(values).SerializeToString()
+        assert contents_decode(serialized).tolist() == decode_bytes_tensor(buffer).tolist()
+        times = [
+            best_time(lambda: loop_encode(values), args.repeat),
+            best_time(lambda: encode_bytes_tensor(values), args.repeat),
+            best_time(lambda: contents_encode(values), args.repeat),
+            best_time(lambda: loop_decode(buffer), args.repeat),
+            best_time(lambda: decode_bytes_tensor(buffer), args.repeat),
+            best_time(lambda: contents_decode(serialized), args.repeat),
+        ]
+        print(f"{name:<28} " + " ".join(f"{time * 1000:>10.2f}ms" for time in times))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Throughput and latency of ModelInfer against an in-process echo server, swept over payload size, datatype,
+concurrency and codec.
+
+The server is a GRPCInferenceServiceServicer returning every input as an output, on a local port, so that the time
+measured is the client's encoding, the transport and the client's decoding. Each case calls ModelInfer from
+`concurrency` threads sharing one channel for `--duration` seconds, encoding each request and decoding each response
+with the codec:
+
+- raw: `encode_infer_request` / `decode_infer_response`, with tensors in raw_input_contents / raw_output_contents,
+  except BYTES tensors, which they send in bytes_contents
+- contents: tensors in the typed fields of InferTensorContents, which have none for FP16
+
+Results are printed, and written as JSON with `--json`. With `--compare`, cases are compared with the JSON results
+of an earlier run, and a drop of throughput by more than `--tolerance` is reported, failing the run with `--check`.
+
+    python benchmarks/bench_infer.py [--elements N ...] [--datatype FP32 ...] [--concurrency N ...]
+        [--codec raw|contents ...] [--duration S] [--json PATH] [--compare PATH [--tolerance F] [--check]]
+"""
+
+import argparse
+import json
+import pathlib
+import platform
+import random
+import string
+import sys
+import threading
+import time
+from concurrent import futures
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "generated"))
+
+import grpc  # noqa: E402
+import numpy as np  # noqa: E402
+
+from open_inference.grpc.backend import protobuf_backend  # noqa: E402
+from open_inference.grpc.codec import (  # noqa: E402
+    CONTENTS_FIELDS,
+    datatype_of,
+    decode_infer_response,
+    encode_infer_request,
+)
+from open_inference.grpc.protocol import ModelInferRequest, ModelInferResponse  # noqa: E402
+from open_inference.grpc.service import (  # noqa: E402
+    GRPCInferenceServiceServicer,
+    GRPCInferenceServiceStub,
+    add_GRPCInferenceServiceServicer_to_server,
+)
+
+DATATYPES = ["FP32", "FP16", "INT64", "BYTES"]
+CODECS = ["raw", "contents"]
+# Lifts gRPC's default limit of 4MB per message, which the largest payloads exceed
+CHANNEL_OPTIONS = [("grpc.max_send_message_length", -1), ("grpc.max_receive_message_length", -1)]
+
+
+class EchoServicer(GRPCInferenceServiceServicer):
+    """Returns the inputs of every request as its outputs, raw or in typed contents as they were sent."""
+
+    def ModelInfer(self, request: ModelInferRequest, context: grpc.ServicerContext) -> ModelInferResponse:
+        response = ModelInferResponse(model_name=request.model_name, id=request.id)
+        for tensor in request.inputs:
+            output = response.outputs.add(name=tensor.name, datatype=tensor.datatype, shape=tensor.shape)
+            if tensor.HasField("contents"):
+                output.contents.CopyFrom(tensor.contents)
+        response.raw_output_contents.extend(request.raw_input_contents)
+        return response
+
+
+def tensor(datatype: str, elements: int) -> np.ndarray:
+    if datatype == "BYTES":
+        words = [
+            "".join(random.choices(string.ascii_letters, k=random.randint(1, 32))) for _ in range(min(elements, 1024))
+        ]
+        return np.array((words * (elements // len(words) + 1))[:elements], dtype=object)
+    if datatype == "INT64":
+        return np.random.randint(0, 1 << 40, size=elements, dtype=np.int64)
+    return np.random.rand(elements).astype({"FP32": np.float32, "FP16": np.float16}[datatype])
+
+
+def contents_request(model_name: str, inputs: Dict[str, np.ndarray]) -> ModelInferRequest:
+    request = ModelInferRequest(model_name=model_name)
+    for name, array in inputs.items():
+        datatype = datatype_of(array.dtype)
+        values = array.ravel().tolist()
+        if datatype == "BYTES":
+            values = [value.encode("utf-8") for value in values]
+        tensor = request.inputs.add(name=name, datatype=datatype, shape=array.shape)
+        getattr(tensor.contents, CONTENTS_FIELDS[datatype]).extend(values)
+    return request
+
+
+def contents_response(response: ModelInferResponse) -> Dict[str, np.ndarray]:
+    arrays = {}
+    for output in response.outputs:
+        values = getattr(output.contents, CONTENTS_FIELDS[output.datatype])
+        arrays[output.name] = np.asarray(values, dtype=object if output.datatype == "BYTES" else None).reshape(
+            tuple(output.shape)
+        )
+    return arrays
+
+
+CODEC_FUNCTIONS: Dict[str, Tuple[Callable[..., ModelInferRequest], Callable[..., Dict[str, np.ndarray]]]] = {
+    "raw": (encode_infer_request, decode_infer_response),
+    "contents": (contents_request, contents_response),
+}
+
+
+def percentile(latencies: List[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of sorted ``latencies``."""
+    return latencies[min(int(fraction * len(latencies)), len(latencies) - 1)]
+
+
+def run_case(
+    stub: GRPCInferenceServiceStub, codec: str, array: np.ndarray, concurrency: int, duration: float
+) -> Dict[str, Any]:
+    encode, decode = CODEC_FUNCTIONS[codec]
+    inputs = {"input-0": array}
+    # Warms up the channel and checks the round trip
+    assert decode(stub.ModelInfer(encode("echo", inputs)))["input-0"].shape == array.shape
+
+    latencies: List[List[float]] = [[] for _ in range(concurrency)]
+    payload_bytes = encode("echo", inputs).ByteSize()
+    stop = threading.Event()
+
+    def worker(times: List[float]) -> None:
+        while not stop.is_set():
+            start = time.perf_counter()
+            decode(stub.ModelInfer(encode("echo", inputs)))
+            times.append(time.perf_counter() - start)
+
+    with futures.ThreadPoolExecutor(concurrency) as executor:
+        start = time.perf_counter()
+        running = [executor.submit(worker, times) for times in latencies]
+        time.sleep(duration)
+        stop.set()
+        for future in running:
+            future.result()
+        elapsed = time.perf_counter() - start
+
+    merged = sorted(latency for times in latencies for latency in times)
+    return {
+        "calls": len(merged),
+        "payload_bytes": payload_bytes,
+        "throughput": len(merged) / elapsed,
+        "megabytes_per_second": len(merged) * payload_bytes / elapsed / 1e6,
+        "p50_ms": percentile(merged, 0.50) * 1000,
+        "p99_ms": percentile(merged, 0.99) * 1000,
+    }
+
+
+def case_key(case: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (case["codec"], case["datatype"], case["elements"], case["concurrency"])
+
+
+def compare(cases: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> List[str]:
+    """Print the change of each case from the baseline, and return the regressions beyond ``tolerance``."""
+    baseline = {case_key(case): case for case in json.loads(pathlib.Path(baseline_path).read_text())["cases"]}
+    regressions = []
+    print(f"\ncompared with {baseline_path}")
+    for case in cases:
+        before = baseline.get(case_key(case))
+        if before is None:
+            continue
+        change = case["throughput"] / before["throughput"] - 1
+        print(
+            f"{case['codec']:<9} {case['datatype']:<6} {case['elements']:>9} {case['concurrency']:>4}"
+            f" {change:>+9.1%} throughput, p99 {before['p99_ms']:.2f}ms -> {case['p99_ms']:.2f}ms"
+        )
+        if change < -tolerance:
+            regressions.append(f"{case_key(case)} lost {-change:.1%} of its throughput")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--elements", type=int, nargs="+", default=[256, 16384, 262144])
+    parser.add_argument("--datatype", nargs="+", choices=DATATYPES, default=DATATYPES)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--codec", nargs="+", choices=CODECS, default=CODECS)
+    parser.add_argument("--duration", type=float, default=1.0, help="Seconds of calls per case")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Compare with the results of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Drop of throughput reported as a regression")
+    parser.add_argument("--check", action="store_true", help="Fail on regressions")
+    args = parser.parse_args()
+
+    server = grpc.server(futures.ThreadPoolExecutor(max(args.concurrency)), options=CHANNEL_OPTIONS)
+    add_GRPCInferenceServiceServicer_to_server(EchoServicer(), server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+
+    cases: List[Dict[str, Any]] = []
+    print(
+        f"{'codec':<9} {'dtype':<6} {'elements':>9} {'conc':>4} {'size':>10} {'calls/s':>10} {'MB/s':>8}"
+        f" {'p50':>9} {'p99':>9}"
+    )
+    try:
+        with grpc.insecure_channel(f"127.0.0.1:{port}", options=CHANNEL_OPTIONS) as channel:
+            stub = GRPCInferenceServiceStub(channel)
+            for codec in args.codec:
+                for datatype in args.datatype:
+                    if codec == "contents" and datatype not in CONTENTS_FIELDS:
+                        continue
+                    for elements in args.elements:
+                        array = tensor(datatype, elements)
+                        for concurrency in args.concurrency:
+                            result = run_case(stub, codec, array, concurrency, args.duration)
+                            case = {
+                                "codec": codec,
+                                "datatype": datatype,
+                                "elements": elements,
+                                "concurrency": concurrency,
+                                **result,
+                            }
+                            cases.append(case)
+                            print(
+                                f"{codec:<9} {datatype:<6} {elements:>9} {concurrency:>4}"
+                                f" {result['payload_bytes'] / 1024:>8.0f}KB {result['throughput']:>10.0f}"
+                                f" {result['megabytes_per_second']:>8.1f} {result['p50_ms']:>7.2f}ms"
+                                f" {result['p99_ms']:>7.2f}ms"
+                            )
+    finally:
+        server.stop(None)
+
+    if args.json:
+        results = {
+            "transport": "grpc",
+            "python": platform.python_version(),
+            "grpc": grpc.__version__,
+            "protobuf_backend": protobuf_backend(),
+            "numpy": np.__version__,
+            "duration": args.duration,
+            "cases": cases,
+        }
+        pathlib.Path(args.json).write_text(json.dumps(results, indent=2) + "\n")
+
+    regressions = compare(cases, args.compare, args.tolerance) if args.compare else []
+    if regressions and args.check:
+        sys.exit("\n".join(regressions))
+    for regression in regressions:
+        print(f"warning: {regression}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Import time of open_inference.grpc.protocol, and serialize and parse throughput of ModelInferRequest, on each protobuf
+backend.
+
+Each backend (upb, cpp and python) is measured in a fresh interpreter started with
+PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION set to it, and reported as unavailable when protobuf cannot run on it.
+
+    python benchmarks/bench_protobuf.py [--repeat N] [--backend upb|cpp|python ...]
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import random
+import subprocess
+import sys
+import time
+import timeit
+from typing import Any, Callable, Dict, List
+
+GENERATED = pathlib.Path(__file__).parent.parent / "generated"
+BACKENDS = ["upb", "cpp", "python"]
+
+
+def payloads(protocol: Any) -> Dict[str, Any]:
+    """Return requests with realistic tensors, as raw contents and as typed contents."""
+    image = protocol.ModelInferRequest(model_name="resnet", raw_input_contents=[os.urandom(4 * 224 * 224 * 3)])
+    image.inputs.add(name="input-0", datatype="FP32", shape=[1, 224, 224, 3])
+
+    features = protocol.ModelInferRequest(model_name="encoder")
+    features.inputs.add(name="input-0", datatype="FP32", shape=[64, 512]).contents.fp32_contents.extend(
+        random.random() for _ in range(64 * 512)
+    )
+
+    tabular = protocol.ModelInferRequest(model_name="iris-model")
+    tabular.inputs.add(name="input-0", datatype="INT64", shape=[1024, 16]).contents.int64_contents.extend(
+        random.randrange(1 << 40) for _ in range(1024 * 16)
+    )
+    return {
+        "image [1, 224, 224, 3] raw": image,
+        "features [64, 512] fp32_contents": features,
+        "tabular [1024, 16] int64_contents": tabular,
+    }
+
+
+def best_time(function: Callable[[], Any], repeat: int) -> float:
+    number, _ = timeit.Timer(function).autorange()
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def worker(backend: str, repeat: int) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        from open_inference.grpc.backend import protobuf_backend
+        import open_inference.grpc.protocol as protocol
+    except ImportError as e:
+        return {"backend": backend, "error": str(e)}
+    imported = time.perf_counter()
+    protocol.ModelInferRequest
+    resolved = time.perf_counter()
+    if protobuf_backend() != backend:
+        return {"backend": backend, "error": f"protobuf runs on {protobuf_backend()}"}
+
+    results: Dict[str, Any] = {
+        "backend": backend,
+        "import_ms": (imported - start) * 1000,
+        "resolve_ms": (resolved - imported) * 1000,
+        "payloads": {},
+    }
+    for name, request in payloads(protocol).items():
+        data = request.SerializeToString()
+        serialize = best_time(request.SerializeToString, repeat)
+        parse = best_time(lambda: protocol.ModelInferRequest.FromString(data), repeat)
+        results["payloads"][name] = {"bytes": len(data), "serialize": serialize, "parse": parse}
+    return results
+
+
+def run(backend: str, repeat: int) -> Dict[str, Any]:
+    env = dict(
+        os.environ,
+        PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION=backend,
+        PYTHONPATH=os.pathsep.join(filter(None, [str(GENERATED), os.environ.get("PYTHONPATH")])),
+        PYTHONWARNINGS="ignore",
+    )
+    result = subprocess.run(
+        [sys.executable, __file__, "--worker", backend, "--repeat", str(repeat)],
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        return {"backend": backend, "error": result.stderr.strip().splitlines()[-1]}
+    return json.loads(result.stdout)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--backend", action="append", choices=BACKENDS)
+    parser.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(args.worker, args.repeat)))
+        return
+
+    results: List[Dict[str, Any]] = [run(backend, args.repeat) for backend in args.backend or BACKENDS]
+    print(f"{'backend':<8} {'payload':<36} {'size':>10} {'serialize':>14} {'parse':>14}")
+    for result in results:
+        if "error" in result:
+            print(f"{result['backend']:<8} unavailable: {result['error']}")
+            continue
+        print(
+            f"{result['backend']:<8} {'import open_inference.grpc.protocol':<36} {'':>10}"
+            f" {result['import_ms']:>12.1f}ms {'':>14}  (messages resolved in {result['resolve_ms']:.1f}ms)"
+        )
+        for name, payload in result["payloads"].items():
+            megabytes = payload["bytes"] / 1e6
+            print(
+                f"{result['backend']:<8} {name:<36} {payload['bytes'] / 1024:>8.0f}KB"
+                f" {megabytes / payload['serialize']:>10.0f}MB/s {megabytes / payload['parse']:>10.0f}MB/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,9 @@ import importlib.resources
 import itertools
 import os
 import pathlib
+import re
 import sys
+import tempfile
 import urllib.request
 from textwrap import dedent
 from datetime import date
@@ -15,6 +17,11 @@ PROTO_URL = os.environ.get(
     "https://raw.githubusercontent.com/open-inference/open-inference-protocol/main/specification/protocol/open_inference_grpc.proto",
 )
 
+# Extensions of Triton added to the service of the protocol. Set STREAM_INFER=0 or SYSTEM_SHARED_MEMORY=0 to leave
+# out the corresponding extension, or both to build the service of the protocol alone
+STREAM_INFER = os.environ.get("STREAM_INFER", "1") != "0"
+SYSTEM_SHARED_MEMORY = os.environ.get("SYSTEM_SHARED_MEMORY", "1") != "0"
+
 
 def maybe_download_proto(protopath: pathlib.Path) -> None:
     if (protopath / "open_inference_grpc.proto").exists():
@@ -25,6 +32,118 @@ def maybe_download_proto(protopath: pathlib.Path) -> None:
         urllib.request.urlretrieve(PROTO_URL, protopath / "open_inference_grpc.proto")
 
 
+STREAM_INFER_RPC = """
+  // The ModelStreamInfer API performs inference over a bidirectional stream,
+  // as implemented by Triton. Every request sent on the stream is answered with
+  // a ModelStreamInferResponse, holding either the ModelInferResponse or the
+  // error of the request.
+  rpc ModelStreamInfer(stream ModelInferRequest) returns (stream ModelStreamInferResponse) {}
+"""
+
+STREAM_INFER_RESPONSE = """
+message ModelStreamInferResponse {
+  // The message describing the error. The empty message
+  // will be interpreted as no error.
+  string error_message = 1;
+
+  // Holds the results of the request.
+  ModelInferResponse infer_response = 2;
+}
+"""
+
+
+SYSTEM_SHARED_MEMORY_RPCS = """
+  // The SystemSharedMemory APIs register, unregister and report on regions of
+  // system shared memory, as implemented by Triton. The inputs and outputs of an
+  // inference request refer to a registered region through their
+  // "shared_memory_region", "shared_memory_offset" and "shared_memory_byte_size"
+  // parameters, in place of their contents.
+  rpc SystemSharedMemoryStatus(SystemSharedMemoryStatusRequest) returns (SystemSharedMemoryStatusResponse) {}
+  rpc SystemSharedMemoryRegister(SystemSharedMemoryRegisterRequest) returns (SystemSharedMemoryRegisterResponse) {}
+  rpc SystemSharedMemoryUnregister(SystemSharedMemoryUnregisterRequest) returns (SystemSharedMemoryUnregisterResponse) {}
+"""
+
+SYSTEM_SHARED_MEMORY_MESSAGES = """
+message SystemSharedMemoryStatusRequest {
+  // The name of the region to get status for. If empty the status is
+  // returned for all registered regions.
+  string name = 1;
+}
+
+message SystemSharedMemoryStatusResponse {
+  message RegionStatus {
+    // The name for the shared memory region.
+    string name = 1;
+
+    // The key of the underlying memory object that contains the shared
+    // memory region.
+    string key = 2;
+
+    // Offset, in bytes, within the underlying memory object to the start
+    // of the shared memory region.
+    uint64 offset = 3;
+
+    // Size of the shared memory region, in bytes.
+    uint64 byte_size = 4;
+  }
+
+  // Status for each of the registered regions, indexed by region name.
+  map<string, RegionStatus> regions = 1;
+}
+
+message SystemSharedMemoryRegisterRequest {
+  // The name of the region to register.
+  string name = 1;
+
+  // The key of the underlying memory object that contains the shared
+  // memory region.
+  string key = 2;
+
+  // Offset, in bytes, within the underlying memory object to the start
+  // of the shared memory region.
+  uint64 offset = 3;
+
+  // Size of the shared memory region, in bytes.
+  uint64 byte_size = 4;
+}
+
+message SystemSharedMemoryRegisterResponse {}
+
+message SystemSharedMemoryUnregisterRequest {
+  // The name of the region to unregister. If empty all system shared-memory
+  // regions are unregistered.
+  string name = 1;
+}
+
+message SystemSharedMemoryUnregisterResponse {}
+"""
+
+
+def add_extensions(protopath: pathlib.Path, extensionpath: pathlib.Path) -> pathlib.Path:
+    extensions = [
+        ("ModelStreamInfer", STREAM_INFER, STREAM_INFER_RPC, STREAM_INFER_RESPONSE),
+        ("SystemSharedMemory", SYSTEM_SHARED_MEMORY, SYSTEM_SHARED_MEMORY_RPCS, SYSTEM_SHARED_MEMORY_MESSAGES),
+    ]
+    proto_content = (protopath / "open_inference_grpc.proto").read_text()
+    rpcs, messages = "", ""
+    for name, enabled, extension_rpcs, extension_messages in extensions:
+        if enabled and f"rpc {name}" not in proto_content:
+            print(f"> Adding {name} to {extensionpath / 'open_inference_grpc.proto'}")
+            rpcs += extension_rpcs.lstrip("\n")
+            messages += extension_messages
+    if rpcs:
+        proto_content = re.sub(
+            r"(service GRPCInferenceService\s*\{.*?\n)\}",
+            lambda match: match.group(1) + rpcs + "}",
+            proto_content,
+            count=1,
+            flags=re.DOTALL,
+        )
+        proto_content += messages
+    (extensionpath / "open_inference_grpc.proto").write_text(proto_content)
+    return extensionpath
+
+
 def compile_grpc(protopath: pathlib.Path, outputpath: pathlib.Path) -> None:
     print("> Compiling gRPC stubs")
     proto_include = importlib.resources.files("grpc_tools") / "_proto"
@@ -65,11 +184,60 @@ def patch_module_import(outputpath: pathlib.Path) -> None:
     (outputpath / "service.py").write_text(service_content)
 
 
+LAZY_MESSAGES = """
+# Message classes are built when one of them is first accessed (PEP 562), rather than on import
+for _name, _service in DESCRIPTOR.services_by_name.items():
+    _globals["_" + _name.upper()] = _service
+_MESSAGE_NAMES = frozenset(DESCRIPTOR.message_types_by_name)
+_messages_lock = threading.Lock()
+
+
+def __getattr__(name: str) -> typing.Any:
+    if name not in _MESSAGE_NAMES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _messages_lock:
+        if name not in _globals:
+            _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, "open_inference_grpc_pb2", _globals)
+    return _globals[name]
+
+
+def __dir__() -> typing.List[str]:
+    return sorted({*_globals, *_MESSAGE_NAMES})
+"""
+
+
+def patch_lazy_messages(outputpath: pathlib.Path) -> None:
+    print(f"> Building message classes lazily, and checking the protobuf backend, in {outputpath / 'protocol.py'}")
+    protocol_content = (outputpath / "protocol.py").read_text()
+    protocol_content, count = re.subn(
+        r"^_builder\.BuildTopDescriptorsAndMessages\(DESCRIPTOR, ['\"]open_inference_grpc_pb2['\"], _globals\)\n",
+        lambda match: LAZY_MESSAGES,
+        protocol_content,
+        flags=re.MULTILINE,
+    )
+    if count != 1:
+        sys.exit(f"Expected one call to BuildTopDescriptorsAndMessages in {outputpath / 'protocol.py'}, found {count}")
+    protocol_content = protocol_content.replace(
+        "from google.protobuf.internal import builder as _builder\n",
+        "from google.protobuf.internal import builder as _builder\n"
+        "import threading\n"
+        "import typing\n"
+        "\n"
+        "from open_inference.grpc.backend import warn_if_pure_python\n"
+        "\n"
+        "warn_if_pure_python()\n",
+    )
+    (outputpath / "protocol.py").write_text(protocol_content)
+
+
 def prepend_apache_license(outputpath: pathlib.Path) -> None:
     for path in itertools.chain(
         outputpath.glob("**/*.py"),
         outputpath.glob("**/*.pyi"),
     ):
+        if path.read_text().startswith("# Copyright"):
+            # Hand-written modules alongside the generated ones already carry the license
+            continue
         print(f"> Prepending Apache License to {path}")
         path.write_text(
             dedent(
@@ -123,9 +291,12 @@ if __name__ == "__main__":
     outputpath = this_dir / "generated" / "open_inference" / "grpc"
 
     maybe_download_proto(protopath)
-    compile_grpc(protopath, outputpath)
+    with tempfile.TemporaryDirectory() as extensionpath:
+        protopath = add_extensions(protopath, pathlib.Path(extensionpath))
+        compile_grpc(protopath, outputpath)
     rename_built_files(outputpath)
     patch_module_import(outputpath)
+    patch_lazy_messages(outputpath)
     prepend_apache_license(outputpath)
     format_generated_files(outputpath)
     add_py_typed(outputpath)
@@ -0,0 +1,45 @@
+# Copyright 2023 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Detection of the protobuf backend that serializes and parses the messages of ``open_inference.grpc.protocol``.
+
+protobuf runs on one of three backends: ``upb``, the default since protobuf 4.21, ``cpp``, the C++ extension of
+earlier releases, or ``python``, a pure-Python implementation several times slower at serializing and parsing large
+messages. The pure-Python backend is used when protobuf has no compiled backend for the platform, or when
+``PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION=python`` is set, and ``open_inference.grpc.protocol`` then warns with a
+``PurePythonProtobufWarning`` on import. Silence it with ``warnings.filterwarnings``, before importing the protocol.
+"""
+import warnings
+
+from google.protobuf.internal import api_implementation
+
+
+class PurePythonProtobufWarning(RuntimeWarning):
+    """Warns that messages are serialized and parsed by the pure-Python protobuf backend."""
+
+
+def protobuf_backend() -> str:
+    """Return the name of the active protobuf backend: ``"upb"``, ``"cpp"`` or ``"python"``."""
+    return api_implementation.Type()
+
+
+def warn_if_pure_python() -> None:
+    if protobuf_backend() == "python":
+        warnings.warn(
+            "protobuf is running on its pure-Python backend, which is several times slower at serializing and parsing "
+            "inference requests and responses. Install a protobuf release with a compiled backend for this platform, "
+            "and unset PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION if it is set to 'python'.",
+            PurePythonProtobufWarning,
+            stacklevel=3,
+        )
@@ -0,0 +1,352 @@
+# Copyright 2023 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Client-side dynamic batching of ``ModelInfer`` calls.
+
+``BatchingStub`` (for ``grpc`` channels) and ``AsyncBatchingStub`` (for ``grpc.aio`` channels) wrap a
+``GRPCInferenceServiceStub``. Concurrent ``ModelInfer`` calls with compatible requests are concatenated along their
+first dimension into one ``ModelInferRequest``, and the outputs of its response are split back to each caller.
+
+Requests are compatible when they target the same model and version with the same parameters, metadata and requested
+outputs, and their inputs match in name, datatype, parameters and every dimension but the first. All inputs of a
+request must share their first dimension, and either all or none of them must be sent in ``raw_input_contents``.
+Requests with tensors in shared memory, and other requests, are sent on their own, as are all other RPCs.
+
+``split_response`` slices a response to a merged request back into one response per request, for other ways of
+batching such as ``bulk``.
+"""
+import asyncio
+import math
+import threading
+import time
+import typing
+from concurrent.futures import Future
+
+from open_inference.grpc.bytes_codec import element_offsets
+from open_inference.grpc.protocol import ModelInferRequest, ModelInferResponse
+from open_inference.grpc.service import GRPCInferenceServiceStub
+
+Metadata = typing.Optional[typing.Sequence[typing.Tuple[str, typing.Union[str, bytes]]]]
+
+
+class _Batch:
+    def __init__(self) -> None:
+        self.requests: typing.List[ModelInferRequest] = []
+        self.rows: typing.List[int] = []
+        self.futures: typing.List[typing.Any] = []
+        self.deadline: typing.Optional[float] = None
+        self.closed = threading.Event()
+        self.flush_handle: typing.Optional[asyncio.TimerHandle] = None
+
+    def add(self, request: ModelInferRequest, rows: int, future: typing.Any, timeout: typing.Optional[float]) -> None:
+        self.requests.append(request)
+        self.rows.append(rows)
+        self.futures.append(future)
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+            self.deadline = deadline if self.deadline is None else min(self.deadline, deadline)
+
+    def timeout(self) -> typing.Optional[float]:
+        """Time left until the earliest deadline of the batched calls."""
+        return None if self.deadline is None else max(self.deadline - time.monotonic(), 0.0)
+
+
+class BatchingStub:
+    """Batches concurrent ``ModelInfer`` calls made from several threads through a ``grpc`` channel.
+
+    The first call of a batch waits up to ``max_queue_delay`` seconds for others to join, or until the batch holds
+    ``max_batch_size`` rows, then sends it on behalf of all of them. Calls are only batched with calls of the same
+    ``metadata``, ``wait_for_ready``, ``compression`` and ``credentials``, which are passed on to the batch.
+    ``ModelInfer.with_call`` and ``ModelInfer.future`` send their request on its own, since their call object belongs
+    to a single request. Every other RPC of the wrapped stub is available unchanged.
+    """
+
+    def __init__(
+        self, stub: GRPCInferenceServiceStub, *, max_batch_size: int = 8, max_queue_delay: float = 0.005
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be at least 1, got {max_batch_size}")
+        self._stub = stub
+        self.max_batch_size = max_batch_size
+        self.max_queue_delay = max_queue_delay
+        self._lock = threading.Lock()
+        self._pending: typing.Dict[typing.Hashable, _Batch] = {}
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self._stub, name)
+
+    @property
+    def ModelInfer(self) -> "_BatchedMethod":
+        return _BatchedMethod(self._infer, self._stub.ModelInfer)
+
+    def _infer(
+        self,
+        request: ModelInferRequest,
+        timeout: typing.Optional[float] = None,
+        metadata: Metadata = None,
+        **kwargs: typing.Any,
+    ) -> ModelInferResponse:
+        key, rows = _batch_key(request, metadata, kwargs)
+        if key is None or rows > self.max_batch_size:
+            return self._stub.ModelInfer(request, timeout=timeout, metadata=metadata, **kwargs)
+
+        future: "Future[ModelInferResponse]" = Future()
+        with self._lock:
+            batch = self._pending.get(key)
+            if batch is not None and sum(batch.rows) + rows > self.max_batch_size:
+                self._close(key, batch)
+                batch = None
+            leader = batch is None
+            if batch is None:
+                batch = self._pending[key] = _Batch()
+            batch.add(request, rows, future, timeout)
+            if sum(batch.rows) == self.max_batch_size:
+                self._close(key, batch)
+
+        if leader:
+            batch.closed.wait(self.max_queue_delay)
+            with self._lock:
+                self._close(key, batch)
+            try:
+                response = self._stub.ModelInfer(_merge(batch), timeout=batch.timeout(), metadata=metadata, **kwargs)
+                _resolve(batch, response)
+            except Exception as e:
+                for waiting in batch.futures:
+                    waiting.set_exception(e)
+        return future.result()
+
+    def _close(self, key: typing.Hashable, batch: _Batch) -> None:
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+        batch.closed.set()
+
+
+class AsyncBatchingStub:
+    """Batches concurrent ``ModelInfer`` calls made from coroutines through a ``grpc.aio`` channel.
+
+    A batch is sent ``max_queue_delay`` seconds after its first call, or as soon as it holds ``max_batch_size`` rows.
+    As with ``BatchingStub``, calls are only batched with calls of the same options. Every other RPC of the wrapped stub
+    is available unchanged.
+    """
+
+    def __init__(
+        self, stub: GRPCInferenceServiceStub, *, max_batch_size: int = 8, max_queue_delay: float = 0.005
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be at least 1, got {max_batch_size}")
+        self._stub = stub
+        self.max_batch_size = max_batch_size
+        self.max_queue_delay = max_queue_delay
+        self._pending: typing.Dict[typing.Hashable, _Batch] = {}
+        self._tasks: typing.Set["asyncio.Task[None]"] = set()
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self._stub, name)
+
+    async def ModelInfer(
+        self,
+        request: ModelInferRequest,
+        timeout: typing.Optional[float] = None,
+        metadata: Metadata = None,
+        **kwargs: typing.Any,
+    ) -> ModelInferResponse:
+        key, rows = _batch_key(request, metadata, kwargs)
+        if key is None or rows > self.max_batch_size:
+            return await self._stub.ModelInfer(request, timeout=timeout, metadata=metadata, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[ModelInferResponse]" = loop.create_future()
+        batch = self._pending.get(key)
+        if batch is not None and sum(batch.rows) + rows > self.max_batch_size:
+            self._flush(key, batch, metadata, kwargs)
+            batch = None
+        if batch is None:
+            batch = self._pending[key] = _Batch()
+            batch.flush_handle = loop.call_later(self.max_queue_delay, self._flush, key, batch, metadata, kwargs)
+        batch.add(request, rows, future, timeout)
+        if sum(batch.rows) == self.max_batch_size:
+            self._flush(key, batch, metadata, kwargs)
+        return await future
+
+    def _flush(
+        self, key: typing.Hashable, batch: _Batch, metadata: Metadata, kwargs: typing.Dict[str, typing.Any]
+    ) -> None:
+        if self._pending.get(key) is not batch:
+            return
+        del self._pending[key]
+        if batch.flush_handle is not None:
+            batch.flush_handle.cancel()
+        task = asyncio.get_running_loop().create_task(self._send(batch, metadata, kwargs))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: _Batch, metadata: Metadata, kwargs: typing.Dict[str, typing.Any]) -> None:
+        try:
+            response = await self._stub.ModelInfer(_merge(batch), timeout=batch.timeout(), metadata=metadata, **kwargs)
+            _resolve(batch, response)
+        except Exception as e:
+            for waiting in batch.futures:
+                if not waiting.done():
+                    waiting.set_exception(e)
+
+
+def _parameters_key(parameters: typing.Any) -> typing.Tuple[typing.Tuple[str, bytes], ...]:
+    return tuple(sorted((name, value.SerializeToString(deterministic=True)) for name, value in parameters.items()))
+
+
+def _batch_key(
+    request: ModelInferRequest, metadata: Metadata, options: typing.Mapping[str, typing.Any]
+) -> typing.Tuple[typing.Optional[typing.Hashable], int]:
+    """Return the key under which ``request`` can be batched, or None if it cannot be, and its number of rows.
+
+    Requests are only batched with requests sent with the same ``metadata`` and other call ``options``.
+    """
+    if not request.inputs or not request.inputs[0].shape:
+        return None, 0
+    rows = request.inputs[0].shape[0]
+    if any(not tensor.shape or tensor.shape[0] != rows for tensor in request.inputs):
+        return None, 0
+    raw = len(request.raw_input_contents) > 0
+    if raw and len(request.raw_input_contents) != len(request.inputs):
+        return None, 0
+    if any("shared_memory_region" in tensor.parameters for tensor in (*request.inputs, *request.outputs)):
+        return None, 0
+
+    key = (
+        request.model_name,
+        request.model_version,
+        _parameters_key(request.parameters),
+        tuple(
+            (tensor.name, tensor.datatype, tuple(tensor.shape[1:]), _parameters_key(tensor.parameters))
+            for tensor in request.inputs
+        ),
+        tuple(output.SerializeToString(deterministic=True) for output in request.outputs),
+        raw,
+        tuple(metadata or ()),
+        tuple(sorted(options.items(), key=lambda option: option[0])),
+    )
+    return key, rows
+
+
+class _BatchedMethod:
+    """``ModelInfer`` of a ``BatchingStub``: calls are batched, and ``with_call`` and ``future`` are the stub's."""
+
+    def __init__(self, infer: typing.Callable[..., ModelInferResponse], method: typing.Any) -> None:
+        self._infer = infer
+        self._method = method
+
+    def __call__(self, *args: typing.Any, **kwargs: typing.Any) -> ModelInferResponse:
+        return self._infer(*args, **kwargs)
+
+    def with_call(self, *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        return self._method.with_call(*args, **kwargs)
+
+    def future(self, *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        return self._method.future(*args, **kwargs)
+
+
+def _merge(batch: _Batch) -> ModelInferRequest:
+    """Concatenate the requests of a batch along their first dimension."""
+    first = batch.requests[0]
+    if len(batch.requests) == 1:
+        return first
+
+    merged = ModelInferRequest(model_name=first.model_name, model_version=first.model_version)
+    for name, value in first.parameters.items():
+        merged.parameters[name].CopyFrom(value)
+    merged.outputs.extend(first.outputs)
+
+    rows = sum(batch.rows)
+    for index, tensor in enumerate(first.inputs):
+        merged_tensor = merged.inputs.add(name=tensor.name, datatype=tensor.datatype, shape=[rows, *tensor.shape[1:]])
+        for name, value in tensor.parameters.items():
+            merged_tensor.parameters[name].CopyFrom(value)
+        if first.raw_input_contents:
+            # Row-major data, so concatenating along the first dimension concatenates the buffers
+            merged.raw_input_contents.append(b"".join(request.raw_input_contents[index] for request in batch.requests))
+        else:
+            for request in batch.requests:
+                for field, values in request.inputs[index].contents.ListFields():
+                    getattr(merged_tensor.contents, field.name).extend(values)
+    return merged
+
+
+def _resolve(batch: _Batch, response: ModelInferResponse) -> None:
+    """Split ``response`` into one response per batched request and complete their futures."""
+    if len(batch.requests) == 1:
+        responses = [response]
+    else:
+        responses = split_response(response, batch.rows, [request.id for request in batch.requests])
+    for future, part in zip(batch.futures, responses):
+        if not future.done():
+            future.set_result(part)
+
+
+def split_response(
+    response: ModelInferResponse, rows: typing.List[int], ids: typing.List[str]
+) -> typing.List[ModelInferResponse]:
+    """Slice the outputs of ``response`` into one response per request of the given ``rows`` and ``ids``.
+
+    ``rows`` are the sizes of the first dimension of each request, in the order their inputs were concatenated. Raises
+    ``ValueError`` if an output's first dimension is not their sum.
+    """
+    total_rows = sum(rows)
+    responses = []
+    for request_id in ids:
+        part = ModelInferResponse(model_name=response.model_name, model_version=response.model_version, id=request_id)
+        for name, value in response.parameters.items():
+            part.parameters[name].CopyFrom(value)
+        responses.append(part)
+
+    for index, output in enumerate(response.outputs):
+        if not output.shape or output.shape[0] != total_rows:
+            raise ValueError(
+                f"Output {output.name!r} of shape {list(output.shape)} cannot be split into batches of {rows} rows"
+            )
+        row_elements = math.prod(output.shape[1:])
+        if response.raw_output_contents:
+            chunks = _split_raw(response.raw_output_contents[index], output.datatype, row_elements, rows)
+
+        offset = 0
+        for position, (part, part_rows) in enumerate(zip(responses, rows)):
+            tensor = part.outputs.add(name=output.name, datatype=output.datatype, shape=[part_rows, *output.shape[1:]])
+            for name, value in output.parameters.items():
+                tensor.parameters[name].CopyFrom(value)
+            if response.raw_output_contents:
+                part.raw_output_contents.append(chunks[position])
+            else:
+                start, stop = offset * row_elements, (offset + part_rows) * row_elements
+                for field, values in output.contents.ListFields():
+                    getattr(tensor.contents, field.name).extend(values[start:stop])
+            offset += part_rows
+    return responses
+
+
+def _split_raw(content: bytes, datatype: str, row_elements: int, rows: typing.List[int]) -> typing.List[bytes]:
+    """Split a raw tensor buffer into chunks holding the given numbers of rows."""
+    if datatype == "BYTES":
+        # Elements are each prefixed with their length, so boundaries have to be found by walking them
+        offsets = element_offsets(content, sum(rows) * row_elements)
+        boundaries = [0]
+        elements = 0
+        for part_rows in rows:
+            elements += part_rows * row_elements
+            boundaries.append(offsets[elements])
+    else:
+        elements = sum(rows) * row_elements
+        itemsize = len(content) // elements if elements else 0
+        boundaries = [0]
+        for part_rows in rows:
+            boundaries.append(boundaries[-1] + part_rows * row_elements * itemsize)
+    return [content[start:stop] for start, stop in zip(boundaries, boundaries[1:])]
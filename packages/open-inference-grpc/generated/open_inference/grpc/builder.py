@@ -0,0 +1,146 @@
+# Copyright 2023 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Inference requests built from a model's metadata.
+
+A ``RequestBuilder`` is created once per model from its ``ModelMetadataResponse``. It prepares a template request with
+the name, datatype and parameters of every input, so that each request only adds the shapes and data of the arrays
+passed in. The arrays are checked against the model's metadata before anything is sent.
+
+Requires the ``numpy`` extra: ``pip install open-inference-grpc[numpy]``.
+"""
+import typing
+
+import numpy as np
+import numpy.typing as npt
+
+from open_inference.grpc.bytes_codec import encode_bytes_tensor
+from open_inference.grpc.codec import DATATYPES, to_bfloat16
+from open_inference.grpc.protocol import InferParameter, ModelInferRequest, ModelMetadataRequest, ModelMetadataResponse
+from open_inference.grpc.service import GRPCInferenceServiceStub
+
+
+class _InputLayout(typing.NamedTuple):
+    name: str
+    datatype: str
+    dtype: typing.Optional[np.dtype]
+    #: Dimensions of the input, with -1 for dynamic ones
+    shape: typing.Tuple[int, ...]
+
+
+class RequestBuilder:
+    """Builds ``ModelInferRequest`` messages for one model from arrays keyed by input name.
+
+    Every input of the model must be given. Arrays must match the input's shape, where dynamic dimensions (``-1``) can
+    take any size. Arrays of another dtype than the input's datatype are converted when NumPy allows it under the
+    ``casting`` rule, and rejected otherwise. The default, ``"same_kind"``, accepts narrowing conversions such as
+    ``float64`` to ``FP32``, which rounds, or ``int64`` to ``INT32``, which wraps values out of range.
+    ``casting="safe"`` only accepts conversions that keep every value, such as ``int32`` to ``FP64``. ``BYTES`` inputs
+    take arrays of ``bytes`` or ``str``, and ``BF16`` inputs take integer or float arrays, or the ``bfloat16`` arrays of
+    ``ml_dtypes``. Float arrays of ``FP16`` and ``BF16`` inputs are down-cast to half precision.
+
+    ``outputs`` optionally names the outputs to request, and ``parameters`` are sent with every request::
+
+        builder = RequestBuilder(stub.ModelMetadata(ModelMetadataRequest(name="iris-model")))
+        response = stub.ModelInfer(builder.build({"input-0": np.array([[5.3, 3.7, 1.5, 0.2]])}))
+    """
+
+    def __init__(
+        self,
+        metadata: ModelMetadataResponse,
+        *,
+        model_version: typing.Optional[str] = None,
+        outputs: typing.Optional[typing.Iterable[str]] = None,
+        parameters: typing.Optional[typing.Mapping[str, InferParameter]] = None,
+        casting: typing.Literal["same_kind", "safe"] = "same_kind",
+    ) -> None:
+        if casting not in ("same_kind", "safe"):
+            raise ValueError(f"casting must be 'same_kind' or 'safe', not {casting!r}")
+        self.model_name = metadata.name
+        self.casting = casting
+        self._layouts = []
+        for tensor in metadata.inputs:
+            if tensor.datatype not in ("BYTES", "BF16") and tensor.datatype not in DATATYPES:
+                raise ValueError(f"Input {tensor.name!r} has unsupported datatype {tensor.datatype}")
+            self._layouts.append(
+                _InputLayout(tensor.name, tensor.datatype, DATATYPES.get(tensor.datatype), tuple(tensor.shape))
+            )
+        self._names = frozenset(layout.name for layout in self._layouts)
+
+        self._template = ModelInferRequest(model_name=metadata.name, parameters=parameters)
+        if model_version is not None:
+            self._template.model_version = model_version
+        for layout in self._layouts:
+            self._template.inputs.add(name=layout.name, datatype=layout.datatype)
+        for output in outputs or ():
+            self._template.outputs.add(name=output)
+
+    @classmethod
+    def fetch(
+        cls,
+        stub: GRPCInferenceServiceStub,
+        model_name: str,
+        model_version: typing.Optional[str] = None,
+        **kwargs: typing.Any,
+    ) -> "RequestBuilder":
+        """Create a builder from the metadata the server reports for a model, taking the same arguments otherwise."""
+        request = ModelMetadataRequest(name=model_name, version=model_version)
+        return cls(stub.ModelMetadata(request), model_version=model_version, **kwargs)
+
+    def build(
+        self, inputs: typing.Mapping[str, npt.ArrayLike], *, id: typing.Optional[str] = None
+    ) -> ModelInferRequest:
+        """Return a ``ModelInferRequest`` sending ``inputs`` in ``raw_input_contents``.
+
+        Raises ``ValueError`` if an input is missing or unknown, or does not match its datatype or shape.
+        """
+        if inputs.keys() != self._names:
+            raise ValueError(
+                f"Model {self.model_name!r} takes inputs {sorted(self._names)}, got {sorted(inputs.keys())}"
+            )
+
+        request = ModelInferRequest()
+        request.CopyFrom(self._template)
+        if id is not None:
+            request.id = id
+        for tensor, layout in zip(request.inputs, self._layouts):
+            array = self._check(layout, inputs[layout.name])
+            tensor.shape.extend(array.shape)
+            request.raw_input_contents.append(_to_bytes(array, layout.datatype))
+        return request
+
+    def _check(self, layout: _InputLayout, value: npt.ArrayLike) -> np.ndarray:
+        array = np.asarray(value)
+        if layout.datatype == "BYTES":
+            if array.dtype.kind not in "OSUT":
+                raise ValueError(f"Input {layout.name!r} is BYTES, which an array of {array.dtype} cannot hold")
+        elif layout.datatype == "BF16":
+            if array.dtype.kind not in "iuf" and array.dtype.name != "bfloat16":
+                raise ValueError(f"Input {layout.name!r} is BF16, which an array of {array.dtype} cannot hold")
+        elif layout.dtype is None or not np.can_cast(array.dtype, layout.dtype, casting=self.casting):
+            raise ValueError(f"Input {layout.name!r} is {layout.datatype}, which an array of {array.dtype} cannot hold")
+
+        if len(array.shape) != len(layout.shape) or any(
+            expected not in (-1, actual) for expected, actual in zip(layout.shape, array.shape)
+        ):
+            raise ValueError(f"Input {layout.name!r} has shape {list(layout.shape)}, got an array of {array.shape}")
+        return array
+
+
+def _to_bytes(array: np.ndarray, datatype: str) -> bytes:
+    if datatype == "BYTES":
+        return encode_bytes_tensor(array)
+    if datatype == "BF16":
+        return to_bfloat16(array).tobytes()
+    return np.ascontiguousarray(array, dtype=DATATYPES[datatype]).tobytes()
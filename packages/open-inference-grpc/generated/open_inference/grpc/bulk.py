@@ -0,0 +1,132 @@
+# Copyright 2023 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Bulk inference over an iterable of rows through a ``grpc.aio`` channel.
+
+``bulk_infer`` reads rows from a (possibly asynchronous) iterable, stacks every ``batch_size`` of them into one
+``ModelInferRequest``, and keeps up to ``concurrency`` requests in flight. Rows are only read as requests complete, so
+memory is bounded by the in-flight window rather than by the size of the dataset.
+
+Requires the ``numpy`` extra: ``pip install open-inference-grpc[numpy]``.
+"""
+import asyncio
+import collections
+import typing
+
+import numpy as np
+import numpy.typing as npt
+
+from open_inference.grpc.batching import Metadata, split_response
+from open_inference.grpc.builder import RequestBuilder
+from open_inference.grpc.protocol import InferParameter, ModelInferResponse, ModelMetadataRequest
+from open_inference.grpc.service import GRPCInferenceServiceStub
+
+Row = typing.Mapping[str, npt.ArrayLike]
+Rows = typing.Union[typing.Iterable[Row], typing.AsyncIterable[Row]]
+
+
+async def bulk_infer(
+    stub: GRPCInferenceServiceStub,
+    model_name: str,
+    rows: Rows,
+    *,
+    model_version: typing.Optional[str] = None,
+    concurrency: int = 4,
+    batch_size: int = 1,
+    ordered: bool = True,
+    outputs: typing.Optional[typing.Iterable[str]] = None,
+    parameters: typing.Optional[typing.Mapping[str, InferParameter]] = None,
+    timeout: typing.Optional[float] = None,
+    metadata: Metadata = None,
+) -> typing.AsyncIterator[typing.Tuple[int, ModelInferResponse]]:
+    """Infer every row of ``rows``, yielding the index of each row along with its response.
+
+    ``stub`` is a ``GRPCInferenceServiceStub`` of a ``grpc.aio`` channel, or any wrapper with its coroutine methods. A
+    row maps each input of the model to its data for that row, without the first (batch) dimension. Requests are built
+    from the model's metadata with a ``RequestBuilder``, and their responses are split into one response per row, whose
+    outputs have a first dimension of 1. Responses are yielded in the order of the rows, or as their requests complete
+    without ``ordered``. ``timeout`` and ``metadata`` apply to each call.
+
+    A failed call raises its error from the generator, and calls still in flight are cancelled when the generator is
+    closed.
+    """
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be at least 1, got {concurrency}")
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+
+    model_metadata = await stub.ModelMetadata(
+        ModelMetadataRequest(name=model_name, version=model_version), timeout=timeout, metadata=metadata
+    )
+    builder = RequestBuilder(model_metadata, model_version=model_version, outputs=outputs, parameters=parameters)
+
+    async def infer(chunk: typing.List[Row]) -> typing.List[ModelInferResponse]:
+        request = builder.build({name: np.stack([row[name] for row in chunk]) for name in chunk[0]})
+        response = await stub.ModelInfer(request, timeout=timeout, metadata=metadata)
+        if len(chunk) == 1:
+            return [response]
+        return split_response(response, [1] * len(chunk), [response.id] * len(chunk))
+
+    loop = asyncio.get_running_loop()
+    chunks = _chunks(rows, batch_size)
+    exhausted = False
+    # Calls in flight, with the index of their first row, in the order they were made
+    window: typing.Deque[typing.Tuple[int, "asyncio.Task[typing.List[ModelInferResponse]]"]] = collections.deque()
+    try:
+        while True:
+            while not exhausted and len(window) < concurrency:
+                try:
+                    start, chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                window.append((start, loop.create_task(infer(chunk))))
+            if not window:
+                return
+
+            if ordered:
+                start, task = window.popleft()
+                await asyncio.wait([task])
+            else:
+                done, _ = await asyncio.wait([task for _, task in window], return_when=asyncio.FIRST_COMPLETED)
+                start, task = next(item for item in window if item[1] in done)
+                window.remove((start, task))
+            for offset, response in enumerate(task.result()):
+                yield start + offset, response
+    finally:
+        for _, task in window:
+            if not task.cancel() and not task.cancelled():
+                # Retrieves the error of a call that failed after the generator stopped, which asyncio would log
+                task.exception()
+        await chunks.aclose()
+
+
+async def _chunks(rows: Rows, size: int) -> typing.AsyncGenerator[typing.Tuple[int, typing.List[Row]], None]:
+    """Yield lists of up to ``size`` rows, along with the index of their first row."""
+    chunk: typing.List[Row] = []
+    start = 0
+    if isinstance(rows, typing.AsyncIterable):
+        async for row in rows:
+            chunk.append(row)
+            if len(chunk) == size:
+                yield start, chunk
+                start, chunk = start + size, []
+    else:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == size:
+                yield start, chunk
+                start, chunk = start + size, []
+    if chunk:
+        yield start, chunk
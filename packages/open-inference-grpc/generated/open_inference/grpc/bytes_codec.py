@@ -0,0 +1,189 @@
+# Copyright 2023 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Encoding of ``BYTES`` tensors as the length-prefixed buffers of ``raw_input_contents`` / ``raw_output_contents``.
+
+Each element of a ``BYTES`` tensor is sent as its length in 4 little-endian bytes followed by its bytes, elements
+following each other in row-major order. ``encode_bytes_tensor`` joins the elements of a whole tensor at once, and
+writes the length prefixes and the joined elements into a single buffer with array operations, rather than packing and
+concatenating them element by element. ``decode_bytes_tensor`` walks the prefixes of a buffer, which have no index
+to find them by, and slices its elements out of one copy of it.
+
+Both still cost a pass of Python over the elements, which protobuf does in compiled code for the typed
+``bytes_contents`` field, where each element is its own ``bytes`` value. ``open_inference.grpc.codec`` sends
+``BYTES`` tensors there with ``bytes_elements`` when a message has no other datatype, and uses length-prefixed
+buffers only when ``raw_input_contents`` / ``raw_output_contents`` are needed for the other tensors of the message.
+
+Encoding and decoding use NumPy, from the ``numpy`` extra. ``element_offsets`` does not need it.
+"""
+import struct
+import typing
+
+if typing.TYPE_CHECKING:
+    import numpy as np
+
+_LENGTH_PREFIX = struct.Struct("<I")
+_MAX_LENGTH = (1 << 32) - 1
+
+
+def encode_bytes_tensor(values: typing.Any) -> bytes:
+    """Return the length-prefixed buffer of the elements of a ``BYTES`` tensor, in row-major order.
+
+    ``values`` is a NumPy array of ``bytes`` or ``str`` objects, of fixed-width bytes or strings, or of ``StringDType``
+    strings, a PyArrow string or binary array, or a sequence of ``bytes`` and ``str``. Strings are encoded as UTF-8.
+    """
+    import numpy as np
+
+    data, lengths = _join_elements(values)
+    if len(lengths) and lengths.max() > _MAX_LENGTH:
+        raise ValueError(f"BYTES elements are limited to {_MAX_LENGTH} bytes, got one of {lengths.max()}")
+
+    count = len(lengths)
+    buffer = np.empty(_LENGTH_PREFIX.size * count + len(data), dtype=np.uint8)
+    # The offset of each length prefix, after the prefixes and elements before it
+    starts = np.arange(count, dtype=np.int64) * _LENGTH_PREFIX.size
+    starts[1:] += np.cumsum(lengths[:-1])
+    prefixes = (starts[:, np.newaxis] + np.arange(_LENGTH_PREFIX.size)).ravel()
+    buffer[prefixes] = lengths.astype("<u4").view(np.uint8)
+    elements = np.ones(len(buffer), dtype=bool)
+    elements[prefixes] = False
+    buffer[elements] = data
+    return buffer.tobytes()
+
+
+def bytes_elements(values: typing.Any) -> typing.List[bytes]:
+    """Return the elements of a ``BYTES`` tensor as ``bytes`` objects in row-major order, for ``bytes_contents``.
+
+    ``values`` is any of the inputs of ``encode_bytes_tensor``. Strings are encoded as UTF-8.
+    """
+    items = _items(values)
+    if all(type(item) is bytes for item in items):
+        return items
+    return [item.encode("utf-8") if isinstance(item, str) else bytes(item) for item in items]
+
+
+def decode_bytes_tensor(buffer: typing.Any, count: typing.Optional[int] = None) -> "np.ndarray":
+    """Return the elements of a length-prefixed ``BYTES`` buffer as a flat array of ``bytes`` objects.
+
+    Raises ``ValueError`` if the buffer is truncated, or does not hold ``count`` elements when it is given.
+    """
+    import numpy as np
+
+    data = buffer if isinstance(buffer, bytes) else bytes(buffer)
+    records = _fixed_length_records(data)
+    if records is not None and count in (None, len(records)):
+        # Elements of one length are read as a column of records, without walking the buffer
+        items = records["element"].tolist()
+    else:
+        offsets = element_offsets(data, count)
+        items = [data[start + _LENGTH_PREFIX.size : end] for start, end in zip(offsets, offsets[1:])]
+    array = np.empty(len(items), dtype=object)
+    array[:] = items
+    return array
+
+
+def element_offsets(buffer: typing.Any, count: typing.Optional[int] = None) -> typing.List[int]:
+    """Return the offset of each element's length prefix in a ``BYTES`` buffer, followed by the end of the buffer.
+
+    Raises ``ValueError`` if the buffer is truncated, or does not hold ``count`` elements when it is given.
+    """
+    unpack_from = _LENGTH_PREFIX.unpack_from
+    size = len(buffer)
+    offsets = [0]
+    append = offsets.append
+    offset = 0
+    try:
+        while offset < size:
+            offset += 4 + unpack_from(buffer, offset)[0]
+            append(offset)
+    except struct.error:
+        offset = size + 1
+    if offset > size:
+        raise ValueError(f"BYTES buffer of {size} bytes is truncated")
+    if count is not None and len(offsets) - 1 != count:
+        raise ValueError(f"BYTES buffer holds {len(offsets) - 1} elements, expected {count}")
+    return offsets
+
+
+def _fixed_length_records(data: bytes) -> typing.Optional["np.ndarray"]:
+    """Return the records of a buffer whose elements all have the length of the first one, or None if they do not."""
+    import numpy as np
+
+    if len(data) < _LENGTH_PREFIX.size:
+        return None
+    (length,) = _LENGTH_PREFIX.unpack_from(data, 0)
+    if length == 0 or len(data) % (_LENGTH_PREFIX.size + length):
+        return None
+    records = np.frombuffer(data, dtype=np.dtype([("length", "<u4"), ("element", f"V{length}")]))
+    return records if (records["length"] == length).all() else None
+
+
+def _join_elements(values: typing.Any) -> typing.Tuple["np.ndarray", "np.ndarray"]:
+    """Return the elements of ``values`` joined as one array of bytes, and their lengths."""
+    import numpy as np
+
+    if type(values).__module__.startswith("pyarrow"):
+        joined = _join_arrow(values)
+        if joined is not None:
+            return joined
+
+    items = _items(values)
+    types = set(map(type, items))
+    if types <= {bytes}:
+        data = b"".join(items)
+    elif types <= {str}:
+        text = "".join(items)
+        if text.isascii():
+            # ASCII strings have as many bytes as characters, so they can be encoded at once
+            data = text.encode("ascii")
+        else:
+            items = [item.encode("utf-8") for item in items]
+            data = b"".join(items)
+    else:
+        items = [item.encode("utf-8") if isinstance(item, str) else bytes(item) for item in items]
+        data = b"".join(items)
+    return np.frombuffer(data, dtype=np.uint8), np.fromiter(map(len, items), dtype=np.int64, count=len(items))
+
+
+def _items(values: typing.Any) -> typing.List[typing.Any]:
+    """Return the elements of a NumPy or PyArrow array, or of a sequence, as a flat list of Python objects."""
+    import numpy as np
+
+    if type(values).__module__.startswith("pyarrow"):
+        return values.to_pylist()
+    return values.ravel().tolist() if isinstance(values, np.ndarray) else list(values)
+
+
+def _join_arrow(values: typing.Any) -> typing.Optional[typing.Tuple["np.ndarray", "np.ndarray"]]:
+    """Return the data and lengths of a PyArrow string or binary array from its buffers, or None for other types."""
+    import numpy as np
+    import pyarrow as pa
+
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    if pa.types.is_string(values.type) or pa.types.is_binary(values.type):
+        offset_dtype: np.dtype = np.dtype("<i4")
+    elif pa.types.is_large_string(values.type) or pa.types.is_large_binary(values.type):
+        offset_dtype = np.dtype("<i8")
+    else:
+        return None
+    if values.null_count:
+        raise ValueError("BYTES tensors cannot hold nulls")
+    if len(values) == 0:
+        return np.empty(0, dtype=np.uint8), np.empty(0, dtype=np.int64)
+
+    _, offsets_buffer, data_buffer = values.buffers()
+    offsets = np.frombuffer(offsets_buffer, dtype=offset_dtype)[values.offset : values.offset + len(values) + 1]
+    data = np.frombuffer(data_buffer or b"", dtype=np.uint8)[offsets[0] : offsets[-1]]
+    return data, np.diff(offsets).astype(np.int64)
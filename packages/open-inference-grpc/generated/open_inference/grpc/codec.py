@@ -0,0 +1,273 @@
+# Copyright 2023 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Conversion between NumPy arrays and Open Inference Protocol tensors.
+
+Tensors are carried in the ``raw_input_contents`` / ``raw_output_contents`` fields of the inference messages as
+little-endian buffers, one entry per tensor in the same order as ``inputs`` / ``outputs``. This avoids building the
+per-element repeated fields of ``InferTensorContents``, which is the dominant cost for large tensors.
+
+``BYTES`` tensors, of ``bytes`` or ``str`` elements, are the exception: protobuf fills and parses the repeated
+``bytes_contents`` field in compiled code, faster than the length-prefixed buffers of
+``open_inference.grpc.bytes_codec`` are built and walked in Python. Messages whose tensors are all ``BYTES`` are sent in
+``bytes_contents``. The protocol does not allow raw and typed contents in one message, so ``BYTES`` tensors sent along
+with other datatypes are carried as length-prefixed buffers.
+
+``InferTensorContents`` has no field for half-precision floats, so ``FP16`` and ``BF16`` tensors can only be sent in
+raw contents, at half the size of ``FP32``. NumPy has no ``bfloat16`` dtype of its own: ``BF16`` tensors are encoded
+from float arrays, or from the ``bfloat16`` arrays of ``ml_dtypes``, and decoded into ``float32`` arrays.
+
+Requires the ``numpy`` extra: ``pip install open-inference-grpc[numpy]``.
+"""
+import typing
+
+import numpy as np
+import numpy.typing as npt
+
+from open_inference.grpc.bytes_codec import bytes_elements, decode_bytes_tensor, encode_bytes_tensor
+from open_inference.grpc.protocol import InferParameter, ModelInferRequest, ModelInferResponse, ModelMetadataResponse
+
+DATATYPES: typing.Dict[str, np.dtype] = {
+    "BOOL": np.dtype(np.bool_),
+    "UINT8": np.dtype("<u1"),
+    "UINT16": np.dtype("<u2"),
+    "UINT32": np.dtype("<u4"),
+    "UINT64": np.dtype("<u8"),
+    "INT8": np.dtype("<i1"),
+    "INT16": np.dtype("<i2"),
+    "INT32": np.dtype("<i4"),
+    "INT64": np.dtype("<i8"),
+    "FP16": np.dtype("<f2"),
+    "FP32": np.dtype("<f4"),
+    "FP64": np.dtype("<f8"),
+}
+
+# InferTensorContents field holding each datatype, used when a server replies without raw contents
+CONTENTS_FIELDS: typing.Dict[str, str] = {
+    "BOOL": "bool_contents",
+    "UINT8": "uint_contents",
+    "UINT16": "uint_contents",
+    "UINT32": "uint_contents",
+    "UINT64": "uint64_contents",
+    "INT8": "int_contents",
+    "INT16": "int_contents",
+    "INT32": "int_contents",
+    "INT64": "int64_contents",
+    "FP32": "fp32_contents",
+    "FP64": "fp64_contents",
+    "BYTES": "bytes_contents",
+}
+
+# Half-precision datatypes that FP32 and FP64 inputs are down-cast to, when a model declares them
+HALF_PRECISION_DATATYPES = frozenset({"FP16", "BF16"})
+
+# Kinds of NumPy dtypes holding BYTES elements: objects, fixed-width bytes and strings, and StringDType strings
+_BYTES_KINDS = "OSUT"
+
+_DATATYPES_BY_KIND: typing.Dict[typing.Tuple[str, int], str] = {
+    (dtype.kind, dtype.itemsize): datatype for datatype, dtype in DATATYPES.items()
+}
+
+
+def datatype_of(dtype: npt.DTypeLike) -> str:
+    """Return the Open Inference Protocol datatype string for a NumPy dtype."""
+    dtype = np.dtype(dtype)
+    if dtype.kind in _BYTES_KINDS:
+        return "BYTES"
+    if dtype.name == "bfloat16":
+        return "BF16"
+    try:
+        return _DATATYPES_BY_KIND[(dtype.kind, dtype.itemsize)]
+    except KeyError:
+        raise ValueError(f"NumPy dtype {dtype} has no Open Inference Protocol datatype") from None
+
+
+def dtype_of(datatype: str) -> np.dtype:
+    """Return the little-endian NumPy dtype for an Open Inference Protocol datatype string."""
+    try:
+        return DATATYPES[datatype]
+    except KeyError:
+        raise ValueError(f"Datatype {datatype!r} cannot be represented as a NumPy array") from None
+
+
+def encode_infer_request(
+    model_name: str,
+    inputs: typing.Mapping[str, np.ndarray],
+    *,
+    model_version: typing.Optional[str] = None,
+    id: typing.Optional[str] = None,
+    parameters: typing.Optional[typing.Mapping[str, InferParameter]] = None,
+    outputs: typing.Optional[typing.Iterable[str]] = None,
+    metadata: typing.Optional[ModelMetadataResponse] = None,
+) -> ModelInferRequest:
+    """Build a ``ModelInferRequest`` with each array of ``inputs`` placed in ``raw_input_contents``.
+
+    Arrays that are already C-contiguous and little-endian are handed to protobuf as a single buffer copy, anything
+    else is converted once. Requests of only ``BYTES`` inputs are sent in ``bytes_contents`` instead. ``outputs``
+    optionally names the output tensors to request.
+
+    Given the ``metadata`` of the model, ``float32`` and ``float64`` arrays of the inputs it declares as ``FP16`` or
+    ``BF16`` are down-cast to that datatype, halving or quartering their size. Other inputs are sent as they are::
+
+        metadata = stub.ModelMetadata(ModelMetadataRequest(name="text-encoder"))
+        request = encode_infer_request("text-encoder", {"embeddings": embeddings}, metadata=metadata)
+    """
+    declared: typing.Dict[str, str] = {}
+    if metadata is not None:
+        declared = {tensor.name: tensor.datatype for tensor in metadata.inputs}
+
+    request = ModelInferRequest(model_name=model_name, id=id, parameters=parameters)
+    if model_version is not None:
+        request.model_version = model_version
+
+    arrays = {name: np.asarray(array) for name, array in inputs.items()}
+    datatypes = {name: datatype_of(array.dtype) for name, array in arrays.items()}
+    raw = any(datatype != "BYTES" for datatype in datatypes.values())
+    for name, array in arrays.items():
+        datatype = datatypes[name]
+        if datatype in ("FP32", "FP64") and declared.get(name) in HALF_PRECISION_DATATYPES:
+            datatype = declared[name]
+        tensor = request.inputs.add(name=name, datatype=datatype, shape=array.shape)
+        if raw:
+            request.raw_input_contents.append(_to_bytes(array, datatype))
+        else:
+            tensor.contents.bytes_contents.extend(bytes_elements(array))
+
+    for output in outputs or ():
+        request.outputs.add(name=output)
+
+    return request
+
+
+def decode_infer_response(response: ModelInferResponse) -> typing.Dict[str, np.ndarray]:
+    """Return the outputs of a ``ModelInferResponse`` as arrays keyed by tensor name.
+
+    Outputs sent in ``raw_output_contents`` are returned as read-only ``np.frombuffer`` views over the ``bytes`` of
+    their entry, which protobuf copies out of the message once per tensor, with its compiled ``upb`` backend, and
+    which are not copied again. Outputs sent in the typed ``contents`` fields are converted into new arrays. ``BYTES``
+    outputs are returned as arrays of ``bytes`` objects, and ``BF16`` outputs as new ``float32`` arrays.
+    """
+    if response.raw_output_contents and len(response.raw_output_contents) != len(response.outputs):
+        raise ValueError(
+            f"Response has {len(response.outputs)} outputs but {len(response.raw_output_contents)}"
+            " raw_output_contents entries"
+        )
+    return _decode_tensors(response.outputs, response.raw_output_contents)
+
+
+def decode_infer_request(request: ModelInferRequest) -> typing.Dict[str, np.ndarray]:
+    """Return the inputs of a ``ModelInferRequest`` as arrays keyed by tensor name, for servers.
+
+    The counterpart of ``decode_infer_response``: inputs sent in ``raw_input_contents`` are returned as read-only views
+    over the ``bytes`` of their entry, which protobuf copies out of the request once per tensor, and inputs sent in the
+    typed ``contents`` fields as new arrays.
+    """
+    if request.raw_input_contents and len(request.raw_input_contents) != len(request.inputs):
+        raise ValueError(
+            f"Request has {len(request.inputs)} inputs but {len(request.raw_input_contents)} raw_input_contents"
+            " entries"
+        )
+    return _decode_tensors(request.inputs, request.raw_input_contents)
+
+
+def encode_infer_response(
+    model_name: str,
+    outputs: typing.Mapping[str, np.ndarray],
+    *,
+    model_version: typing.Optional[str] = None,
+    id: typing.Optional[str] = None,
+    parameters: typing.Optional[typing.Mapping[str, InferParameter]] = None,
+) -> ModelInferResponse:
+    """Build a ``ModelInferResponse`` with each array of ``outputs`` placed in ``raw_output_contents``, for servers.
+
+    The counterpart of ``encode_infer_request``, converting each array as it does, and sending responses of only
+    ``BYTES`` outputs in ``bytes_contents``.
+    """
+    response = ModelInferResponse(model_name=model_name, id=id, parameters=parameters)
+    if model_version is not None:
+        response.model_version = model_version
+
+    arrays = {name: np.asarray(array) for name, array in outputs.items()}
+    datatypes = {name: datatype_of(array.dtype) for name, array in arrays.items()}
+    raw = any(datatype != "BYTES" for datatype in datatypes.values())
+    for name, array in arrays.items():
+        tensor = response.outputs.add(name=name, datatype=datatypes[name], shape=array.shape)
+        if raw:
+            response.raw_output_contents.append(_to_bytes(array, datatypes[name]))
+        else:
+            tensor.contents.bytes_contents.extend(bytes_elements(array))
+
+    return response
+
+
+def to_bfloat16(array: npt.ArrayLike) -> np.ndarray:
+    """Return the ``BF16`` bit patterns of a float array as ``<u2`` integers, rounding to the nearest even."""
+    array = np.asarray(array)
+    if array.dtype.name == "bfloat16":
+        return array.view(np.uint16).astype("<u2", copy=False)
+    bits = np.asarray(array, dtype=np.float32).view(np.uint32)
+    # Adds half of the dropped 16 bits, minus one when the kept bits are even, so that ties round to even
+    rounded = ((bits + (0x7FFF + ((bits >> 16) & 1))) >> 16).astype("<u2")
+    nan = np.isnan(array)
+    if nan.any():
+        # Rounding could carry a NaN's payload into infinity, keep it quiet instead
+        rounded[nan] = ((bits[nan] >> 16) | 0x0040).astype("<u2")
+    return rounded
+
+
+def from_bfloat16(bits: npt.ArrayLike) -> np.ndarray:
+    """Return the ``float32`` values of ``BF16`` bit patterns, given as 16-bit unsigned integers."""
+    return (np.asarray(bits, dtype="<u2").astype(np.uint32) << 16).view(np.float32)
+
+
+def _to_bytes(array: np.ndarray, datatype: str) -> bytes:
+    if datatype == "BYTES":
+        return encode_bytes_tensor(array)
+    if datatype == "BF16":
+        return to_bfloat16(array).tobytes()
+    return np.ascontiguousarray(array, dtype=DATATYPES[datatype]).tobytes()
+
+
+def _decode_tensors(
+    tensors: typing.Sequence[typing.Any], raw_contents: typing.Sequence[bytes]
+) -> typing.Dict[str, np.ndarray]:
+    arrays = {}
+    for index, tensor in enumerate(tensors):
+        if tensor.datatype == "BYTES":
+            arrays[tensor.name] = _bytes_tensor(tensor, raw_contents[index] if raw_contents else None)
+            continue
+        if tensor.datatype == "BF16" and raw_contents:
+            arrays[tensor.name] = from_bfloat16(np.frombuffer(raw_contents[index], dtype="<u2")).reshape(
+                tuple(tensor.shape)
+            )
+            continue
+        dtype = dtype_of(tensor.datatype)
+        if raw_contents:
+            array = np.frombuffer(raw_contents[index], dtype=dtype)
+        elif tensor.datatype in CONTENTS_FIELDS:
+            array = np.asarray(getattr(tensor.contents, CONTENTS_FIELDS[tensor.datatype]), dtype=dtype)
+        else:
+            raise ValueError(f"Tensor {tensor.name!r} has datatype {tensor.datatype} but no raw contents")
+        arrays[tensor.name] = array.reshape(tuple(tensor.shape))
+    return arrays
+
+
+def _bytes_tensor(tensor: typing.Any, raw_content: typing.Optional[bytes]) -> np.ndarray:
+    shape = tuple(tensor.shape)
+    if raw_content is not None:
+        array = decode_bytes_tensor(raw_content, count=int(np.prod(shape, dtype=np.int64)))
+    else:
+        array = np.empty(len(tensor.contents.bytes_contents), dtype=object)
+        array[:] = list(tensor.contents.bytes_contents)
+    return array.reshape(shape)
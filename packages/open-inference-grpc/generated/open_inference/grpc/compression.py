@@ -0,0 +1,178 @@
+# Copyright 2023 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compression of large inference requests, chosen per call from their serialized size.
+
+``CompressingStub`` (for ``grpc`` channels) and ``AsyncCompressingStub`` (for ``grpc.aio`` channels) wrap a
+``GRPCInferenceServiceStub``, and send ``ModelInfer`` calls with the ``compression`` of a ``CompressionPolicy`` when
+their request serializes to at least its ``min_bytes``. Smaller requests, which compression would slow down more than
+it shrinks them, and every other RPC are sent uncompressed.
+
+gRPC compresses messages itself, in its C core, so the ratio and CPU time of compression cannot be observed on the
+calls. Instead one in ``sample_every`` compressed requests is also compressed with ``zlib`` at its default level, as
+gRPC does, and ``CompressionStats`` report the sizes and CPU time measured on these samples. Responses are compressed
+at the discretion of the server, and gRPC decompresses them whatever the policy.
+"""
+import gzip
+import threading
+import time
+import typing
+import zlib
+
+import grpc
+
+from open_inference.grpc.protocol import ModelInferRequest, ModelInferResponse
+from open_inference.grpc.service import GRPCInferenceServiceStub
+
+Metadata = typing.Optional[typing.Sequence[typing.Tuple[str, typing.Union[str, bytes]]]]
+
+
+class CompressionStats(typing.NamedTuple):
+    """Counters of the requests seen by a ``CompressionPolicy``."""
+
+    requests: int
+    #: Number of requests sent compressed
+    compressed: int
+    #: Number of compressed requests also compressed by the policy, to measure the following
+    sampled: int
+    #: Serialized size of the sampled requests, before and after compression
+    original_bytes: int
+    compressed_bytes: int
+    #: CPU time spent compressing the sampled requests
+    cpu_seconds: float
+
+    @property
+    def ratio(self) -> float:
+        """Compressed size of the sampled requests over their original size, or 1.0 before any sample."""
+        return self.compressed_bytes / self.original_bytes if self.original_bytes else 1.0
+
+
+class CompressionPolicy:
+    """Which requests are compressed, with which algorithm, along with their compression statistics.
+
+    Requests of at least ``min_bytes`` once serialized are sent with ``compression``, a ``grpc.Compression``.
+    ``thresholds`` overrides ``min_bytes`` for some models, or disables compression for them with None. Statistics are
+    kept per model, measured on one in ``sample_every`` compressed requests, or on none when it is 0. A policy can be
+    shared between stubs, and used from several threads.
+    """
+
+    def __init__(
+        self,
+        compression: grpc.Compression = grpc.Compression.Gzip,
+        *,
+        min_bytes: int = 32 * 1024,
+        thresholds: typing.Optional[typing.Mapping[str, typing.Optional[int]]] = None,
+        sample_every: int = 16,
+    ) -> None:
+        if compression not in (grpc.Compression.Gzip, grpc.Compression.Deflate):
+            raise ValueError(f"compression must be grpc.Compression.Gzip or Deflate, not {compression!r}")
+        self.compression = compression
+        self.min_bytes = min_bytes
+        self.thresholds = dict(thresholds or {})
+        self.sample_every = sample_every
+        self._lock = threading.Lock()
+        # Counters of each model, in the order of the fields of CompressionStats
+        self._counters: typing.Dict[str, typing.List[typing.Any]] = {}
+
+    def stats(self, model_name: typing.Optional[str] = None) -> CompressionStats:
+        """Return the statistics of the requests to ``model_name``, or of all requests when it is None."""
+        with self._lock:
+            if model_name is not None:
+                return CompressionStats(*self._counters.get(model_name, [0, 0, 0, 0, 0, 0.0]))
+            return CompressionStats(*(sum(column) for column in zip([0, 0, 0, 0, 0, 0.0], *self._counters.values())))
+
+    def compression_for(self, request: ModelInferRequest) -> typing.Optional[grpc.Compression]:
+        """Return the compression to send ``request`` with, or None to send it uncompressed, and count it."""
+        threshold = self.thresholds.get(request.model_name, self.min_bytes)
+        compress = threshold is not None and request.ByteSize() >= threshold
+        with self._lock:
+            counters = self._counters.setdefault(request.model_name, [0, 0, 0, 0, 0, 0.0])
+            counters[0] += 1
+            if not compress:
+                return None
+            counters[1] += 1
+            sample = self.sample_every > 0 and (counters[1] - 1) % self.sample_every == 0
+        if sample:
+            self._sample(request)
+        return self.compression
+
+    def _sample(self, request: ModelInferRequest) -> None:
+        data = request.SerializeToString()
+        start = time.thread_time()
+        if self.compression == grpc.Compression.Gzip:
+            compressed = len(gzip.compress(data, mtime=0))
+        else:
+            compressed = len(zlib.compress(data))
+        elapsed = time.thread_time() - start
+        with self._lock:
+            counters = self._counters[request.model_name]
+            counters[2] += 1
+            counters[3] += len(data)
+            counters[4] += compressed
+            counters[5] += elapsed
+
+
+class CompressingStub:
+    """Sends the ``ModelInfer`` calls of a ``GRPCInferenceServiceStub`` compressed according to a ``CompressionPolicy``.
+
+    Calls given a ``compression`` of their own keep it. Every other RPC of the wrapped stub is available unchanged::
+
+        client = CompressingStub(GRPCInferenceServiceStub(channel), policy=CompressionPolicy(min_bytes=64 * 1024))
+        client.ModelInfer(encode_infer_request("iris-model", {"input-0": samples}))
+        print(client.policy.stats("iris-model").ratio)
+    """
+
+    def __init__(self, stub: GRPCInferenceServiceStub, *, policy: typing.Optional[CompressionPolicy] = None) -> None:
+        self._stub = stub
+        self.policy = CompressionPolicy() if policy is None else policy
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self._stub, name)
+
+    def ModelInfer(
+        self,
+        request: ModelInferRequest,
+        timeout: typing.Optional[float] = None,
+        metadata: Metadata = None,
+        **kwargs: typing.Any,
+    ) -> ModelInferResponse:
+        if kwargs.get("compression") is None:
+            kwargs["compression"] = self.policy.compression_for(request)
+        return self._stub.ModelInfer(request, timeout=timeout, metadata=metadata, **kwargs)
+
+
+class AsyncCompressingStub:
+    """Sends the ``ModelInfer`` calls of a ``grpc.aio`` ``GRPCInferenceServiceStub`` compressed according to a
+    ``CompressionPolicy``.
+
+    Calls given a ``compression`` of their own keep it. Every other RPC of the wrapped stub is available unchanged.
+    """
+
+    def __init__(self, stub: GRPCInferenceServiceStub, *, policy: typing.Optional[CompressionPolicy] = None) -> None:
+        self._stub = stub
+        self.policy = CompressionPolicy() if policy is None else policy
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self._stub, name)
+
+    async def ModelInfer(
+        self,
+        request: ModelInferRequest,
+        timeout: typing.Optional[float] = None,
+        metadata: Metadata = None,
+        **kwargs: typing.Any,
+    ) -> ModelInferResponse:
+        if kwargs.get("compression") is None:
+            kwargs["compression"] = self.policy.compression_for(request)
+        return await self._stub.ModelInfer(request, timeout=timeout, metadata=metadata, **kwargs)
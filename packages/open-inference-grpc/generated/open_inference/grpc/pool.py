@@ -0,0 +1,287 @@
+# Copyright 2023 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Pools of gRPC channels to spread calls over several HTTP/2 connections.
+
+A single channel multiplexes every call over one connection, which caps throughput through its stream limits and
+frame handling. ``ChannelPool`` (for ``grpc``) and ``AsyncChannelPool`` (for ``grpc.aio``) open several channels, each
+with its own ``GRPCInferenceServiceStub``, and can be used in place of a stub: every call goes to the channel with the
+fewest calls in flight. A ``ModelStreamInfer`` stream counts as one call in flight on its channel until it ends.
+"""
+import abc
+import itertools
+import socket
+import threading
+import typing
+
+import grpc
+
+from open_inference.grpc.service import GRPCInferenceServiceStub
+
+# Large enough for big tensors, where gRPC otherwise rejects received messages over 4 MiB
+MAX_MESSAGE_LENGTH = 1 << 30
+
+DEFAULT_CHANNEL_OPTIONS: typing.List[typing.Tuple[str, typing.Any]] = [
+    ("grpc.max_send_message_length", MAX_MESSAGE_LENGTH),
+    ("grpc.max_receive_message_length", MAX_MESSAGE_LENGTH),
+    # Without a local pool, channels to the same target with the same options share their connection
+    ("grpc.use_local_subchannel_pool", 1),
+]
+
+# RPCs returning a stream of responses, rather than a response
+_STREAMING_METHODS = frozenset({"ModelStreamInfer"})
+
+ChannelOptions = typing.Sequence[typing.Tuple[str, typing.Any]]
+
+
+def resolve_endpoints(target: str) -> typing.List[str]:
+    """Resolve the host of a ``host:port`` target to one target per distinct address.
+
+    Raises ``ValueError`` for targets of another form, such as those without a port or with a scheme like ``dns:///``,
+    which gRPC resolves itself.
+    """
+    host, _, port = target.rpartition(":")
+    if not host or not port.isdigit() or "/" in host or (":" in host and not host.startswith("[")):
+        raise ValueError(f"Only host:port targets can be resolved, not {target!r}")
+    host = host.strip("[]")
+    addresses = []
+    for family, _, _, _, sockaddr in socket.getaddrinfo(host, int(port), type=socket.SOCK_STREAM):
+        address = f"[{sockaddr[0]}]:{port}" if family == socket.AF_INET6 else f"{sockaddr[0]}:{port}"
+        if address not in addresses:
+            addresses.append(address)
+    return addresses
+
+
+class _ChannelPoolBase(abc.ABC):
+    def __init__(
+        self,
+        target: typing.Union[str, typing.Sequence[str]],
+        *,
+        size: typing.Optional[int],
+        credentials: typing.Optional[grpc.ChannelCredentials],
+        options: ChannelOptions,
+        resolve: bool,
+    ) -> None:
+        targets = [target] if isinstance(target, str) else list(target)
+        if not targets:
+            raise ValueError("At least one target is required")
+
+        # Certificates are checked against the host name rather than the resolved addresses
+        host_options = {}
+        if resolve:
+            resolved = []
+            for name in targets:
+                for address in resolve_endpoints(name):
+                    resolved.append(address)
+                    host_options[address] = name.rpartition(":")[0].strip("[]")
+            targets = resolved
+
+        size = len(targets) if size is None else size
+        if size < 1:
+            raise ValueError(f"size must be at least 1, got {size}")
+        merged_options = dict(DEFAULT_CHANNEL_OPTIONS)
+        merged_options.update(options)
+
+        self.targets = [targets[index % len(targets)] for index in range(size)]
+        self.channels = []
+        for channel_target in self.targets:
+            channel_options = dict(merged_options)
+            if credentials is not None and channel_target in host_options:
+                channel_options.setdefault("grpc.ssl_target_name_override", host_options[channel_target])
+            self.channels.append(self._open_channel(channel_target, credentials, list(channel_options.items())))
+        self.stubs = [GRPCInferenceServiceStub(channel) for channel in self.channels]
+        self.methods = frozenset(name for name in vars(self.stubs[0]) if not name.startswith("_"))
+
+        self._outstanding = [0] * size
+        self._lock = threading.Lock()
+        self._rotation = itertools.cycle(range(size))
+
+    @abc.abstractmethod
+    def _open_channel(
+        self, target: str, credentials: typing.Optional[grpc.ChannelCredentials], options: ChannelOptions
+    ) -> typing.Any:
+        """Open a channel of the pool."""
+
+    @property
+    def outstanding(self) -> typing.List[int]:
+        """Number of calls in flight on each channel."""
+        return list(self._outstanding)
+
+    def _acquire(self) -> int:
+        """Pick the channel with the fewest calls in flight, rotating between ties, and count one more call on it."""
+        with self._lock:
+            start = next(self._rotation)
+            size = len(self._outstanding)
+            index = min((position % size for position in range(start, start + size)), key=self._outstanding.__getitem__)
+            self._outstanding[index] += 1
+            return index
+
+    def _release(self, index: int) -> None:
+        with self._lock:
+            self._outstanding[index] -= 1
+
+    def _invoke(
+        self,
+        name: str,
+        variant: typing.Optional[str],
+        args: typing.Tuple[typing.Any, ...],
+        kwargs: typing.Dict[str, typing.Any],
+    ) -> typing.Any:
+        """Make a call, with ``variant`` of the method if given, on the channel with the fewest calls in flight."""
+        index = self._acquire()
+        try:
+            return _variant(self.stubs[index], name, variant)(*args, **kwargs)
+        finally:
+            self._release(index)
+
+    def _start(
+        self,
+        name: str,
+        variant: typing.Optional[str],
+        args: typing.Tuple[typing.Any, ...],
+        kwargs: typing.Dict[str, typing.Any],
+    ) -> typing.Any:
+        """Start a call on the channel with the fewest calls in flight, counting it as a call until it ends."""
+        index = self._acquire()
+        try:
+            call = _variant(self.stubs[index], name, variant)(*args, **kwargs)
+        except BaseException:
+            self._release(index)
+            raise
+        call.add_done_callback(lambda _: self._release(index))
+        return call
+
+
+class ChannelPool(_ChannelPoolBase):
+    """Spreads calls over ``size`` ``grpc`` channels, sending each to the one with the fewest calls in flight.
+
+    ``target`` is a single target, which every channel connects to, or a list of targets shared out between the
+    channels in turn. With ``resolve``, the host of each target is first resolved and the channels are shared out
+    between its addresses. ``size`` defaults to the number of targets. ``options`` are added to, and override,
+    ``DEFAULT_CHANNEL_OPTIONS``. Channels are secure when ``credentials`` are given.
+
+    The pool has the methods of ``GRPCInferenceServiceStub``, with their ``with_call`` and ``future``::
+
+        with ChannelPool("localhost:8081", size=4) as client:
+            client.ModelInfer(request)
+    """
+
+    def __init__(
+        self,
+        target: typing.Union[str, typing.Sequence[str]],
+        *,
+        size: typing.Optional[int] = None,
+        credentials: typing.Optional[grpc.ChannelCredentials] = None,
+        options: ChannelOptions = (),
+        resolve: bool = False,
+    ) -> None:
+        super().__init__(target, size=size, credentials=credentials, options=options, resolve=resolve)
+
+    def _open_channel(
+        self, target: str, credentials: typing.Optional[grpc.ChannelCredentials], options: ChannelOptions
+    ) -> grpc.Channel:
+        if credentials is None:
+            return grpc.insecure_channel(target, options=options)
+        return grpc.secure_channel(target, credentials, options=options)
+
+    def __getattr__(self, name: str) -> "_PooledMethod":
+        if name not in self.__dict__.get("methods", ()):
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        return _PooledMethod(self, name)
+
+    def close(self) -> None:
+        for channel in self.channels:
+            channel.close()
+
+    def __enter__(self) -> "ChannelPool":
+        return self
+
+    def __exit__(self, *exc_info: typing.Any) -> None:
+        self.close()
+
+
+class AsyncChannelPool(_ChannelPoolBase):
+    """Spreads calls over ``size`` ``grpc.aio`` channels, sending each to the one with the fewest calls in flight.
+
+    Takes the same arguments as ``ChannelPool``. The pool has the methods of ``GRPCInferenceServiceStub``, returning
+    the ``grpc.aio`` call of the channel they were sent on, to be awaited or iterated::
+
+        async with AsyncChannelPool("localhost:8081", size=4) as client:
+            await client.ModelInfer(request)
+    """
+
+    def __init__(
+        self,
+        target: typing.Union[str, typing.Sequence[str]],
+        *,
+        size: typing.Optional[int] = None,
+        credentials: typing.Optional[grpc.ChannelCredentials] = None,
+        options: ChannelOptions = (),
+        resolve: bool = False,
+    ) -> None:
+        super().__init__(target, size=size, credentials=credentials, options=options, resolve=resolve)
+
+    def _open_channel(
+        self, target: str, credentials: typing.Optional[grpc.ChannelCredentials], options: ChannelOptions
+    ) -> grpc.aio.Channel:
+        if credentials is None:
+            return grpc.aio.insecure_channel(target, options=options)
+        return grpc.aio.secure_channel(target, credentials, options=options)
+
+    def __getattr__(self, name: str) -> typing.Callable[..., typing.Any]:
+        if name not in self.__dict__.get("methods", ()):
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+        def call(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+            return self._start(name, None, args, kwargs)
+
+        call.__name__ = name
+        return call
+
+    async def close(self) -> None:
+        for channel in self.channels:
+            await channel.close()
+
+    async def __aenter__(self) -> "AsyncChannelPool":
+        return self
+
+    async def __aexit__(self, *exc_info: typing.Any) -> None:
+        await self.close()
+
+
+class _PooledMethod:
+    """A method of a ``ChannelPool``, with the ``__call__``, ``with_call`` and ``future`` of gRPC's multicallables.
+
+    Each call is sent with the stub of the channel with the fewest calls in flight.
+    """
+
+    def __init__(self, pool: ChannelPool, name: str) -> None:
+        self._pool = pool
+        self.__name__ = name
+
+    def __call__(self, *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        if self.__name__ in _STREAMING_METHODS:
+            return self._pool._start(self.__name__, None, args, kwargs)
+        return self._pool._invoke(self.__name__, None, args, kwargs)
+
+    def with_call(self, *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        return self._pool._invoke(self.__name__, "with_call", args, kwargs)
+
+    def future(self, *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        return self._pool._start(self.__name__, "future", args, kwargs)
+
+
+def _variant(stub: GRPCInferenceServiceStub, name: str, variant: typing.Optional[str]) -> typing.Any:
+    method = getattr(stub, name)
+    return method if variant is None else getattr(method, variant)
@@ -0,0 +1,462 @@
+# Copyright 2023 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Latency-aware routing of calls over replicas of a model server, with optional request hedging.
+
+``ReplicaPool`` (for ``grpc``) and ``AsyncReplicaPool`` (for ``grpc.aio``) open a channel to each of several targets
+serving the same models, and can be used in place of a stub. They track an exponentially weighted moving average
+(EWMA) of the latency of each replica, and send every call to the better of two replicas picked at random, weighing
+their latency by their calls in flight (power of two choices). The latency of a replica left idle decays, so that a
+replica once slow is tried again. Replicas that fail ``ServerReady`` in ``check_readiness``, or whose calls fail as
+``UNAVAILABLE``, are left out until they are found ready again.
+
+With ``hedge_quantile``, a ``ModelInfer`` call still unanswered after that quantile of recent ``ModelInfer``
+latencies is sent again to a second replica. The first response wins, and the other call is cancelled.
+"""
+import abc
+import asyncio
+import collections
+import queue
+import random
+import threading
+import time
+import typing
+
+import grpc
+
+from open_inference.grpc.pool import DEFAULT_CHANNEL_OPTIONS, ChannelOptions
+from open_inference.grpc.protocol import ServerReadyRequest
+from open_inference.grpc.service import GRPCInferenceServiceStub
+
+# RPCs sent again to a second replica when hedging
+HEDGED_METHODS = frozenset({"ModelInfer"})
+# RPCs whose latency is not a call's, but a stream's
+_STREAMING_METHODS = frozenset({"ModelStreamInfer"})
+# Hedging starts once this many latencies are known
+_MIN_HEDGE_SAMPLES = 20
+# Latencies kept to estimate the hedging delay, and how often it is estimated again
+_HEDGE_WINDOW = 512
+_HEDGE_REFRESH = 16
+# Seconds over which the latency of a replica left idle counts half as much, so that a replica once slow is tried again
+_IDLE_HALF_LIFE = 5.0
+
+
+class ReplicaStats(typing.NamedTuple):
+    """State of one replica of a ``ReplicaPool``."""
+
+    target: str
+    ready: bool
+    #: Moving average of the latency of the replica's calls in seconds, or None before its first call
+    latency: typing.Optional[float]
+    #: Number of calls in flight on the replica
+    outstanding: int
+
+
+class _Replica:
+    def __init__(self, target: str, channel: typing.Any) -> None:
+        self.target = target
+        self.channel = channel
+        self.stub = GRPCInferenceServiceStub(channel)
+        self.latency: typing.Optional[float] = None
+        self.updated = 0.0
+        self.outstanding = 0
+        self.ready = True
+
+    def cost(self, now: float) -> float:
+        # Replicas without a known latency are tried first
+        if self.latency is None:
+            return 0.0
+        return self.latency * 0.5 ** ((now - self.updated) / _IDLE_HALF_LIFE) * (self.outstanding + 1)
+
+
+class _ReplicaPoolBase(abc.ABC):
+    def __init__(
+        self,
+        targets: typing.Sequence[str],
+        *,
+        credentials: typing.Optional[grpc.ChannelCredentials],
+        options: ChannelOptions,
+        alpha: float,
+        hedge_quantile: typing.Optional[float],
+    ) -> None:
+        if not targets:
+            raise ValueError("At least one target is required")
+        if not 0 < alpha <= 1:
+            raise ValueError(f"alpha must be in (0, 1], got {alpha}")
+        if hedge_quantile is not None and not 0 < hedge_quantile < 1:
+            raise ValueError(f"hedge_quantile must be in (0, 1), got {hedge_quantile}")
+        merged_options = dict(DEFAULT_CHANNEL_OPTIONS)
+        merged_options.update(options)
+
+        self.alpha = alpha
+        self.hedge_quantile = hedge_quantile
+        self.replicas = [
+            _Replica(target, self._open_channel(target, credentials, list(merged_options.items())))
+            for target in targets
+        ]
+        self.methods = frozenset(name for name in vars(self.replicas[0].stub) if not name.startswith("_"))
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self._latencies: typing.Deque[float] = collections.deque(maxlen=_HEDGE_WINDOW)
+        self._hedge_delay: typing.Optional[float] = None
+        self._since_estimate = 0
+
+    @abc.abstractmethod
+    def _open_channel(
+        self, target: str, credentials: typing.Optional[grpc.ChannelCredentials], options: ChannelOptions
+    ) -> typing.Any:
+        """Open the channel to a replica."""
+
+    @property
+    def stats(self) -> typing.List[ReplicaStats]:
+        with self._lock:
+            return [
+                ReplicaStats(replica.target, replica.ready, replica.latency, replica.outstanding)
+                for replica in self.replicas
+            ]
+
+    @property
+    def hedge_delay(self) -> typing.Optional[float]:
+        """Seconds after which a hedged call is sent to a second replica, or None while it is not hedged."""
+        return self._hedge_delay if self.hedge_quantile is not None else None
+
+    def _acquire(self, exclude: typing.Optional[_Replica] = None) -> _Replica:
+        """Pick the cheaper of two random ready replicas, or of any two if none is ready, and count a call on it."""
+        with self._lock:
+            candidates = [replica for replica in self.replicas if replica.ready and replica is not exclude]
+            if not candidates:
+                candidates = [replica for replica in self.replicas if replica is not exclude] or self.replicas
+            # Sampled even when there are only two, so that ties, such as between replicas without a latency yet, are
+            # broken at random rather than in favour of the first replica
+            candidates = self._random.sample(candidates, min(len(candidates), 2))
+            now = time.monotonic()
+            replica = min(candidates, key=lambda candidate: (candidate.cost(now), candidate.outstanding))
+            replica.outstanding += 1
+            return replica
+
+    def _release(self, replica: _Replica, name: str, latency: typing.Optional[float]) -> None:
+        """Count a call off ``replica``, recording the ``latency`` of a successful call or None for a failed one."""
+        with self._lock:
+            replica.outstanding -= 1
+            if latency is None:
+                return
+            replica.latency = (
+                latency if replica.latency is None else replica.latency + self.alpha * (latency - replica.latency)
+            )
+            replica.updated = time.monotonic()
+            if name in HEDGED_METHODS and self.hedge_quantile is not None:
+                self._latencies.append(latency)
+                self._since_estimate += 1
+                if self._since_estimate >= _HEDGE_REFRESH and len(self._latencies) >= _MIN_HEDGE_SAMPLES:
+                    ordered = sorted(self._latencies)
+                    self._hedge_delay = ordered[int(self.hedge_quantile * (len(ordered) - 1))]
+                    self._since_estimate = 0
+
+    def _release_cancelled(self, replica: _Replica, elapsed: float) -> None:
+        """Count a cancelled call off ``replica``, such as the loser of a hedge, whose latency was at least ``elapsed``.
+
+        Without it, a replica slow enough to always lose would never get a latency, and be picked first every time.
+        """
+        with self._lock:
+            replica.outstanding -= 1
+            replica.latency = elapsed if replica.latency is None else max(replica.latency, elapsed)
+            replica.updated = time.monotonic()
+
+    def _fail(self, replica: _Replica, error: BaseException) -> None:
+        if isinstance(error, grpc.Call) and error.code() == grpc.StatusCode.UNAVAILABLE:
+            with self._lock:
+                replica.ready = False
+
+    def _set_ready(self, replica: _Replica, ready: bool) -> None:
+        with self._lock:
+            replica.ready = ready
+
+
+class ReplicaPool(_ReplicaPoolBase):
+    """Routes calls over ``grpc`` channels to replicas at ``targets``, picking each call's replica by latency and load.
+
+    ``alpha`` is the weight of each new latency in the moving averages. With ``hedge_quantile``, such as 0.95, a
+    ``ModelInfer`` call unanswered after that quantile of recent latencies is hedged to a second replica. ``options``
+    are added to, and override, ``DEFAULT_CHANNEL_OPTIONS``. Channels are secure when ``credentials`` are given.
+
+    The pool has the methods of ``GRPCInferenceServiceStub``, with their ``with_call`` and ``future``. Calls and
+    ``with_call`` are hedged, while ``future`` sends a single call::
+
+        with ReplicaPool(["replica-0:8081", "replica-1:8081", "replica-2:8081"], hedge_quantile=0.95) as client:
+            client.check_readiness()
+            client.ModelInfer(request)
+    """
+
+    def __init__(
+        self,
+        targets: typing.Sequence[str],
+        *,
+        credentials: typing.Optional[grpc.ChannelCredentials] = None,
+        options: ChannelOptions = (),
+        alpha: float = 0.3,
+        hedge_quantile: typing.Optional[float] = None,
+    ) -> None:
+        super().__init__(targets, credentials=credentials, options=options, alpha=alpha, hedge_quantile=hedge_quantile)
+
+    def _open_channel(
+        self, target: str, credentials: typing.Optional[grpc.ChannelCredentials], options: ChannelOptions
+    ) -> grpc.Channel:
+        if credentials is None:
+            return grpc.insecure_channel(target, options=options)
+        return grpc.secure_channel(target, credentials, options=options)
+
+    def check_readiness(self, timeout: typing.Optional[float] = 1.0) -> typing.List[bool]:
+        """Call ``ServerReady`` on every replica, routing calls only to the ready ones, and return their readiness."""
+        calls = [replica.stub.ServerReady.future(ServerReadyRequest(), timeout=timeout) for replica in self.replicas]
+        readiness = []
+        for replica, call in zip(self.replicas, calls):
+            try:
+                ready = call.result().ready
+            except grpc.RpcError:
+                ready = False
+            self._set_ready(replica, ready)
+            readiness.append(ready)
+        return readiness
+
+    def __getattr__(self, name: str) -> "_ReplicaMethod":
+        if name not in self.__dict__.get("methods", ()):
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        return _ReplicaMethod(self, name)
+
+    def _invoke(
+        self,
+        name: str,
+        variant: typing.Optional[str],
+        args: typing.Tuple[typing.Any, ...],
+        kwargs: typing.Dict[str, typing.Any],
+    ) -> typing.Any:
+        """Make a call, with ``variant`` of the method if given, on the replica picked for it, hedging it if enabled."""
+        if name in _STREAMING_METHODS:
+            replica = self._acquire()
+            self._release(replica, name, None)
+            return getattr(replica.stub, name)(*args, **kwargs)
+        if name in HEDGED_METHODS and self.hedge_delay is not None and len(self.replicas) > 1:
+            winner = self._hedged(name, args, kwargs)
+            # The future of a call is also its grpc.Call
+            return winner.result() if variant is None else (winner.result(), winner)
+
+        replica = self._acquire()
+        start = time.perf_counter()
+        try:
+            method = getattr(replica.stub, name)
+            result = (method if variant is None else getattr(method, variant))(*args, **kwargs)
+        except BaseException as e:
+            self._release(replica, name, None)
+            self._fail(replica, e)
+            raise
+        self._release(replica, name, time.perf_counter() - start)
+        return result
+
+    def _start(
+        self, replica: _Replica, name: str, args: typing.Tuple[typing.Any, ...], kwargs: typing.Dict[str, typing.Any]
+    ) -> grpc.Future:
+        """Start a call on ``replica``, counting it as a call until it ends."""
+        start = time.perf_counter()
+
+        def done(future: grpc.Future) -> None:
+            if future.cancelled():
+                self._release_cancelled(replica, time.perf_counter() - start)
+            elif future.exception() is not None:
+                self._release(replica, name, None)
+                self._fail(replica, future.exception())
+            else:
+                self._release(replica, name, time.perf_counter() - start)
+
+        try:
+            future = getattr(replica.stub, name).future(*args, **kwargs)
+        except BaseException as e:
+            self._release(replica, name, None)
+            self._fail(replica, e)
+            raise
+        future.add_done_callback(done)
+        return future
+
+    def _hedged(
+        self, name: str, args: typing.Tuple[typing.Any, ...], kwargs: typing.Dict[str, typing.Any]
+    ) -> grpc.Future:
+        """Start a call, and a second one on another replica if the first is unanswered after ``hedge_delay``.
+
+        Returns the future of the first call to succeed, or of the last to fail if both do, cancelling the other one.
+        """
+        finished: "queue.SimpleQueue[grpc.Future]" = queue.SimpleQueue()
+        first = self._acquire()
+        calls = [self._start(first, name, args, kwargs)]
+        calls[0].add_done_callback(finished.put)
+        try:
+            winner = finished.get(timeout=self.hedge_delay)
+        except queue.Empty:
+            calls.append(self._start(self._acquire(exclude=first), name, args, kwargs))
+            calls[1].add_done_callback(finished.put)
+            winner = finished.get()
+            if winner.exception() is not None:
+                # The other call may still succeed
+                winner = finished.get()
+        for future in calls:
+            if future is not winner:
+                future.cancel()
+        return winner
+
+    def close(self) -> None:
+        for replica in self.replicas:
+            replica.channel.close()
+
+    def __enter__(self) -> "ReplicaPool":
+        return self
+
+    def __exit__(self, *exc_info: typing.Any) -> None:
+        self.close()
+
+
+class _ReplicaMethod:
+    """A method of a ``ReplicaPool``, with the ``__call__``, ``with_call`` and ``future`` of gRPC's multicallables.
+
+    Calls and ``with_call`` are hedged like the pool's calls, while ``future`` sends a single call.
+    """
+
+    def __init__(self, pool: ReplicaPool, name: str) -> None:
+        self._pool = pool
+        self.__name__ = name
+
+    def __call__(self, *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        return self._pool._invoke(self.__name__, None, args, kwargs)
+
+    def with_call(self, *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        return self._pool._invoke(self.__name__, "with_call", args, kwargs)
+
+    def future(self, *args: typing.Any, **kwargs: typing.Any) -> grpc.Future:
+        return self._pool._start(self._pool._acquire(), self.__name__, args, kwargs)
+
+
+class AsyncReplicaPool(_ReplicaPoolBase):
+    """Routes calls over ``grpc.aio`` channels to replicas at ``targets``, picking replicas by latency and load.
+
+    Takes the same arguments as ``ReplicaPool``. The pool has the methods of ``GRPCInferenceServiceStub``, as
+    coroutines::
+
+        async with AsyncReplicaPool(["replica-0:8081", "replica-1:8081"], hedge_quantile=0.95) as client:
+            await client.check_readiness()
+            await client.ModelInfer(request)
+    """
+
+    def __init__(
+        self,
+        targets: typing.Sequence[str],
+        *,
+        credentials: typing.Optional[grpc.ChannelCredentials] = None,
+        options: ChannelOptions = (),
+        alpha: float = 0.3,
+        hedge_quantile: typing.Optional[float] = None,
+    ) -> None:
+        super().__init__(targets, credentials=credentials, options=options, alpha=alpha, hedge_quantile=hedge_quantile)
+
+    def _open_channel(
+        self, target: str, credentials: typing.Optional[grpc.ChannelCredentials], options: ChannelOptions
+    ) -> grpc.aio.Channel:
+        if credentials is None:
+            return grpc.aio.insecure_channel(target, options=options)
+        return grpc.aio.secure_channel(target, credentials, options=options)
+
+    async def check_readiness(self, timeout: typing.Optional[float] = 1.0) -> typing.List[bool]:
+        """Call ``ServerReady`` on every replica, routing calls only to the ready ones, and return their readiness."""
+
+        async def check(replica: _Replica) -> bool:
+            try:
+                ready = (await replica.stub.ServerReady(ServerReadyRequest(), timeout=timeout)).ready
+            except grpc.RpcError:
+                ready = False
+            self._set_ready(replica, ready)
+            return ready
+
+        return list(await asyncio.gather(*(check(replica) for replica in self.replicas)))
+
+    def __getattr__(self, name: str) -> typing.Callable[..., typing.Any]:
+        if name not in self.__dict__.get("methods", ()):
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+        if name in _STREAMING_METHODS:
+
+            def stream(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+                replica = self._acquire()
+                self._release(replica, name, None)
+                return getattr(replica.stub, name)(*args, **kwargs)
+
+            stream.__name__ = name
+            return stream
+
+        async def call(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+            if name in HEDGED_METHODS and self.hedge_delay is not None and len(self.replicas) > 1:
+                return await self._hedged(name, args, kwargs)
+            return await self._call(self._acquire(), name, args, kwargs)
+
+        call.__name__ = name
+        return call
+
+    async def _call(
+        self, replica: _Replica, name: str, args: typing.Tuple[typing.Any, ...], kwargs: typing.Dict[str, typing.Any]
+    ) -> typing.Any:
+        start = time.perf_counter()
+        try:
+            response = await getattr(replica.stub, name)(*args, **kwargs)
+        except asyncio.CancelledError:
+            self._release_cancelled(replica, time.perf_counter() - start)
+            raise
+        except BaseException as e:
+            self._release(replica, name, None)
+            self._fail(replica, e)
+            raise
+        self._release(replica, name, time.perf_counter() - start)
+        return response
+
+    async def _hedged(
+        self, name: str, args: typing.Tuple[typing.Any, ...], kwargs: typing.Dict[str, typing.Any]
+    ) -> typing.Any:
+        loop = asyncio.get_running_loop()
+        first = self._acquire()
+        tasks = {loop.create_task(self._call(first, name, args, kwargs))}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+            if not done:
+                tasks.add(loop.create_task(self._call(self._acquire(exclude=first), name, args, kwargs)))
+                done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                if pending and _first_success(done) is None:
+                    # The other call may still succeed
+                    done, _ = await asyncio.wait(tasks)
+            winner = _first_success(done)
+            # Raises the error of a failed call when none succeeded
+            return (winner or next(iter(done))).result()
+        finally:
+            for task in tasks:
+                if not task.cancel() and not task.cancelled():
+                    # Retrieves the error of the losing call, which asyncio would log
+                    task.exception()
+
+    async def close(self) -> None:
+        for replica in self.replicas:
+            await replica.channel.close()
+
+    async def __aenter__(self) -> "AsyncReplicaPool":
+        return self
+
+    async def __aexit__(self, *exc_info: typing.Any) -> None:
+        await self.close()
+
+
+def _first_success(tasks: typing.Iterable["asyncio.Task[typing.Any]"]) -> typing.Optional["asyncio.Task[typing.Any]"]:
+    """Return the first of the finished ``tasks`` that succeeded, or None if all of them failed."""
+    return next((task for task in tasks if not task.cancelled() and task.exception() is None), None)
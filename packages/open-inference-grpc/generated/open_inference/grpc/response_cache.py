@@ -0,0 +1,250 @@
+# Copyright 2023 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Caching of inference responses for deterministic models, keyed by the content of their requests.
+
+``ResponseCachingStub`` (for ``grpc`` channels) and ``AsyncResponseCachingStub`` (for ``grpc.aio`` channels) wrap a
+``GRPCInferenceServiceStub``, and answer ``ModelInfer`` calls from a ``ResponseCache`` when the same model and version
+were already sent the same inputs, parameters, requested outputs and call metadata. Requests are hashed without
+copying their ``raw_input_contents``. Entries optionally expire after a time to live, and the least recently used are
+evicted beyond a budget of bytes.
+
+Only models whose outputs depend on nothing but their inputs should be cached. Cached responses are shared between
+callers, and must not be modified.
+"""
+import collections
+import functools
+import hashlib
+import struct
+import threading
+import time
+import typing
+
+from open_inference.grpc.protocol import ModelInferRequest, ModelInferResponse
+from open_inference.grpc.service import GRPCInferenceServiceStub
+
+Key = typing.Tuple[str, str, bytes, typing.Tuple[typing.Tuple[str, typing.Union[str, bytes]], ...]]
+Metadata = typing.Optional[typing.Sequence[typing.Tuple[str, typing.Union[str, bytes]]]]
+
+_LENGTH_PREFIX = struct.Struct("<Q")
+
+
+class CacheStats(typing.NamedTuple):
+    """Counters of a ``ResponseCache``."""
+
+    hits: int
+    misses: int
+    #: Number of entries evicted to stay within the byte budget, or expired
+    evictions: int
+    entries: int
+    #: Serialized size of the cached responses
+    nbytes: int
+
+
+class ResponseCache:
+    """A least-recently-used cache of ``ModelInferResponse`` messages, bounded by their total serialized size.
+
+    Entries expire ``ttl`` seconds after they are stored, or never when it is None. Responses larger than ``max_bytes``
+    are not cached. ``hasher`` creates the ``hashlib``-like object that digests requests, and can be swapped for a
+    faster non-cryptographic hash such as ``xxhash.xxh3_128``. The cache can be shared between stubs of the same server,
+    and used from several threads or from coroutines of one event loop.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: typing.Optional[float] = None,
+        hasher: typing.Callable[[], typing.Any] = functools.partial(hashlib.blake2b, digest_size=16),
+        clock: typing.Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hasher = hasher
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "collections.OrderedDict[Key, typing.Tuple[float, int, ModelInferResponse]]" = (
+            collections.OrderedDict()
+        )
+        self._nbytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._evictions, len(self._entries), self._nbytes)
+
+    def key(self, request: ModelInferRequest, metadata: Metadata = None) -> typing.Optional[Key]:
+        """Return the key of ``request``, or None if its outputs cannot be cached.
+
+        Requests with tensors in shared memory are not cached, as their contents are not in the request.
+        """
+        if any("shared_memory_region" in tensor.parameters for tensor in (*request.inputs, *request.outputs)):
+            return None
+
+        # Everything but the id and raw contents, which are hashed in place rather than copied into the message
+        header = ModelInferRequest(inputs=request.inputs, outputs=request.outputs, parameters=request.parameters)
+        digest = self.hasher()
+        digest.update(header.SerializeToString(deterministic=True))
+        for content in request.raw_input_contents:
+            digest.update(_LENGTH_PREFIX.pack(len(content)))
+            digest.update(content)
+        return request.model_name, request.model_version, digest.digest(), tuple(metadata or ())
+
+    def get(self, key: Key) -> typing.Optional[ModelInferResponse]:
+        """Return the cached response for ``key``, or None if it is missing or expired, counting a hit or a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                self._remove(key)
+                self._evictions += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[2]
+
+    def put(self, key: Key, response: ModelInferResponse) -> None:
+        size = response.ByteSize()
+        if size > self.max_bytes:
+            return
+        expires = float("inf") if self.ttl is None else self._clock() + self.ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires, size, response)
+            self._nbytes += size
+            while self._nbytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def invalidate(self, model_name: str, model_version: typing.Optional[str] = None) -> None:
+        """Drop the entries of a model version, or of every version of the model without ``model_version``."""
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] == model_name and model_version in (None, key[1]):
+                    self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def _remove(self, key: Key) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._nbytes -= size
+
+
+def _with_id(response: ModelInferResponse, request_id: str) -> ModelInferResponse:
+    """Return ``response`` answering a request of ``request_id``, copying it if it answered another one."""
+    if response.id == request_id:
+        return response
+    copy = ModelInferResponse()
+    copy.CopyFrom(response)
+    copy.id = request_id
+    return copy
+
+
+class ResponseCachingStub:
+    """Answers ``ModelInfer`` calls of a ``GRPCInferenceServiceStub`` from a ``ResponseCache``.
+
+    ``models`` names the models whose responses are cached, or None to cache every model called through the stub. A hit
+    is returned as cached, unless the request has another id, in which case it is copied to carry the request's id.
+    Other keyword arguments, such as ``wait_for_ready`` or ``compression``, are passed on to the wrapped stub. Calls
+    given their own ``credentials`` are not cached, as their response may depend on the caller. Every other RPC of the
+    wrapped stub is available unchanged::
+
+        client = ResponseCachingStub(GRPCInferenceServiceStub(channel), models={"iris-model"})
+        client.ModelInfer(encode_infer_request("iris-model", {"input-0": sample}))
+        print(client.cache.stats)
+    """
+
+    def __init__(
+        self,
+        stub: GRPCInferenceServiceStub,
+        *,
+        cache: typing.Optional[ResponseCache] = None,
+        models: typing.Optional[typing.Collection[str]] = None,
+    ) -> None:
+        self._stub = stub
+        self.cache = ResponseCache() if cache is None else cache
+        self.models = None if models is None else frozenset(models)
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self._stub, name)
+
+    def ModelInfer(
+        self,
+        request: ModelInferRequest,
+        timeout: typing.Optional[float] = None,
+        metadata: Metadata = None,
+        **kwargs: typing.Any,
+    ) -> ModelInferResponse:
+        cached_model = self.models is None or request.model_name in self.models
+        key = self.cache.key(request, metadata) if cached_model and kwargs.get("credentials") is None else None
+        if key is None:
+            return self._stub.ModelInfer(request, timeout=timeout, metadata=metadata, **kwargs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return _with_id(cached, request.id)
+        response = self._stub.ModelInfer(request, timeout=timeout, metadata=metadata, **kwargs)
+        self.cache.put(key, response)
+        return response
+
+
+class AsyncResponseCachingStub:
+    """Answers ``ModelInfer`` calls of a ``grpc.aio`` ``GRPCInferenceServiceStub`` from a ``ResponseCache``.
+
+    ``models`` names the models whose responses are cached, or None to cache every model called through the stub.
+    Every other RPC of the wrapped stub is available unchanged.
+    """
+
+    def __init__(
+        self,
+        stub: GRPCInferenceServiceStub,
+        *,
+        cache: typing.Optional[ResponseCache] = None,
+        models: typing.Optional[typing.Collection[str]] = None,
+    ) -> None:
+        self._stub = stub
+        self.cache = ResponseCache() if cache is None else cache
+        self.models = None if models is None else frozenset(models)
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self._stub, name)
+
+    async def ModelInfer(
+        self,
+        request: ModelInferRequest,
+        timeout: typing.Optional[float] = None,
+        metadata: Metadata = None,
+        **kwargs: typing.Any,
+    ) -> ModelInferResponse:
+        cached_model = self.models is None or request.model_name in self.models
+        key = self.cache.key(request, metadata) if cached_model and kwargs.get("credentials") is None else None
+        if key is None:
+            return await self._stub.ModelInfer(request, timeout=timeout, metadata=metadata, **kwargs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return _with_id(cached, request.id)
+        response = await self._stub.ModelInfer(request, timeout=timeout, metadata=metadata, **kwargs)
+        self.cache.put(key, response)
+        return response
@@ -0,0 +1,360 @@
+# Copyright 2023 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Retries of failed calls, with exponential backoff, a deadline budget and retry throttling.
+
+``RetryingStub`` (for ``grpc`` channels) and ``AsyncRetryingStub`` (for ``grpc.aio`` channels) wrap a
+``GRPCInferenceServiceStub``, or anything with its methods such as a ``ChannelPool`` or ``ReplicaPool``, and retry the
+calls of a ``RetryPolicy``'s methods that fail with one of its status codes. By default only the health and metadata
+RPCs, which are idempotent, are retried, and only when they fail as ``UNAVAILABLE``.
+
+Attempts are spaced by exponential backoff with full jitter. The ``timeout`` of a call, or the policy's ``deadline``
+when the call has none, bounds all of its attempts and backoffs together: each attempt is sent with what remains of it
+as its ``timeout``. A ``RetryThrottle`` shared by the calls stops retrying while most of them fail, so that retries do
+not add to the load of a server that is already failing.
+"""
+import asyncio
+import random
+import threading
+import time
+import typing
+from concurrent.futures import Future
+
+import grpc
+
+from open_inference.grpc.service import GRPCInferenceServiceStub
+
+#: The RPCs retried by default, which have no side effects on the server
+IDEMPOTENT_METHODS = frozenset({"ServerLive", "ServerReady", "ModelReady", "ServerMetadata", "ModelMetadata"})
+#: The status codes retried by default, of calls that did not reach a server able to answer them
+RETRYABLE_CODES = frozenset({grpc.StatusCode.UNAVAILABLE})
+
+
+class RetryThrottle:
+    """A token bucket that allows retries while fewer than about ``token_ratio`` of the calls fail.
+
+    Each retryable failure takes a token, and each success gives back ``token_ratio`` of one, up to ``max_tokens``.
+    Retries are allowed while more than half of ``max_tokens`` are left, as in gRPC's own retry throttling. A throttle
+    can be shared between stubs of the same server, and used from several threads.
+    """
+
+    def __init__(self, max_tokens: float = 10.0, token_ratio: float = 0.1) -> None:
+        self.max_tokens = max_tokens
+        self.token_ratio = token_ratio
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+    def allow_retry(self) -> bool:
+        return self._tokens > self.max_tokens / 2
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._tokens = max(self._tokens - 1, 0.0)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._tokens = min(self._tokens + self.token_ratio, self.max_tokens)
+
+
+class RetryPolicy:
+    """Which calls are retried, how many times, and how long to wait between attempts.
+
+    A call is sent at most ``max_attempts`` times. The n-th retry waits for a random time between 0 and
+    ``initial_backoff * multiplier ** (n - 1)`` seconds, capped at ``max_backoff``. ``deadline`` is the time budget of
+    a call given no ``timeout``, or None for no budget. ``methods`` names the RPCs retried, and ``codes`` the status
+    codes they are retried on. The policy, and its ``throttle``, can be shared between stubs.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_attempts: int = 4,
+        initial_backoff: float = 0.05,
+        max_backoff: float = 2.0,
+        multiplier: float = 2.0,
+        deadline: typing.Optional[float] = None,
+        methods: typing.Collection[str] = IDEMPOTENT_METHODS,
+        codes: typing.Collection[grpc.StatusCode] = RETRYABLE_CODES,
+        throttle: typing.Optional[RetryThrottle] = None,
+    ) -> None:
+        if max_attempts < 1:
+            raise ValueError(f"max_attempts must be at least 1, not {max_attempts}")
+        self.max_attempts = max_attempts
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.multiplier = multiplier
+        self.deadline = deadline
+        self.methods = frozenset(methods)
+        self.codes = frozenset(codes)
+        self.throttle = RetryThrottle() if throttle is None else throttle
+
+    def backoff(self, retry: int) -> float:
+        """Return a random wait before the ``retry``-th retry, counting from 1."""
+        return random.uniform(0, min(self.initial_backoff * self.multiplier ** (retry - 1), self.max_backoff))
+
+    def _deadline(self, timeout: typing.Optional[float]) -> typing.Optional[float]:
+        budget = self.deadline if timeout is None else timeout
+        return None if budget is None else time.monotonic() + budget
+
+    def _retry_delay(
+        self, error: grpc.RpcError, attempts: int, deadline: typing.Optional[float]
+    ) -> typing.Optional[float]:
+        """Return how long to wait before retrying a call that failed with ``error``, or None to raise it."""
+        if error.code() not in self.codes:
+            return None
+        self.throttle.record_failure()
+        if attempts >= self.max_attempts or not self.throttle.allow_retry():
+            return None
+        delay = self.backoff(attempts)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+
+def _remaining(deadline: typing.Optional[float]) -> typing.Optional[float]:
+    return None if deadline is None else max(deadline - time.monotonic(), 0.0)
+
+
+def _options(
+    metadata: typing.Any, credentials: typing.Any, wait_for_ready: typing.Any, compression: typing.Any
+) -> typing.Dict[str, typing.Any]:
+    """Return the options of a call that were given, to pass on to stubs that may not take them all."""
+    options = dict(metadata=metadata, credentials=credentials, wait_for_ready=wait_for_ready, compression=compression)
+    return {name: value for name, value in options.items() if value is not None}
+
+
+class RetryingStub:
+    """Retries failed calls of a ``GRPCInferenceServiceStub`` according to a ``RetryPolicy``.
+
+    Calls of the policy's methods take the same arguments as the stub's, and raise the error of their last attempt.
+    Their ``with_call`` returns the response with the call of the last attempt, and their ``future`` a
+    ``concurrent.futures.Future`` of the response, whose attempts are retried from gRPC's callbacks and a timer. These
+    need the wrapped methods to have ``with_call`` and ``future``, as those of a ``GRPCInferenceServiceStub``, a
+    ``ChannelPool`` or a ``ReplicaPool`` do. Every other RPC of the wrapped stub is available unchanged::
+
+        client = RetryingStub(GRPCInferenceServiceStub(channel), policy=RetryPolicy(deadline=5.0))
+        client.ModelReady(ModelReadyRequest(name="iris-model"))
+    """
+
+    def __init__(self, stub: GRPCInferenceServiceStub, *, policy: typing.Optional[RetryPolicy] = None) -> None:
+        self._stub = stub
+        self.policy = RetryPolicy() if policy is None else policy
+
+    def __getattr__(self, name: str) -> typing.Any:
+        method = getattr(self._stub, name)
+        if name not in self.policy.methods:
+            return method
+        return _RetryingMethod(method, self.policy)
+
+
+class _RetryingMethod:
+    """A unary-unary method of a ``RetryingStub``, with the ``__call__``, ``with_call`` and ``future`` of gRPC's."""
+
+    def __init__(self, method: typing.Any, policy: RetryPolicy) -> None:
+        self._method = method
+        self._policy = policy
+
+    def __call__(
+        self,
+        request: typing.Any,
+        timeout: typing.Optional[float] = None,
+        metadata: typing.Optional[typing.Sequence[typing.Tuple[str, str]]] = None,
+        credentials: typing.Optional[grpc.CallCredentials] = None,
+        wait_for_ready: typing.Optional[bool] = None,
+        compression: typing.Optional[grpc.Compression] = None,
+    ) -> typing.Any:
+        kwargs = _options(metadata, credentials, wait_for_ready, compression)
+        return self._call(self._method, request, timeout, kwargs)
+
+    def with_call(
+        self,
+        request: typing.Any,
+        timeout: typing.Optional[float] = None,
+        metadata: typing.Optional[typing.Sequence[typing.Tuple[str, str]]] = None,
+        credentials: typing.Optional[grpc.CallCredentials] = None,
+        wait_for_ready: typing.Optional[bool] = None,
+        compression: typing.Optional[grpc.Compression] = None,
+    ) -> typing.Tuple[typing.Any, grpc.Call]:
+        """Return the response with the ``grpc.Call`` of the attempt that succeeded."""
+        kwargs = _options(metadata, credentials, wait_for_ready, compression)
+        return self._call(self._method.with_call, request, timeout, kwargs)
+
+    def future(
+        self,
+        request: typing.Any,
+        timeout: typing.Optional[float] = None,
+        metadata: typing.Optional[typing.Sequence[typing.Tuple[str, str]]] = None,
+        credentials: typing.Optional[grpc.CallCredentials] = None,
+        wait_for_ready: typing.Optional[bool] = None,
+        compression: typing.Optional[grpc.Compression] = None,
+    ) -> "Future[typing.Any]":
+        """Start the call, and return a future of its response, or of the error of its last attempt.
+
+        Cancelling the future cancels the attempt in flight, or the retry waiting for its backoff.
+        """
+        kwargs = _options(metadata, credentials, wait_for_ready, compression)
+        retried = _RetriedFuture(self._method.future, request, self._policy, self._policy._deadline(timeout), kwargs)
+        retried.attempt()
+        return retried.result_future
+
+    def _call(
+        self,
+        method: typing.Callable[..., typing.Any],
+        request: typing.Any,
+        timeout: typing.Optional[float],
+        kwargs: typing.Dict[str, typing.Any],
+    ) -> typing.Any:
+        policy = self._policy
+        deadline = policy._deadline(timeout)
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                response = method(request, timeout=_remaining(deadline), **kwargs)
+            except grpc.RpcError as e:
+                delay = policy._retry_delay(e, attempts, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            policy.throttle.record_success()
+            return response
+
+
+class _RetriedFuture:
+    """The attempts of a call made with ``future``, each started from the callback of the one before it."""
+
+    def __init__(
+        self,
+        start: typing.Callable[..., typing.Any],
+        request: typing.Any,
+        policy: RetryPolicy,
+        deadline: typing.Optional[float],
+        kwargs: typing.Dict[str, typing.Any],
+    ) -> None:
+        self._start = start
+        self._request = request
+        self._policy = policy
+        self._deadline = deadline
+        self._kwargs = kwargs
+        self._lock = threading.Lock()
+        self._attempts = 0
+        self._pending: typing.Any = None
+        self.result_future: "Future[typing.Any]" = Future()
+        self.result_future.add_done_callback(self._cancel)
+
+    def attempt(self) -> None:
+        with self._lock:
+            if self.result_future.done():
+                return
+            self._attempts += 1
+            try:
+                self._pending = self._start(self._request, timeout=_remaining(self._deadline), **self._kwargs)
+            except Exception as e:
+                self.result_future.set_exception(e)
+                return
+            call = self._pending
+        call.add_done_callback(self._done)
+
+    def _done(self, call: typing.Any) -> None:
+        if call.cancelled() or self.result_future.done():
+            return
+        error = call.exception()
+        if error is None:
+            self._policy.throttle.record_success()
+            self._set(lambda: self.result_future.set_result(call.result()))
+            return
+        delay = (
+            self._policy._retry_delay(error, self._attempts, self._deadline)
+            if isinstance(error, grpc.RpcError)
+            else None
+        )
+        if delay is None:
+            self._set(lambda: self.result_future.set_exception(error))
+            return
+        timer = threading.Timer(delay, self.attempt)
+        timer.daemon = True
+        with self._lock:
+            self._pending = timer
+        timer.start()
+
+    def _set(self, complete: typing.Callable[[], None]) -> None:
+        with self._lock:
+            if not self.result_future.done():
+                complete()
+
+    def _cancel(self, future: "Future[typing.Any]") -> None:
+        if future.cancelled():
+            with self._lock:
+                pending = self._pending
+            if pending is not None:
+                pending.cancel()
+
+
+class AsyncRetryingStub:
+    """Retries failed calls of a ``grpc.aio`` ``GRPCInferenceServiceStub`` according to a ``RetryPolicy``.
+
+    Calls of the policy's methods take the same arguments as the stub's, and return a coroutine of the response rather
+    than a ``grpc.aio.UnaryUnaryCall``, since each attempt is a call of its own. Every other RPC of the wrapped stub is
+    available unchanged.
+    """
+
+    def __init__(self, stub: GRPCInferenceServiceStub, *, policy: typing.Optional[RetryPolicy] = None) -> None:
+        self._stub = stub
+        self.policy = RetryPolicy() if policy is None else policy
+
+    def __getattr__(self, name: str) -> typing.Any:
+        method = getattr(self._stub, name)
+        if name not in self.policy.methods:
+            return method
+
+        async def call(
+            request: typing.Any,
+            timeout: typing.Optional[float] = None,
+            metadata: typing.Optional[typing.Sequence[typing.Tuple[str, str]]] = None,
+            credentials: typing.Optional[grpc.CallCredentials] = None,
+            wait_for_ready: typing.Optional[bool] = None,
+            compression: typing.Optional[grpc.Compression] = None,
+        ) -> typing.Any:
+            kwargs = _options(metadata, credentials, wait_for_ready, compression)
+            return await self._call(method, request, timeout, kwargs)
+
+        return call
+
+    async def _call(
+        self,
+        method: typing.Callable[..., typing.Any],
+        request: typing.Any,
+        timeout: typing.Optional[float],
+        kwargs: typing.Dict[str, typing.Any],
+    ) -> typing.Any:
+        policy = self.policy
+        deadline = policy._deadline(timeout)
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                response = await method(request, timeout=_remaining(deadline), **kwargs)
+            except grpc.RpcError as e:
+                delay = policy._retry_delay(e, attempts, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            policy.throttle.record_success()
+            return response
@@ -0,0 +1,402 @@
+# Copyright 2023 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A ``grpc.aio`` inference server for models written as Python functions.
+
+``AsyncInferenceServicer`` implements the health, metadata and inference RPCs of the service from a ``ModelRegistry``.
+Each model is a function from input arrays to output arrays, or a coroutine function. Inputs sent in
+``raw_input_contents`` reach it as read-only ``np.frombuffer`` views over the ``bytes`` of their entry, which protobuf
+copies out of the request once per tensor, with its compiled ``upb`` backend, and which are not copied again. Its
+outputs are returned in ``raw_output_contents``, as ``open_inference.grpc.codec`` does on the client side.
+
+Functions run on the event loop with ``offload="inline"``, which suits fast or asynchronous models, on a thread pool
+with ``offload="thread"``, the default, which suits models spending their time in NumPy or other code releasing the
+GIL, and on a process pool with ``offload="process"``, which suits models holding the GIL. The worker processes are
+spawned rather than forked, since gRPC does not survive a fork: functions run on them must be importable from a module,
+and their inputs and outputs are copied to and from the workers.
+
+Requires the ``numpy`` extra: ``pip install open-inference-grpc[numpy]``.
+"""
+import asyncio
+import functools
+import multiprocessing
+import threading
+import typing
+from concurrent import futures
+
+import grpc
+import numpy as np
+import numpy.typing as npt
+
+from open_inference.grpc.codec import decode_infer_request, encode_infer_response
+from open_inference.grpc.pool import MAX_MESSAGE_LENGTH
+from open_inference.grpc.protocol import (
+    ModelInferRequest,
+    ModelInferResponse,
+    ModelMetadataResponse,
+    ModelReadyResponse,
+    ModelStreamInferResponse,
+    ServerLiveResponse,
+    ServerMetadataResponse,
+    ServerReadyResponse,
+)
+from open_inference.grpc.service import GRPCInferenceServiceServicer, add_GRPCInferenceServiceServicer_to_server
+
+Model = typing.Callable[[typing.Dict[str, np.ndarray]], typing.Any]
+
+OFFLOADS = ("inline", "thread", "process")
+
+DEFAULT_SERVER_OPTIONS: typing.List[typing.Tuple[str, typing.Any]] = [
+    ("grpc.max_send_message_length", MAX_MESSAGE_LENGTH),
+    ("grpc.max_receive_message_length", MAX_MESSAGE_LENGTH),
+]
+
+
+class TensorSpec(typing.NamedTuple):
+    """Name, datatype and shape of a tensor of a model, where -1 is a dimension of any size."""
+
+    name: str
+    datatype: str
+    shape: typing.Sequence[int]
+
+
+class RegisteredModel(typing.NamedTuple):
+    """A model of a ``ModelRegistry``, as passed to ``ModelRegistry.register``."""
+
+    name: str
+    version: str
+    function: Model
+    inputs: typing.Tuple[TensorSpec, ...]
+    outputs: typing.Tuple[TensorSpec, ...]
+    platform: str
+    offload: str
+
+
+class _InferError(Exception):
+    def __init__(self, code: grpc.StatusCode, details: str) -> None:
+        super().__init__(details)
+        self.code = code
+        self.details = details
+
+
+class ModelRegistry:
+    """The models served by an ``AsyncInferenceServicer``, with their readiness.
+
+    Models are found by name and version. Requests naming no version go to the version of the model registered last.
+    Registering a model again under the same name and version replaces it. A registry can be changed while it is
+    served, from any thread::
+
+        registry = ModelRegistry()
+        registry.register(
+            "add-one",
+            lambda inputs: {"output-0": inputs["input-0"] + 1},
+            inputs=[TensorSpec("input-0", "FP32", [-1, 4])],
+            outputs=[TensorSpec("output-0", "FP32", [-1, 4])],
+        )
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # Models of each name by version, in the order they were registered
+        self._models: typing.Dict[str, typing.Dict[str, RegisteredModel]] = {}
+        self._ready: typing.Dict[typing.Tuple[str, str], bool] = {}
+
+    def register(
+        self,
+        name: str,
+        function: Model,
+        *,
+        version: str = "",
+        inputs: typing.Iterable[TensorSpec] = (),
+        outputs: typing.Iterable[TensorSpec] = (),
+        platform: str = "",
+        offload: str = "thread",
+        ready: bool = True,
+    ) -> RegisteredModel:
+        """Serve ``function`` as ``name``, and return its registration.
+
+        ``inputs`` and ``outputs`` are returned by ``ModelMetadata``. When ``inputs`` are given, requests must send
+        exactly these inputs, with their datatypes and shapes. ``offload`` is where ``function`` runs: ``"inline"``,
+        ``"thread"`` or ``"process"``. A model registered with ``ready=False`` is not served until ``set_ready`` is
+        called.
+        """
+        if offload not in OFFLOADS:
+            raise ValueError(f"offload must be one of {', '.join(OFFLOADS)}, not {offload!r}")
+        model = RegisteredModel(
+            name=name,
+            version=version,
+            function=function,
+            inputs=tuple(TensorSpec(*spec) for spec in inputs),
+            outputs=tuple(TensorSpec(*spec) for spec in outputs),
+            platform=platform,
+            offload=offload,
+        )
+        with self._lock:
+            versions = self._models.setdefault(name, {})
+            versions.pop(version, None)
+            versions[version] = model
+            self._ready[(name, version)] = ready
+        return model
+
+    def unregister(self, name: str, version: typing.Optional[str] = None) -> None:
+        """Stop serving ``version`` of the model ``name``, or every version when it is None."""
+        with self._lock:
+            versions = self._models.get(name, {})
+            for removed in list(versions) if version is None else [version]:
+                versions.pop(removed, None)
+                self._ready.pop((name, removed), None)
+            if not versions:
+                self._models.pop(name, None)
+
+    def set_ready(self, name: str, ready: bool, version: str = "") -> None:
+        """Mark ``version`` of the model ``name`` as ready, or not, to serve requests."""
+        with self._lock:
+            if version not in self._models.get(name, {}):
+                raise KeyError(f"Model {name!r} has no version {version!r}")
+            self._ready[(name, version)] = ready
+
+    def get(self, name: str, version: str = "") -> typing.Optional[RegisteredModel]:
+        """Return the registration of ``version`` of the model ``name``, or of its latest version when it is empty."""
+        with self._lock:
+            versions = self._models.get(name)
+            if not versions:
+                return None
+            if version:
+                return versions.get(version)
+            return next(reversed(versions.values()))
+
+    def versions(self, name: str) -> typing.List[str]:
+        """Return the versions of the model ``name``, in the order they were registered."""
+        with self._lock:
+            return list(self._models.get(name, ()))
+
+    def is_ready(self, name: str, version: str = "") -> bool:
+        """Return whether ``version`` of the model ``name``, or its latest version when it is empty, is ready."""
+        model = self.get(name, version)
+        with self._lock:
+            return model is not None and self._ready.get((model.name, model.version), False)
+
+    def models(self) -> typing.List[RegisteredModel]:
+        """Return the registrations of every model, in the order they were registered."""
+        with self._lock:
+            return [model for versions in self._models.values() for model in versions.values()]
+
+    def all_ready(self) -> bool:
+        """Return whether every registered model is ready."""
+        with self._lock:
+            return all(self._ready.values())
+
+
+class AsyncInferenceServicer(GRPCInferenceServiceServicer):
+    """Serves the models of a ``ModelRegistry`` on a ``grpc.aio`` server.
+
+    ``ServerReady`` is true once every registered model is ready, and until the servicer is closed, after which requests
+    fail with ``UNAVAILABLE``. Failures of a model are returned as ``INTERNAL`` errors, with the message of their
+    exception. The thread and process pools are created on first use, with ``max_workers`` each, and shut down by
+    ``close``::
+
+        servicer = AsyncInferenceServicer(registry)
+        server, port = await start_server(servicer, "[::]:8001")
+        try:
+            await server.wait_for_termination()
+        finally:
+            servicer.close()
+    """
+
+    def __init__(
+        self,
+        registry: ModelRegistry,
+        *,
+        name: str = "open-inference-grpc",
+        version: str = "",
+        extensions: typing.Iterable[str] = (),
+        max_workers: typing.Optional[int] = None,
+    ) -> None:
+        self.registry = registry
+        self.name = name
+        self.version = version
+        self.extensions = list(extensions)
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executors: typing.Dict[str, futures.Executor] = {}
+        self._closed = False
+
+    async def ServerLive(self, request, context):
+        return ServerLiveResponse(live=True)
+
+    async def ServerReady(self, request, context):
+        return ServerReadyResponse(ready=not self._closed and self.registry.all_ready())
+
+    async def ModelReady(self, request, context):
+        return ModelReadyResponse(ready=self.registry.is_ready(request.name, request.version))
+
+    async def ServerMetadata(self, request, context):
+        return ServerMetadataResponse(name=self.name, version=self.version, extensions=self.extensions)
+
+    async def ModelMetadata(self, request, context):
+        model = self.registry.get(request.name, request.version)
+        if model is None:
+            await context.abort(grpc.StatusCode.NOT_FOUND, _not_found(request.name, request.version))
+        return ModelMetadataResponse(
+            name=model.name,
+            versions=[version for version in self.registry.versions(model.name) if version],
+            platform=model.platform,
+            inputs=[_tensor_metadata(spec) for spec in model.inputs],
+            outputs=[_tensor_metadata(spec) for spec in model.outputs],
+        )
+
+    async def ModelInfer(self, request, context):
+        try:
+            return await self._infer(request)
+        except _InferError as e:
+            await context.abort(e.code, e.details)
+
+    async def ModelStreamInfer(self, request_iterator, context):
+        async for request in request_iterator:
+            try:
+                yield ModelStreamInferResponse(infer_response=await self._infer(request))
+            except _InferError as e:
+                yield ModelStreamInferResponse(
+                    error_message=e.details,
+                    infer_response=ModelInferResponse(model_name=request.model_name, id=request.id),
+                )
+
+    def close(self) -> None:
+        """Mark the server as not ready, and shut down the pools once the calls running on them are done."""
+        with self._lock:
+            self._closed = True
+            executors, self._executors = self._executors, {}
+        for executor in executors.values():
+            executor.shutdown(wait=False)
+
+    async def _infer(self, request: ModelInferRequest) -> ModelInferResponse:
+        if self._closed:
+            raise _InferError(grpc.StatusCode.UNAVAILABLE, "The server is shutting down")
+        model = self.registry.get(request.model_name, request.model_version)
+        if model is None:
+            raise _InferError(grpc.StatusCode.NOT_FOUND, _not_found(request.model_name, request.model_version))
+        if not self.registry.is_ready(model.name, model.version):
+            raise _InferError(
+                grpc.StatusCode.UNAVAILABLE, _not_found(request.model_name, request.model_version, "is not ready")
+            )
+        try:
+            inputs = decode_infer_request(request)
+        except ValueError as e:
+            raise _InferError(grpc.StatusCode.INVALID_ARGUMENT, str(e)) from None
+        if model.inputs:
+            _check_inputs(model, request)
+
+        try:
+            outputs = await self._run(model, inputs)
+            arrays = {name: np.asarray(array) for name, array in outputs.items()}
+        except _InferError:
+            raise
+        except Exception as e:
+            raise _InferError(grpc.StatusCode.INTERNAL, f"Model {model.name!r} failed: {e!r}") from e
+
+        requested = [tensor.name for tensor in request.outputs]
+        missing = [name for name in requested if name not in arrays]
+        if missing:
+            raise _InferError(
+                grpc.StatusCode.INVALID_ARGUMENT, f"Model {model.name!r} has no output {', '.join(map(repr, missing))}"
+            )
+        try:
+            return encode_infer_response(
+                model.name,
+                {name: arrays[name] for name in requested} if requested else arrays,
+                model_version=model.version,
+                id=request.id,
+            )
+        except ValueError as e:
+            raise _InferError(grpc.StatusCode.INTERNAL, f"Model {model.name!r} returned {e}") from None
+
+    async def _run(
+        self, model: RegisteredModel, inputs: typing.Dict[str, np.ndarray]
+    ) -> typing.Mapping[str, npt.ArrayLike]:
+        if asyncio.iscoroutinefunction(model.function):
+            return await model.function(inputs)
+        if model.offload == "inline":
+            return model.function(inputs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor(model.offload), functools.partial(model.function, inputs))
+
+    def _executor(self, offload: str) -> futures.Executor:
+        with self._lock:
+            if self._closed:
+                raise _InferError(grpc.StatusCode.UNAVAILABLE, "The server is shutting down")
+            executor = self._executors.get(offload)
+            if executor is None:
+                if offload == "process":
+                    executor = futures.ProcessPoolExecutor(
+                        self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    executor = futures.ThreadPoolExecutor(self.max_workers, thread_name_prefix="open-inference-model")
+                self._executors[offload] = executor
+            return executor
+
+
+async def start_server(
+    servicer: GRPCInferenceServiceServicer,
+    address: str = "[::]:8001",
+    *,
+    options: typing.Optional[typing.Sequence[typing.Tuple[str, typing.Any]]] = None,
+    credentials: typing.Optional[grpc.ServerCredentials] = None,
+) -> typing.Tuple[grpc.aio.Server, int]:
+    """Start a ``grpc.aio`` server for ``servicer`` on ``address``, and return it with the port it is bound to.
+
+    ``options`` default to ``DEFAULT_SERVER_OPTIONS``, which accept messages of up to ``MAX_MESSAGE_LENGTH``. Binding
+    port 0 picks a free port, for tests and benchmarks.
+    """
+    server = grpc.aio.server(options=DEFAULT_SERVER_OPTIONS if options is None else options)
+    add_GRPCInferenceServiceServicer_to_server(servicer, server)
+    if credentials is None:
+        port = server.add_insecure_port(address)
+    else:
+        port = server.add_secure_port(address, credentials)
+    await server.start()
+    return server, port
+
+
+def _check_inputs(model: RegisteredModel, request: ModelInferRequest) -> None:
+    declared = {spec.name: spec for spec in model.inputs}
+    sent = {tensor.name: tensor for tensor in request.inputs}
+    if sent.keys() != declared.keys():
+        raise _InferError(
+            grpc.StatusCode.INVALID_ARGUMENT,
+            f"Model {model.name!r} takes inputs {sorted(declared)}, not {sorted(sent)}",
+        )
+    for name, tensor in sent.items():
+        spec = declared[name]
+        if tensor.datatype != spec.datatype:
+            raise _InferError(
+                grpc.StatusCode.INVALID_ARGUMENT,
+                f"Input {name!r} of model {model.name!r} must be {spec.datatype}, not {tensor.datatype}",
+            )
+        shape = list(tensor.shape)
+        if len(shape) != len(spec.shape) or any(
+            expected not in (-1, actual) for expected, actual in zip(spec.shape, shape)
+        ):
+            raise _InferError(
+                grpc.StatusCode.INVALID_ARGUMENT,
+                f"Input {name!r} of model {model.name!r} must have shape {list(spec.shape)}, not {shape}",
+            )
+
+
+def _tensor_metadata(spec: TensorSpec) -> ModelMetadataResponse.TensorMetadata:
+    return ModelMetadataResponse.TensorMetadata(name=spec.name, datatype=spec.datatype, shape=spec.shape)
+
+
+def _not_found(name: str, version: str, state: str = "is not served") -> str:
+    return f"Model {name!r} {state}" if not version else f"Version {version!r} of model {name!r} {state}"
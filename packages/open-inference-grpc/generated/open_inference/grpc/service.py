@@ -58,6 +58,26 @@ class GRPCInferenceServiceStub(object):
             request_serializer=open__inference__grpc__pb2.ModelInferRequest.SerializeToString,
             response_deserializer=open__inference__grpc__pb2.ModelInferResponse.FromString,
         )
+        self.ModelStreamInfer = channel.stream_stream(
+            "/inference.GRPCInferenceService/ModelStreamInfer",
+            request_serializer=open__inference__grpc__pb2.ModelInferRequest.SerializeToString,
+            response_deserializer=open__inference__grpc__pb2.ModelStreamInferResponse.FromString,
+        )
+        self.SystemSharedMemoryStatus = channel.unary_unary(
+            "/inference.GRPCInferenceService/SystemSharedMemoryStatus",
+            request_serializer=open__inference__grpc__pb2.SystemSharedMemoryStatusRequest.SerializeToString,
+            response_deserializer=open__inference__grpc__pb2.SystemSharedMemoryStatusResponse.FromString,
+        )
+        self.SystemSharedMemoryRegister = channel.unary_unary(
+            "/inference.GRPCInferenceService/SystemSharedMemoryRegister",
+            request_serializer=open__inference__grpc__pb2.SystemSharedMemoryRegisterRequest.SerializeToString,
+            response_deserializer=open__inference__grpc__pb2.SystemSharedMemoryRegisterResponse.FromString,
+        )
+        self.SystemSharedMemoryUnregister = channel.unary_unary(
+            "/inference.GRPCInferenceService/SystemSharedMemoryUnregister",
+            request_serializer=open__inference__grpc__pb2.SystemSharedMemoryUnregisterRequest.SerializeToString,
+            response_deserializer=open__inference__grpc__pb2.SystemSharedMemoryUnregisterResponse.FromString,
+        )
 
 
 class GRPCInferenceServiceServicer(object):
@@ -110,6 +130,39 @@ class GRPCInferenceServiceServicer(object):
         context.set_details("Method not implemented!")
         raise NotImplementedError("Method not implemented!")
 
+    def ModelStreamInfer(self, request_iterator, context):
+        """The ModelStreamInfer API performs inference over a bidirectional stream,
+        as implemented by Triton. Every request sent on the stream is answered with
+        a ModelStreamInferResponse, holding either the ModelInferResponse or the
+        error of the request.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details("Method not implemented!")
+        raise NotImplementedError("Method not implemented!")
+
+    def SystemSharedMemoryStatus(self, request, context):
+        """The SystemSharedMemory APIs register, unregister and report on regions of
+        system shared memory, as implemented by Triton. The inputs and outputs of an
+        inference request refer to a registered region through their
+        "shared_memory_region", "shared_memory_offset" and "shared_memory_byte_size"
+        parameters, in place of their contents.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details("Method not implemented!")
+        raise NotImplementedError("Method not implemented!")
+
+    def SystemSharedMemoryRegister(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details("Method not implemented!")
+        raise NotImplementedError("Method not implemented!")
+
+    def SystemSharedMemoryUnregister(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details("Method not implemented!")
+        raise NotImplementedError("Method not implemented!")
+
 
 def add_GRPCInferenceServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -143,6 +196,26 @@ def add_GRPCInferenceServiceServicer_to_server(servicer, server):
             request_deserializer=open__inference__grpc__pb2.ModelInferRequest.FromString,
             response_serializer=open__inference__grpc__pb2.ModelInferResponse.SerializeToString,
         ),
+        "ModelStreamInfer": grpc.stream_stream_rpc_method_handler(
+            servicer.ModelStreamInfer,
+            request_deserializer=open__inference__grpc__pb2.ModelInferRequest.FromString,
+            response_serializer=open__inference__grpc__pb2.ModelStreamInferResponse.SerializeToString,
+        ),
+        "SystemSharedMemoryStatus": grpc.unary_unary_rpc_method_handler(
+            servicer.SystemSharedMemoryStatus,
+            request_deserializer=open__inference__grpc__pb2.SystemSharedMemoryStatusRequest.FromString,
+            response_serializer=open__inference__grpc__pb2.SystemSharedMemoryStatusResponse.SerializeToString,
+        ),
+        "SystemSharedMemoryRegister": grpc.unary_unary_rpc_method_handler(
+            servicer.SystemSharedMemoryRegister,
+            request_deserializer=open__inference__grpc__pb2.SystemSharedMemoryRegisterRequest.FromString,
+            response_serializer=open__inference__grpc__pb2.SystemSharedMemoryRegisterResponse.SerializeToString,
+        ),
+        "SystemSharedMemoryUnregister": grpc.unary_unary_rpc_method_handler(
+            servicer.SystemSharedMemoryUnregister,
+            request_deserializer=open__inference__grpc__pb2.SystemSharedMemoryUnregisterRequest.FromString,
+            response_serializer=open__inference__grpc__pb2.SystemSharedMemoryUnregisterResponse.SerializeToString,
+        ),
     }
     generic_handler = grpc.method_handlers_generic_handler("inference.GRPCInferenceService", rpc_method_handlers)
     server.add_generic_rpc_handlers((generic_handler,))
@@ -325,3 +398,119 @@ class GRPCInferenceService(object):
             timeout,
             metadata,
         )
+
+    @staticmethod
+    def ModelStreamInfer(
+        request_iterator,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            "/inference.GRPCInferenceService/ModelStreamInfer",
+            open__inference__grpc__pb2.ModelInferRequest.SerializeToString,
+            open__inference__grpc__pb2.ModelStreamInferResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+        )
+
+    @staticmethod
+    def SystemSharedMemoryStatus(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            "/inference.GRPCInferenceService/SystemSharedMemoryStatus",
+            open__inference__grpc__pb2.SystemSharedMemoryStatusRequest.SerializeToString,
+            open__inference__grpc__pb2.SystemSharedMemoryStatusResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+        )
+
+    @staticmethod
+    def SystemSharedMemoryRegister(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            "/inference.GRPCInferenceService/SystemSharedMemoryRegister",
+            open__inference__grpc__pb2.SystemSharedMemoryRegisterRequest.SerializeToString,
+            open__inference__grpc__pb2.SystemSharedMemoryRegisterResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+        )
+
+    @staticmethod
+    def SystemSharedMemoryUnregister(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            "/inference.GRPCInferenceService/SystemSharedMemoryUnregister",
+            open__inference__grpc__pb2.SystemSharedMemoryUnregisterRequest.SerializeToString,
+            open__inference__grpc__pb2.SystemSharedMemoryUnregisterResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+        )
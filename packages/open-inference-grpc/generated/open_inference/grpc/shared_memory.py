@@ -0,0 +1,173 @@
+# Copyright 2023 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tensors passed through system shared memory, as implemented by Triton.
+
+A ``SharedMemoryRegion`` is created by the client and registered with a server running on the same host. Inputs are
+written into the region and refer to it through their ``shared_memory_region``, ``shared_memory_offset`` and
+``shared_memory_byte_size`` parameters instead of ``raw_input_contents``, and requested outputs with these parameters
+are written into the region by the server instead of ``raw_output_contents``. Tensors then never go through the
+channel, which only carries their description.
+
+Requires the ``numpy`` extra: ``pip install open-inference-grpc[numpy]``.
+"""
+import typing
+import uuid
+from multiprocessing import shared_memory
+
+import numpy as np
+import numpy.typing as npt
+
+from open_inference.grpc.codec import datatype_of, dtype_of
+from open_inference.grpc.protocol import (
+    InferParameter,
+    ModelInferRequest,
+    ModelInferResponse,
+    SystemSharedMemoryRegisterRequest,
+    SystemSharedMemoryUnregisterRequest,
+)
+from open_inference.grpc.service import GRPCInferenceServiceStub
+
+REGION_PARAMETER = "shared_memory_region"
+OFFSET_PARAMETER = "shared_memory_offset"
+BYTE_SIZE_PARAMETER = "shared_memory_byte_size"
+
+
+class SharedMemoryRegion:
+    """A region of system shared memory of ``byte_size`` bytes, registered with servers under ``name``.
+
+    The underlying memory object is created with ``key``, a name unique to the host that defaults to a random one, and
+    is removed on ``close``. Tensors are laid out in the region by the caller, at the offsets passed to ``set_input``
+    and ``set_output``::
+
+        with SharedMemoryRegion("iris-data", 1024) as region:
+            region.register(stub)
+            request = ModelInferRequest(model_name="iris-model")
+            size = region.set_input(request.inputs.add(name="input-0"), np.array([[5.3, 3.7, 1.5, 0.2]]))
+            region.set_output(request.outputs.add(name="output-0"), offset=size, byte_size=8)
+            response = stub.ModelInfer(request)
+            scores = region.read_output(response.outputs[0], offset=size).copy()
+            region.unregister(stub)
+
+    Arrays read from the region are views of its memory, which must be released or copied before the region is closed.
+    """
+
+    def __init__(self, name: str, byte_size: int, *, key: typing.Optional[str] = None) -> None:
+        if byte_size < 1:
+            raise ValueError(f"byte_size must be at least 1, got {byte_size}")
+        self.name = name
+        self.byte_size = byte_size
+        self._memory = shared_memory.SharedMemory(
+            name=(key or f"oip-{uuid.uuid4().hex}").lstrip("/"), create=True, size=byte_size
+        )
+        #: Key of the underlying memory object, as servers open it
+        self.key = "/" + self._memory.name.lstrip("/")
+
+    @property
+    def buf(self) -> memoryview:
+        """The memory of the region."""
+        return typing.cast(memoryview, self._memory.buf)[: self.byte_size]
+
+    def write(self, array: npt.ArrayLike, offset: int = 0) -> int:
+        """Write ``array`` at ``offset`` as little-endian data of its datatype, returning the number of bytes written.
+
+        Only arrays of fixed-size datatypes that NumPy represents can be written, so not ``BYTES`` or ``BF16`` ones.
+        """
+        array = np.asarray(array)
+        view = self._view(_dtype(datatype_of(array.dtype)), array.shape, offset)
+        view[...] = array
+        return view.nbytes
+
+    def read(self, datatype: str, shape: typing.Sequence[int], offset: int = 0) -> np.ndarray:
+        """Return a view of the tensor of ``datatype`` and ``shape`` at ``offset``, without copying it."""
+        return self._view(_dtype(datatype), tuple(shape), offset)
+
+    def set_input(self, tensor: ModelInferRequest.InferInputTensor, array: npt.ArrayLike, offset: int = 0) -> int:
+        """Write ``array`` at ``offset`` and point the input ``tensor`` at it, returning the number of bytes written.
+
+        The datatype and shape of ``tensor`` are set from the array. Nothing must be added to ``raw_input_contents``
+        for this input, so that inputs in shared memory and in ``raw_input_contents`` are not mixed in one request.
+        """
+        array = np.asarray(array)
+        byte_size = self.write(array, offset)
+        tensor.datatype = datatype_of(array.dtype)
+        del tensor.shape[:]
+        tensor.shape.extend(array.shape)
+        self._set_parameters(tensor.parameters, offset, byte_size)
+        return byte_size
+
+    def set_output(
+        self,
+        tensor: ModelInferRequest.InferRequestedOutputTensor,
+        offset: int = 0,
+        byte_size: typing.Optional[int] = None,
+    ) -> None:
+        """Ask for the requested output ``tensor`` to be written at ``offset``, in at most ``byte_size`` bytes.
+
+        ``byte_size`` defaults to the rest of the region.
+        """
+        if byte_size is None:
+            byte_size = self.byte_size - offset
+        if offset < 0 or byte_size < 0 or offset + byte_size > self.byte_size:
+            raise ValueError(f"{byte_size} bytes at offset {offset} do not fit in a region of {self.byte_size} bytes")
+        self._set_parameters(tensor.parameters, offset, byte_size)
+
+    def read_output(self, tensor: ModelInferResponse.InferOutputTensor, offset: int = 0) -> np.ndarray:
+        """Return a view of the output ``tensor`` of a response, written at the ``offset`` given to ``set_output``."""
+        return self.read(tensor.datatype, tensor.shape, offset)
+
+    def register(self, stub: GRPCInferenceServiceStub, **kwargs: typing.Any) -> typing.Any:
+        """Register the region with the server of ``stub``, passing ``kwargs`` such as ``timeout`` to the call.
+
+        With a stub of a ``grpc.aio`` channel, the returned call must be awaited.
+        """
+        request = SystemSharedMemoryRegisterRequest(name=self.name, key=self.key, offset=0, byte_size=self.byte_size)
+        return stub.SystemSharedMemoryRegister(request, **kwargs)
+
+    def unregister(self, stub: GRPCInferenceServiceStub, **kwargs: typing.Any) -> typing.Any:
+        """Unregister the region from the server of ``stub``, passing ``kwargs`` such as ``timeout`` to the call.
+
+        With a stub of a ``grpc.aio`` channel, the returned call must be awaited.
+        """
+        return stub.SystemSharedMemoryUnregister(SystemSharedMemoryUnregisterRequest(name=self.name), **kwargs)
+
+    def close(self) -> None:
+        """Remove the underlying memory object and unmap the region."""
+        self._memory.unlink()
+        self._memory.close()
+
+    def __enter__(self) -> "SharedMemoryRegion":
+        return self
+
+    def __exit__(self, *args: typing.Any) -> None:
+        self.close()
+
+    def _view(self, dtype: np.dtype, shape: typing.Tuple[int, ...], offset: int) -> np.ndarray:
+        byte_size = dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+        if offset < 0 or offset + byte_size > self.byte_size:
+            raise ValueError(f"{byte_size} bytes at offset {offset} do not fit in a region of {self.byte_size} bytes")
+        return np.ndarray(shape, dtype=dtype, buffer=self._memory.buf, offset=offset)
+
+    def _set_parameters(self, parameters: typing.Any, offset: int, byte_size: int) -> None:
+        parameters[REGION_PARAMETER].CopyFrom(InferParameter(string_param=self.name))
+        parameters[OFFSET_PARAMETER].CopyFrom(InferParameter(int64_param=offset))
+        parameters[BYTE_SIZE_PARAMETER].CopyFrom(InferParameter(int64_param=byte_size))
+
+
+def _dtype(datatype: str) -> np.dtype:
+    if datatype in ("BYTES", "BF16"):
+        raise ValueError(
+            f"Only fixed-size datatypes that NumPy represents can go through shared memory, not {datatype}"
+        )
+    return dtype_of(datatype)
@@ -0,0 +1,263 @@
+# Copyright 2023 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Inference requests pipelined over one ``ModelStreamInfer`` stream.
+
+``ModelStreamInfer`` is the bidirectional streaming RPC of Triton and compatible servers. ``StreamingClient`` (for
+``grpc`` channels) and ``AsyncStreamingClient`` (for ``grpc.aio`` channels) keep a single stream open, write every
+request to it as soon as it is made, and hand each response to the caller whose request has the same ``id``. Requests
+sent without an ``id`` are given one, which is set on the request itself.
+
+The stream is opened by the first request, and opened again by the next request after it ends. When the stream fails,
+every request still waiting for its response fails with the ``grpc.RpcError`` of the stream.
+"""
+import asyncio
+import collections
+import itertools
+import queue
+import threading
+import typing
+import uuid
+from concurrent.futures import Future
+
+import grpc
+
+from open_inference.grpc.protocol import ModelInferRequest, ModelInferResponse, ModelStreamInferResponse
+from open_inference.grpc.service import GRPCInferenceServiceStub
+
+Metadata = typing.Optional[typing.Sequence[typing.Tuple[str, typing.Union[str, bytes]]]]
+
+# Marks the end of the requests of a stream
+_CLOSE = object()
+
+
+class StreamInferError(Exception):
+    """Error returned by the server for one request of the stream, in the ``error_message`` of its response."""
+
+    def __init__(self, response: ModelStreamInferResponse) -> None:
+        super().__init__(response.error_message)
+        self.response = response
+
+
+class _StreamingClientBase:
+    def __init__(self, stub: GRPCInferenceServiceStub, metadata: Metadata) -> None:
+        self._stub = stub
+        self._metadata = metadata
+        self._lock = threading.Lock()
+        # Futures waiting for a response, by request id and in the order the requests were sent
+        self._pending: "collections.OrderedDict[str, typing.Any]" = collections.OrderedDict()
+        self._ids = map(f"{uuid.uuid4().hex[:8]}-{{}}".format, itertools.count())
+
+    def _register(self, request: ModelInferRequest, future: typing.Any) -> None:
+        """Give ``request`` an id unless it has one, and wait for its response with ``future``."""
+        if not request.id:
+            request.id = next(self._ids)
+        elif request.id in self._pending:
+            raise ValueError(f"A request with id {request.id!r} is already waiting for its response")
+        self._pending[request.id] = future
+
+    def _forget(self, request_id: str, future: typing.Any) -> None:
+        """Stop waiting for the response to a request, after a timeout or cancellation."""
+        with self._lock:
+            if self._pending.get(request_id) is future:
+                del self._pending[request_id]
+
+    def _take(self, response: ModelStreamInferResponse) -> typing.Optional[typing.Any]:
+        """Return the future waiting for ``response``, or None if no caller is waiting for it anymore."""
+        with self._lock:
+            request_id = response.infer_response.id
+            if request_id:
+                return self._pending.pop(request_id, None)
+            # Responses to failed requests may not carry their id, and are then taken to answer the oldest request
+            if response.error_message and self._pending:
+                return self._pending.popitem(last=False)[1]
+            return None
+
+    def _take_all(self) -> typing.List[typing.Any]:
+        futures = list(self._pending.values())
+        self._pending.clear()
+        return futures
+
+    @property
+    def outstanding(self) -> int:
+        """Number of requests waiting for their response."""
+        return len(self._pending)
+
+
+class StreamingClient(_StreamingClientBase):
+    """Pipelines ``ModelInfer`` requests over one ``ModelStreamInfer`` stream of a ``grpc`` channel.
+
+    ``infer`` may be called from several threads at once, and ``infer_future`` sends a request without waiting for its
+    response. ``metadata`` is sent when opening the stream::
+
+        with StreamingClient(GRPCInferenceServiceStub(channel)) as client:
+            futures = [client.infer_future(request) for request in requests]
+            responses = [future.result() for future in futures]
+    """
+
+    def __init__(self, stub: GRPCInferenceServiceStub, *, metadata: Metadata = None) -> None:
+        super().__init__(stub, metadata)
+        self._requests: typing.Optional[queue.SimpleQueue] = None
+        self._reader: typing.Optional[threading.Thread] = None
+
+    def infer(self, request: ModelInferRequest, timeout: typing.Optional[float] = None) -> ModelInferResponse:
+        """Send ``request`` on the stream and wait up to ``timeout`` seconds for its response.
+
+        Raises ``StreamInferError`` if the server failed the request, or the ``grpc.RpcError`` of the stream.
+        """
+        future = self.infer_future(request)
+        try:
+            return future.result(timeout)
+        finally:
+            self._forget(request.id, future)
+
+    def infer_future(self, request: ModelInferRequest) -> "Future[ModelInferResponse]":
+        """Send ``request`` on the stream, and return a future of its response."""
+        future: "Future[ModelInferResponse]" = Future()
+        with self._lock:
+            self._register(request, future)
+            if self._requests is None:
+                self._open()
+            self._requests.put(request)
+        return future
+
+    def _open(self) -> None:
+        requests = self._requests = queue.SimpleQueue()
+        call = self._stub.ModelStreamInfer(iter(requests.get, _CLOSE), metadata=self._metadata)
+        self._reader = threading.Thread(target=self._read, args=(call, requests), name="StreamingClient", daemon=True)
+        self._reader.start()
+
+    def _read(self, call: typing.Iterator[ModelStreamInferResponse], requests: queue.SimpleQueue) -> None:
+        error: typing.Optional[BaseException] = None
+        try:
+            for response in call:
+                future = self._take(response)
+                # Claims the future, unless its caller cancelled it, so that it can no longer be cancelled meanwhile
+                if future is None or future.done() or not future.set_running_or_notify_cancel():
+                    continue
+                if response.error_message:
+                    future.set_exception(StreamInferError(response))
+                else:
+                    future.set_result(response.infer_response)
+        except grpc.RpcError as e:
+            error = e
+
+        with self._lock:
+            if self._requests is requests:
+                self._requests = None
+            pending = self._take_all()
+        requests.put(_CLOSE)
+        for future in pending:
+            if not future.done() and future.set_running_or_notify_cancel():
+                future.set_exception(error or grpc.RpcError("ModelStreamInfer stream ended before its response"))
+
+    def close(self) -> None:
+        """End the stream once the requests sent so far are answered."""
+        with self._lock:
+            requests, reader = self._requests, self._reader
+            self._requests = self._reader = None
+        if requests is not None:
+            requests.put(_CLOSE)
+        if reader is not None:
+            reader.join()
+
+    def __enter__(self) -> "StreamingClient":
+        return self
+
+    def __exit__(self, *exc_info: typing.Any) -> None:
+        self.close()
+
+
+class AsyncStreamingClient(_StreamingClientBase):
+    """Pipelines ``ModelInfer`` requests over one ``ModelStreamInfer`` stream of a ``grpc.aio`` channel.
+
+    ``infer`` may be awaited from many coroutines at once, all on the same event loop. ``metadata`` is sent when opening
+    the stream::
+
+        async with AsyncStreamingClient(GRPCInferenceServiceStub(channel)) as client:
+            responses = await asyncio.gather(*(client.infer(request) for request in requests))
+    """
+
+    def __init__(self, stub: GRPCInferenceServiceStub, *, metadata: Metadata = None) -> None:
+        super().__init__(stub, metadata)
+        self._requests: typing.Optional[asyncio.Queue] = None
+        self._reader: typing.Optional[asyncio.Task] = None
+
+    async def infer(self, request: ModelInferRequest) -> ModelInferResponse:
+        """Send ``request`` on the stream and wait for its response.
+
+        Raises ``StreamInferError`` if the server failed the request, or the ``grpc.RpcError`` of the stream.
+        """
+        future: "asyncio.Future[ModelInferResponse]" = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self._register(request, future)
+            if self._requests is None:
+                self._open()
+            self._requests.put_nowait(request)
+        try:
+            return await future
+        finally:
+            self._forget(request.id, future)
+
+    def _open(self) -> None:
+        requests = self._requests = asyncio.Queue()
+
+        async def request_iterator() -> typing.AsyncIterator[ModelInferRequest]:
+            while True:
+                request = await requests.get()
+                if request is _CLOSE:
+                    return
+                yield request
+
+        call = self._stub.ModelStreamInfer(request_iterator(), metadata=self._metadata)
+        self._reader = asyncio.get_running_loop().create_task(self._read(call, requests))
+
+    async def _read(self, call: typing.AsyncIterator[ModelStreamInferResponse], requests: asyncio.Queue) -> None:
+        error: typing.Optional[BaseException] = None
+        try:
+            async for response in call:
+                future = self._take(response)
+                if future is None or future.done():
+                    continue
+                if response.error_message:
+                    future.set_exception(StreamInferError(response))
+                else:
+                    future.set_result(response.infer_response)
+        except grpc.RpcError as e:
+            error = e
+
+        with self._lock:
+            if self._requests is requests:
+                self._requests = None
+            pending = self._take_all()
+        requests.put_nowait(_CLOSE)
+        for future in pending:
+            if not future.done():
+                future.set_exception(error or grpc.RpcError("ModelStreamInfer stream ended before its response"))
+
+    async def close(self) -> None:
+        """End the stream once the requests sent so far are answered."""
+        with self._lock:
+            requests, reader = self._requests, self._reader
+            self._requests = self._reader = None
+        if requests is not None:
+            requests.put_nowait(_CLOSE)
+        if reader is not None:
+            await reader
+
+    async def __aenter__(self) -> "AsyncStreamingClient":
+        return self
+
+    async def __aexit__(self, *exc_info: typing.Any) -> None:
+        await self.close()
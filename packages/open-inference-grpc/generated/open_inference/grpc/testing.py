@@ -0,0 +1,254 @@
+# Copyright 2023 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A local inference server to test clients against.
+
+``FakeInferenceServicer`` serves models given as Python functions from input arrays to output arrays. It takes
+tensors as ``open_inference.grpc.codec.decode_infer_request`` reads them or in registered regions of system shared
+memory, returns them in ``raw_output_contents`` or in registered regions, and answers ``ModelStreamInfer`` as well as
+``ModelInfer``. It is meant for tests, not for serving models.
+
+Requires the ``numpy`` extra: ``pip install open-inference-grpc[numpy]``.
+"""
+import contextlib
+import sys
+import threading
+import typing
+from concurrent import futures
+from multiprocessing import shared_memory
+
+import grpc
+import numpy as np
+import numpy.typing as npt
+
+from open_inference.grpc.bytes_codec import encode_bytes_tensor
+from open_inference.grpc.codec import datatype_of, decode_infer_request, dtype_of, to_bfloat16
+from open_inference.grpc.protocol import (
+    InferParameter,
+    ModelInferRequest,
+    ModelInferResponse,
+    ModelReadyResponse,
+    ModelStreamInferResponse,
+    ServerLiveResponse,
+    ServerReadyResponse,
+    SystemSharedMemoryRegisterRequest,
+    SystemSharedMemoryRegisterResponse,
+    SystemSharedMemoryStatusResponse,
+    SystemSharedMemoryUnregisterResponse,
+)
+from open_inference.grpc.service import GRPCInferenceServiceServicer, add_GRPCInferenceServiceServicer_to_server
+from open_inference.grpc.shared_memory import BYTE_SIZE_PARAMETER, OFFSET_PARAMETER, REGION_PARAMETER
+
+Model = typing.Callable[[typing.Dict[str, np.ndarray]], typing.Mapping[str, npt.ArrayLike]]
+
+
+class _InferError(Exception):
+    def __init__(self, code: grpc.StatusCode, details: str) -> None:
+        super().__init__(details)
+        self.code = code
+        self.details = details
+
+
+class _Region(typing.NamedTuple):
+    request: SystemSharedMemoryRegisterRequest
+    memory: shared_memory.SharedMemory
+
+
+class FakeInferenceServicer(GRPCInferenceServiceServicer):
+    """Serves ``models``, each called with the inputs of a request as arrays and returning its outputs as arrays.
+
+    Only the outputs named by a request are returned, or all of them when it names none::
+
+        servicer = FakeInferenceServicer({"add-one": lambda inputs: {"output-0": inputs["input-0"] + 1}})
+    """
+
+    def __init__(self, models: typing.Mapping[str, Model]) -> None:
+        self.models = dict(models)
+        self._regions: typing.Dict[str, _Region] = {}
+        self._lock = threading.Lock()
+
+    def ServerLive(self, request, context):
+        return ServerLiveResponse(live=True)
+
+    def ServerReady(self, request, context):
+        return ServerReadyResponse(ready=True)
+
+    def ModelReady(self, request, context):
+        return ModelReadyResponse(ready=request.name in self.models)
+
+    def ModelInfer(self, request, context):
+        try:
+            return self._infer(request)
+        except _InferError as e:
+            context.abort(e.code, e.details)
+
+    def ModelStreamInfer(self, request_iterator, context):
+        for request in request_iterator:
+            try:
+                yield ModelStreamInferResponse(infer_response=self._infer(request))
+            except _InferError as e:
+                yield ModelStreamInferResponse(
+                    error_message=e.details,
+                    infer_response=ModelInferResponse(model_name=request.model_name, id=request.id),
+                )
+
+    def SystemSharedMemoryStatus(self, request, context):
+        with self._lock:
+            regions = {name: region.request for name, region in self._regions.items() if request.name in ("", name)}
+        if request.name and not regions:
+            context.abort(grpc.StatusCode.NOT_FOUND, f"Unable to find system shared memory region: '{request.name}'")
+        response = SystemSharedMemoryStatusResponse()
+        for name, region in regions.items():
+            response.regions[name].CopyFrom(
+                SystemSharedMemoryStatusResponse.RegionStatus(
+                    name=name, key=region.key, offset=region.offset, byte_size=region.byte_size
+                )
+            )
+        return response
+
+    def SystemSharedMemoryRegister(self, request, context):
+        with self._lock:
+            if request.name in self._regions:
+                context.abort(
+                    grpc.StatusCode.ALREADY_EXISTS, f"Shared memory region '{request.name}' is already registered"
+                )
+            try:
+                memory = _attach(request.key)
+            except OSError as e:
+                context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"Unable to open shared memory '{request.key}': {e}")
+            if request.offset + request.byte_size > memory.size:
+                memory.close()
+                context.abort(
+                    grpc.StatusCode.INVALID_ARGUMENT,
+                    f"Shared memory '{request.key}' of {memory.size} bytes has no {request.byte_size} bytes at offset"
+                    f" {request.offset}",
+                )
+            self._regions[request.name] = _Region(request, memory)
+        return SystemSharedMemoryRegisterResponse()
+
+    def SystemSharedMemoryUnregister(self, request, context):
+        with self._lock:
+            names = [request.name] if request.name else list(self._regions)
+            for name in names:
+                region = self._regions.pop(name, None)
+                if region is not None:
+                    region.memory.close()
+        return SystemSharedMemoryUnregisterResponse()
+
+    def _infer(self, request: ModelInferRequest) -> ModelInferResponse:
+        model = self.models.get(request.model_name)
+        if model is None:
+            raise _InferError(grpc.StatusCode.NOT_FOUND, f"Model {request.model_name!r} is not served")
+        inputs = {}
+        if any(REGION_PARAMETER in tensor.parameters for tensor in request.inputs):
+            # Inputs in shared memory are read from their region, and the others decoded from the rest of the request
+            rest = ModelInferRequest()
+            for index, tensor in enumerate(request.inputs):
+                if REGION_PARAMETER in tensor.parameters:
+                    view = self._region_view(tensor.parameters, tensor.datatype, tuple(tensor.shape))
+                    inputs[tensor.name] = view.copy()
+                    continue
+                rest.inputs.append(tensor)
+                if index < len(request.raw_input_contents):
+                    rest.raw_input_contents.append(request.raw_input_contents[index])
+        else:
+            rest = request
+        try:
+            inputs.update(decode_infer_request(rest))
+        except ValueError as e:
+            raise _InferError(grpc.StatusCode.INVALID_ARGUMENT, str(e)) from None
+
+        outputs = {name: np.asarray(array) for name, array in model(inputs).items()}
+        requested = {tensor.name: tensor for tensor in request.outputs} or dict.fromkeys(outputs)
+        response = ModelInferResponse(model_name=request.model_name, model_version=request.model_version, id=request.id)
+        for name, requested_tensor in requested.items():
+            if name not in outputs:
+                raise _InferError(
+                    grpc.StatusCode.INVALID_ARGUMENT, f"Model {request.model_name!r} has no output {name!r}"
+                )
+            array = outputs[name]
+            tensor = response.outputs.add(name=name, datatype=datatype_of(array.dtype), shape=array.shape)
+            if requested_tensor is not None and REGION_PARAMETER in requested_tensor.parameters:
+                parameters = requested_tensor.parameters
+                if array.nbytes > parameters[BYTE_SIZE_PARAMETER].int64_param:
+                    raise _InferError(
+                        grpc.StatusCode.INVALID_ARGUMENT,
+                        f"Output {name!r} of {array.nbytes} bytes does not fit in"
+                        f" {parameters[BYTE_SIZE_PARAMETER].int64_param} bytes of shared memory",
+                    )
+                self._region_view(parameters, tensor.datatype, array.shape)[...] = array
+                for parameter in (REGION_PARAMETER, OFFSET_PARAMETER, BYTE_SIZE_PARAMETER):
+                    tensor.parameters[parameter].CopyFrom(parameters[parameter])
+            elif tensor.datatype == "BYTES":
+                response.raw_output_contents.append(encode_bytes_tensor(array))
+            elif tensor.datatype == "BF16":
+                response.raw_output_contents.append(to_bfloat16(array).tobytes())
+            else:
+                response.raw_output_contents.append(
+                    np.ascontiguousarray(array, dtype=dtype_of(tensor.datatype)).tobytes()
+                )
+        if len(response.raw_output_contents) not in (0, len(response.outputs)):
+            raise _InferError(
+                grpc.StatusCode.INVALID_ARGUMENT, "Outputs in shared memory and in raw_output_contents cannot be mixed"
+            )
+        return response
+
+    def _region_view(
+        self, parameters: typing.Mapping[str, InferParameter], datatype: str, shape: typing.Tuple[int, ...]
+    ) -> np.ndarray:
+        name = parameters[REGION_PARAMETER].string_param
+        with self._lock:
+            region = self._regions.get(name)
+        if region is None:
+            raise _InferError(grpc.StatusCode.INVALID_ARGUMENT, f"Shared memory region {name!r} is not registered")
+        offset = parameters[OFFSET_PARAMETER].int64_param if OFFSET_PARAMETER in parameters else 0
+        dtype = self._dtype(datatype)
+        byte_size = dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+        if offset + byte_size > region.request.byte_size:
+            raise _InferError(
+                grpc.StatusCode.INVALID_ARGUMENT,
+                f"{byte_size} bytes at offset {offset} do not fit in shared memory region {name!r}",
+            )
+        return np.ndarray(shape, dtype=dtype, buffer=region.memory.buf, offset=region.request.offset + offset)
+
+    @staticmethod
+    def _dtype(datatype: str) -> np.dtype:
+        try:
+            return dtype_of(datatype)
+        except ValueError as e:
+            raise _InferError(grpc.StatusCode.INVALID_ARGUMENT, str(e)) from None
+
+
+@contextlib.contextmanager
+def local_server(servicer: GRPCInferenceServiceServicer, *, max_workers: int = 4) -> typing.Iterator[str]:
+    """Serve ``servicer`` on a free local port for the duration of the context, yielding the target to connect to::
+
+    with local_server(FakeInferenceServicer(models)) as target, grpc.insecure_channel(target) as channel:
+        stub = GRPCInferenceServiceStub(channel)
+    """
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
+    add_GRPCInferenceServiceServicer_to_server(servicer, server)
+    port = server.add_insecure_port("localhost:0")
+    server.start()
+    try:
+        yield f"localhost:{port}"
+    finally:
+        server.stop(None)
+
+
+def _attach(key: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        # The memory object belongs to the client, which removes it
+        return shared_memory.SharedMemory(name=key.lstrip("/"), track=False)
+    return shared_memory.SharedMemory(name=key.lstrip("/"))
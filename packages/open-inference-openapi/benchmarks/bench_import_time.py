@@ -0,0 +1,88 @@
+"""
+Import time of open_inference.openapi, measured with `python -X importtime` in fresh interpreters.
+
+Each statement is run in a new interpreter `--repeat` times, and the fastest run is reported, leaving out the modules
+the interpreter imports on startup. With `--check`, exits with an error when a statement imports a module it should
+not, such as httpx for the bare package import, or when the bare package import takes longer than `--budget-ms`.
+
+    python benchmarks/bench_import_time.py [--repeat N] [--check] [--budget-ms MS]
+"""
+
+import argparse
+import os
+import pathlib
+import subprocess
+import sys
+from typing import Dict, FrozenSet, List, Tuple
+
+GENERATED = pathlib.Path(__file__).parent.parent / "generated"
+
+# Each statement, with the modules it must not import
+STATEMENTS: Dict[str, FrozenSet[str]] = {
+    "import open_inference.openapi": frozenset({"httpx", "pydantic", "open_inference.openapi.types"}),
+    "from open_inference.openapi import InferenceRequest": frozenset({"httpx", "open_inference.openapi.client"}),
+    "from open_inference.openapi import ServiceUnavailableError": frozenset({"httpx", "open_inference.openapi.types"}),
+    "from open_inference.openapi.client import OpenInferenceClient": frozenset(),
+}
+
+
+def import_times(statement: str) -> Dict[str, int]:
+    """
+    Return the cumulative import time in microseconds of each module imported at the top level while running
+    `statement`, along with every module imported, nested or not, with a time of 0.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(GENERATED), os.environ.get("PYTHONPATH")])))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        env=env,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    times: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Nested imports are indented under the module importing them
+        times[name.strip()] = int(cumulative) if not name[1:].startswith(" ") else 0
+    return times
+
+
+def measure(statement: str, startup: FrozenSet[str], repeat: int) -> Tuple[float, List[str]]:
+    best = float("inf")
+    modules: List[str] = []
+    for _ in range(repeat):
+        times = import_times(statement)
+        modules = [name for name in times if name not in startup]
+        best = min(best, sum(times[name] for name in modules) / 1000)
+    return best, modules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--check", action="store_true", help="Fail on unexpected imports, or over the budget")
+    parser.add_argument("--budget-ms", type=float, default=20.0, help="Budget of the bare package import")
+    args = parser.parse_args()
+
+    startup = frozenset(import_times("pass"))
+    failures = []
+    print(f"{'statement':<64} {'time':>10} {'modules':>8}")
+    for statement, forbidden in STATEMENTS.items():
+        elapsed, modules = measure(statement, startup, args.repeat)
+        print(f"{statement:<64} {elapsed:>8.1f}ms {len(modules):>8}")
+        unexpected = sorted(forbidden.intersection(modules))
+        if unexpected:
+            failures.append(f"{statement!r} imports {', '.join(unexpected)}")
+        if statement == "import open_inference.openapi" and elapsed > args.budget_ms:
+            failures.append(f"{statement!r} takes {elapsed:.1f}ms, over the budget of {args.budget_ms}ms")
+
+    if args.check and failures:
+        sys.exit("\n".join(failures))
+    for failure in failures:
+        print(f"warning: {failure}")
+
+
+if __name__ == "__main__":
+    main()
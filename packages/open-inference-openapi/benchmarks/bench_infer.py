@@ -0,0 +1,198 @@
+"""
+Throughput and latency of model_infer against an in-process echo server, swept over payload size, datatype,
+concurrency and codec.
+
+The server is a `FakeInferenceServer` returning every input as an output, reached through `httpx.MockTransport`
+without a network, so that the time measured is the client's encoding and decoding, the validation of the models,
+and the server's own parsing of the bodies. Each case calls `model_infer` from `concurrency` threads sharing one client
+for `--duration` seconds, with the codec:
+
+- json: JSON bodies written by the standard library `JsonSerializer`
+- orjson: JSON bodies written by `OrjsonSerializer`, when orjson is installed
+- binary: the binary tensor data extension, with `binary_data=True`
+
+Results are printed, and written as JSON with `--json`. With `--compare`, cases are compared with the JSON results
+of an earlier run, and a drop of throughput by more than `--tolerance` is reported, failing the run with `--check`.
+
+    python benchmarks/bench_infer.py [--elements N ...] [--datatype FP32 ...] [--concurrency N ...]
+        [--codec json|orjson|binary ...] [--duration S] [--json PATH] [--compare PATH [--tolerance F] [--check]]
+"""
+
+import argparse
+import json
+import pathlib
+import platform
+import random
+import string
+import sys
+import threading
+import time
+from concurrent import futures
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "generated"))
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+import pydantic  # noqa: E402
+
+from open_inference.openapi import InferenceRequest, RequestInput  # noqa: E402
+from open_inference.openapi.client import OpenInferenceClient  # noqa: E402
+from open_inference.openapi.core.serialization import JsonSerializer, OrjsonSerializer  # noqa: E402
+from open_inference.openapi.testing import FakeInferenceServer  # noqa: E402
+
+DATATYPES = ["FP32", "FP16", "INT64", "BYTES"]
+CODECS = ["json", "orjson", "binary"]
+
+
+def tensor(datatype: str, elements: int) -> np.ndarray:
+    if datatype == "BYTES":
+        words = [
+            "".join(random.choices(string.ascii_letters, k=random.randint(1, 32))) for _ in range(min(elements, 1024))
+        ]
+        return np.array((words * (elements // len(words) + 1))[:elements], dtype=object)
+    if datatype == "INT64":
+        return np.random.randint(0, 1 << 40, size=elements, dtype=np.int64)
+    return np.random.rand(elements).astype({"FP32": np.float32, "FP16": np.float16}[datatype])
+
+
+def client_for(codec: str) -> OpenInferenceClient:
+    server = FakeInferenceServer({"echo": lambda inputs: {"output-0": inputs["input-0"]}})
+    serializer = JsonSerializer() if codec == "json" else OrjsonSerializer()
+    return OpenInferenceClient(
+        base_url="http://benchmark",
+        httpx_client=httpx.Client(transport=httpx.MockTransport(server)),
+        serializer=serializer,
+    )
+
+
+def percentile(latencies: List[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of sorted ``latencies``."""
+    return latencies[min(int(fraction * len(latencies)), len(latencies) - 1)]
+
+
+def run_case(
+    client: OpenInferenceClient, codec: str, datatype: str, array: np.ndarray, concurrency: int, duration: float
+) -> Dict[str, Any]:
+    binary_data = codec == "binary"
+
+    def call() -> Any:
+        request = InferenceRequest(
+            inputs=[RequestInput(name="input-0", shape=[array.size], datatype=datatype, data=array)]
+        )
+        return client.model_infer("echo", request=request, binary_data=binary_data)
+
+    # Checks the round trip
+    assert len(call().outputs[0].data.__root__) == array.size
+
+    latencies: List[List[float]] = [[] for _ in range(concurrency)]
+    stop = threading.Event()
+
+    def worker(times: List[float]) -> None:
+        while not stop.is_set():
+            start = time.perf_counter()
+            call()
+            times.append(time.perf_counter() - start)
+
+    with futures.ThreadPoolExecutor(concurrency) as executor:
+        start = time.perf_counter()
+        running = [executor.submit(worker, times) for times in latencies]
+        time.sleep(duration)
+        stop.set()
+        for future in running:
+            future.result()
+        elapsed = time.perf_counter() - start
+
+    merged = sorted(latency for times in latencies for latency in times)
+    return {
+        "calls": len(merged),
+        "throughput": len(merged) / elapsed,
+        "p50_ms": percentile(merged, 0.50) * 1000,
+        "p99_ms": percentile(merged, 0.99) * 1000,
+    }
+
+
+def case_key(case: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (case["codec"], case["datatype"], case["elements"], case["concurrency"])
+
+
+def compare(cases: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> List[str]:
+    """Print the change of each case from the baseline, and return the regressions beyond ``tolerance``."""
+    baseline = {case_key(case): case for case in json.loads(pathlib.Path(baseline_path).read_text())["cases"]}
+    regressions = []
+    print(f"\ncompared with {baseline_path}")
+    for case in cases:
+        before = baseline.get(case_key(case))
+        if before is None:
+            continue
+        change = case["throughput"] / before["throughput"] - 1
+        print(
+            f"{case['codec']:<7} {case['datatype']:<6} {case['elements']:>9} {case['concurrency']:>4}"
+            f" {change:>+9.1%} throughput, p99 {before['p99_ms']:.2f}ms -> {case['p99_ms']:.2f}ms"
+        )
+        if change < -tolerance:
+            regressions.append(f"{case_key(case)} lost {-change:.1%} of its throughput")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--elements", type=int, nargs="+", default=[256, 16384, 262144])
+    parser.add_argument("--datatype", nargs="+", choices=DATATYPES, default=DATATYPES)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--codec", nargs="+", choices=CODECS, default=CODECS)
+    parser.add_argument("--duration", type=float, default=1.0, help="Seconds of calls per case")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Compare with the results of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Drop of throughput reported as a regression")
+    parser.add_argument("--check", action="store_true", help="Fail on regressions")
+    args = parser.parse_args()
+
+    cases: List[Dict[str, Any]] = []
+    print(f"{'codec':<7} {'dtype':<6} {'elements':>9} {'conc':>4} {'calls/s':>10} {'p50':>9} {'p99':>9}")
+    for codec in args.codec:
+        try:
+            client = client_for(codec)
+        except ImportError as e:
+            print(f"{codec:<7} unavailable: {e}")
+            continue
+        for datatype in args.datatype:
+            for elements in args.elements:
+                array = tensor(datatype, elements)
+                for concurrency in args.concurrency:
+                    result = run_case(client, codec, datatype, array, concurrency, args.duration)
+                    cases.append(
+                        {
+                            "codec": codec,
+                            "datatype": datatype,
+                            "elements": elements,
+                            "concurrency": concurrency,
+                            **result,
+                        }
+                    )
+                    print(
+                        f"{codec:<7} {datatype:<6} {elements:>9} {concurrency:>4} {result['throughput']:>10.0f}"
+                        f" {result['p50_ms']:>7.2f}ms {result['p99_ms']:>7.2f}ms"
+                    )
+
+    if args.json:
+        results = {
+            "transport": "rest",
+            "python": platform.python_version(),
+            "httpx": httpx.__version__,
+            "pydantic": pydantic.VERSION,
+            "numpy": np.__version__,
+            "duration": args.duration,
+            "cases": cases,
+        }
+        pathlib.Path(args.json).write_text(json.dumps(results, indent=2) + "\n")
+
+    regressions = compare(cases, args.compare, args.tolerance) if args.compare else []
+    if regressions and args.check:
+        sys.exit("\n".join(regressions))
+    for regression in regressions:
+        print(f"warning: {regression}")
+
+
+if __name__ == "__main__":
+    main()
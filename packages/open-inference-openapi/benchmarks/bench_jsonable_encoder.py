@@ -0,0 +1,131 @@
+"""
+Microbenchmark of core.jsonable_encoder on inference requests with realistic tensor shapes.
+
+Compares the current encoder with the recursive one Fern generates (kept below as `recursive_jsonable_encoder`), and
+checks that both produce the same output.
+
+    python benchmarks/bench_jsonable_encoder.py [--repeat N]
+"""
+
+import argparse
+import dataclasses
+import datetime as dt
+import pathlib
+import random
+import sys
+import timeit
+from enum import Enum
+from pathlib import PurePath
+from types import GeneratorType
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "generated"))
+
+from open_inference.openapi import InferenceRequest, RequestInput  # noqa: E402
+from open_inference.openapi.core.datetime_utils import serialize_datetime  # noqa: E402
+from open_inference.openapi.core.jsonable_encoder import (  # noqa: E402
+    encoders_by_class_tuples,
+    jsonable_encoder,
+    pydantic,
+)
+
+SHAPES = {
+    "image [1, 224, 224, 3] nested": [1, 224, 224, 3],
+    "image [1, 224, 224, 3] flat": [1 * 224 * 224 * 3],
+    "features [64, 512] nested": [64, 512],
+    "tabular [1024, 16] nested": [1024, 16],
+}
+
+
+def recursive_jsonable_encoder(obj: Any, custom_encoder: Optional[Dict[Any, Callable[[Any], Any]]] = None) -> Any:
+    custom_encoder = custom_encoder or {}
+    if custom_encoder:
+        if type(obj) in custom_encoder:
+            return custom_encoder[type(obj)](obj)
+        else:
+            for encoder_type, encoder_instance in custom_encoder.items():
+                if isinstance(obj, encoder_type):
+                    return encoder_instance(obj)
+    if isinstance(obj, pydantic.BaseModel):
+        # Copied, where the generated encoder updated the model config in place
+        encoder = dict(getattr(obj.__config__, "json_encoders", {}))
+        if custom_encoder:
+            encoder.update(custom_encoder)
+        obj_dict = obj.dict(by_alias=True)
+        if "__root__" in obj_dict:
+            obj_dict = obj_dict["__root__"]
+        return recursive_jsonable_encoder(obj_dict, custom_encoder=encoder)
+    if dataclasses.is_dataclass(obj):
+        obj_dict = dataclasses.asdict(obj)
+        return recursive_jsonable_encoder(obj_dict, custom_encoder=custom_encoder)
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, PurePath):
+        return str(obj)
+    if isinstance(obj, (str, int, float, type(None))):
+        return obj
+    if isinstance(obj, dt.date):
+        return str(obj)
+    if isinstance(obj, dt.datetime):
+        return serialize_datetime(obj)
+    if isinstance(obj, dict):
+        encoded_dict = {}
+        allowed_keys = set(obj.keys())
+        for key, value in obj.items():
+            if key in allowed_keys:
+                encoded_key = recursive_jsonable_encoder(key, custom_encoder=custom_encoder)
+                encoded_value = recursive_jsonable_encoder(value, custom_encoder=custom_encoder)
+                encoded_dict[encoded_key] = encoded_value
+        return encoded_dict
+    if isinstance(obj, (list, set, frozenset, GeneratorType, tuple)):
+        encoded_list = []
+        for item in obj:
+            encoded_list.append(recursive_jsonable_encoder(item, custom_encoder=custom_encoder))
+        return encoded_list
+
+    if type(obj) in pydantic.json.ENCODERS_BY_TYPE:
+        return pydantic.json.ENCODERS_BY_TYPE[type(obj)](obj)
+    for encoder, classes_tuple in encoders_by_class_tuples.items():
+        if isinstance(obj, classes_tuple):
+            return encoder(obj)
+
+    try:
+        data = dict(obj)
+    except Exception as e:
+        errors: List[Exception] = []
+        errors.append(e)
+        try:
+            data = vars(obj)
+        except Exception as e:
+            errors.append(e)
+            raise ValueError(errors) from e
+    return recursive_jsonable_encoder(data, custom_encoder=custom_encoder)
+
+
+def nested(shape: List[int]) -> Any:
+    if len(shape) == 1:
+        return [random.random() for _ in range(shape[0])]
+    return [nested(shape[1:]) for _ in range(shape[0])]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case, the best is reported")
+    args = parser.parse_args()
+
+    print(f"{'case':<36} {'recursive':>12} {'current':>12} {'speedup':>9}")
+    for case, shape in SHAPES.items():
+        request = InferenceRequest(
+            inputs=[RequestInput(name="input-0", shape=shape, datatype="FP32", data=nested(shape))],
+            parameters={"content_type": "np"},
+        )
+        if jsonable_encoder(request) != recursive_jsonable_encoder(request):
+            raise AssertionError(f"Encoders disagree on {case}")
+
+        recursive = min(timeit.repeat(lambda: recursive_jsonable_encoder(request), number=1, repeat=args.repeat))
+        current = min(timeit.repeat(lambda: jsonable_encoder(request), number=1, repeat=args.repeat))
+        print(f"{case:<36} {recursive * 1e3:>10.2f}ms {current * 1e3:>10.2f}ms {recursive / current:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 from datetime import date
 from textwrap import dedent
+import ast
 import itertools
 import os
 import pathlib
+import re
 import subprocess
 import sys
+import typing
 import urllib.request
 
 import black
@@ -26,6 +29,26 @@ def maybe_download_proto(protopath: pathlib.Path) -> None:
         urllib.request.urlretrieve(PROTO_URL, protopath / "open_inference_rest.yaml")
 
 
+FERN_MARKER = "This file was auto-generated by Fern"
+
+
+def stash_handwritten_modules(outputpath: pathlib.Path) -> typing.Dict[pathlib.Path, str]:
+    handwritten = {}
+    for path in outputpath.glob("**/*.py"):
+        content = path.read_text()
+        if FERN_MARKER not in content:
+            print(f"> Keeping hand-written module {path}")
+            handwritten[path.relative_to(outputpath)] = content
+    return handwritten
+
+
+def restore_handwritten_modules(outputpath: pathlib.Path, handwritten: typing.Dict[pathlib.Path, str]) -> None:
+    for relative_path, content in handwritten.items():
+        print(f"> Restoring hand-written module {outputpath / relative_path}")
+        (outputpath / relative_path).parent.mkdir(parents=True, exist_ok=True)
+        (outputpath / relative_path).write_text(content)
+
+
 def build_client() -> None:
     print("> Running fern")
 
@@ -46,6 +69,8 @@ def patch_recursive_tensor(outputpath: pathlib.Path) -> None:
             from __future__ import annotations
             import typing
 
+            from ..tensors import check_array, is_array
+
             try:
                 import pydantic.v1 as pydantic  # type: ignore
             except ImportError:
@@ -53,8 +78,34 @@ def patch_recursive_tensor(outputpath: pathlib.Path) -> None:
 
 
             class TensorData(pydantic.BaseModel):
+                '''
+                Tensor data as a (nested) list of values, or as a NumPy array or ``array.array`` holding the tensor in
+                row-major order.
+
+                Arrays are only checked against the datatype and shape of the enclosing tensor, and flat lists of a
+                single scalar type are converted in bulk; neither goes through per-element validation.
+                '''
+
                 __root__: typing.List[typing.Union[TensorData, float, str, bool]]
 
+                @classmethod
+                def __get_validators__(cls) -> typing.Generator[typing.Callable[..., typing.Any], None, None]:
+                    yield cls.validate_tensor
+
+                @classmethod
+                def validate_tensor(cls, value: typing.Any, values: typing.Dict[str, typing.Any]) -> TensorData:
+                    if is_array(value):
+                        check_array(value, values.get("datatype"), values.get("shape"))
+                        return cls.construct(__root__=value)
+                    if type(value) is list and value:
+                        first = type(value[0])
+                        if first in (float, str) and all(type(item) is first for item in value):
+                            return cls.construct(__root__=value)
+                        if first in (int, bool) and all(type(item) in (int, bool) for item in value):
+                            # Matches the coercion of integers and booleans through the float member of the union
+                            return cls.construct(__root__=list(map(float, value)))
+                    return cls.validate(value)
+
             """
         )
     )
@@ -76,6 +127,231 @@ def patch_recursive_tensor(outputpath: pathlib.Path) -> None:
     )
 
 
+CLIENT_INIT = """
+    def __init__(
+        self,
+        *,
+        base_url: str,
+        timeout: typing.Optional[float] = 60,
+        httpx_client: typing.Optional[httpx.{httpx_class}] = None,
+        serializer: typing.Optional[JsonSerializer] = None,
+        limits: typing.Optional[httpx.Limits] = None,
+        keepalive_expiry: typing.Optional[float] = None,
+        http2: bool = False,
+        share_connections: bool = False,{extra_parameters}
+    ):
+        if httpx_client is None:
+            httpx_client = build_httpx_client(
+                httpx.{httpx_class},
+                base_url=base_url,
+                timeout=timeout,
+                limits=limits,
+                keepalive_expiry=keepalive_expiry,
+                http2=http2,
+                share_connections=share_connections,
+            )
+        self._client_wrapper = {wrapper_class}(
+            base_url=base_url,
+            httpx_client=httpx_client,
+            serializer=default_serializer() if serializer is None else serializer,{extra_wrapper_arguments}
+        ){extra_statements}
+
+    {async_}def prewarm(self, connections: int) -> None:
+        '''
+        Open up to `connections` connections to the server ahead of the first requests, by sending as many concurrent liveness checks.
+        '''
+        {await_}{prewarm_function}(self._client_wrapper.httpx_client, self._client_wrapper.get_base_url(), connections)
+{extra_methods}"""
+
+ASYNC_CLIENT_METHODS = """
+    def bulk_infer(
+        self,
+        model_name: str,
+        rows: Rows,
+        *,
+        model_version: typing.Optional[str] = None,
+        concurrency: int = 4,
+        batch_size: int = 1,
+        ordered: bool = True,
+        outputs: typing.Optional[typing.Iterable[str]] = None,
+        parameters: typing.Optional[Parameters] = None,
+        binary_data: bool = False,
+    ) -> typing.AsyncIterator[typing.Tuple[int, InferenceResponse]]:
+        '''
+        Infer every row of `rows` in requests of `batch_size` rows, keeping up to `concurrency` requests in flight, and yield the index of each row along with its response. Rows are only read as requests complete, so memory is bounded by the in-flight window.
+
+        Parameters:
+            - model_name: str.
+
+            - rows: Rows. An iterable or async iterable of rows, each mapping every input of the model to its data for that row, without the first (batch) dimension.
+
+            - model_version: typing.Optional[str]. The model version to infer with, or the version the server picks.
+
+            - concurrency: int. The number of requests in flight.
+
+            - batch_size: int. The number of rows in each request.
+
+            - ordered: bool. Yield responses in the order of the rows, rather than as their requests complete.
+
+            - outputs: typing.Optional[typing.Iterable[str]]. The outputs to request.
+
+            - parameters: typing.Optional[Parameters]. The parameters of every request.
+
+            - binary_data: bool. Send array inputs and receive outputs with the binary tensor data extension.
+        ---
+        from open_inference.openapi.client import AsyncOpenInferenceClient
+
+        client = AsyncOpenInferenceClient(
+            base_url="https://yourhost.com/path/to/api",
+        )
+        async for index, response in client.bulk_infer("MODEL_NAME", rows, concurrency=8, batch_size=32):
+            ...
+        '''
+        return bulk_infer(
+            self,
+            model_name,
+            rows,
+            model_version=model_version,
+            concurrency=concurrency,
+            batch_size=batch_size,
+            ordered=ordered,
+            outputs=outputs,
+            parameters=parameters,
+            binary_data=binary_data,
+        )
+"""
+
+CLIENT_CLASSES = [
+    {
+        "client_class": "OpenInferenceClient",
+        "httpx_class": "Client",
+        "wrapper_class": "SyncClientWrapper",
+        "extra_parameters": "\n        prewarm_connections: int = 0,",
+        "extra_wrapper_arguments": "",
+        "extra_statements": "\n        if prewarm_connections:\n            self.prewarm(prewarm_connections)",
+        "async_": "",
+        "await_": "",
+        "prewarm_function": "prewarm",
+        "extra_methods": "",
+    },
+    {
+        "client_class": "AsyncOpenInferenceClient",
+        "httpx_class": "AsyncClient",
+        "wrapper_class": "AsyncClientWrapper",
+        "extra_parameters": "\n        codec_executor: typing.Optional[concurrent.futures.Executor] = None,",
+        "extra_wrapper_arguments": "\n            codec_executor=codec_executor,",
+        "extra_statements": "",
+        "async_": "async ",
+        "await_": "await ",
+        "prewarm_function": "prewarm_async",
+        "extra_methods": ASYNC_CLIENT_METHODS,
+    },
+]
+
+
+def patch_client_init(outputpath: pathlib.Path) -> None:
+    print(f"> Replacing client constructors in {outputpath / 'client.py'}")
+    client_content = (outputpath / "client.py").read_text()
+    for client in CLIENT_CLASSES:
+        client_content = re.sub(
+            rf"(class {client['client_class']}:)\n    def __init__\(.*?\n        \)\n",
+            lambda match: match.group(1) + CLIENT_INIT.format(**client),
+            client_content,
+            count=1,
+            flags=re.DOTALL,
+        )
+    (outputpath / "client.py").write_text(
+        client_content.replace(
+            "import typing\nimport urllib.parse\n",
+            "import concurrent.futures\nimport typing\nimport urllib.parse\n",
+        )
+        .replace(
+            "from .core.api_error import ApiError\n",
+            "from .bulk import Rows, bulk_infer\n"
+            "from .connections import build_httpx_client, prewarm, prewarm_async\n"
+            "from .core.api_error import ApiError\n",
+        )
+        .replace(
+            "from .core.jsonable_encoder import jsonable_encoder\n",
+            "from .core.serialization import JsonSerializer, default_serializer\n",
+        )
+        .replace(
+            "from .types.metadata_server_response import MetadataServerResponse\n",
+            "from .types.metadata_server_response import MetadataServerResponse\n"
+            "from .types.parameters import Parameters\n",
+        )
+    )
+
+
+INFER_REQUEST = re.compile(
+    r'(        _response = (?:await )?self\._client_wrapper\.httpx_client\.request\(\n            "POST",\n(?:            .*\n)+?)'
+    r"            json=jsonable_encoder\(request\),\n"
+    r"            headers=self\._client_wrapper\.get_headers\(\),\n"
+)
+
+
+ENCODE_REQUEST = {
+    False: "encode_inference_request(request, self._client_wrapper.serializer, binary_data=binary_data)",
+    True: "await encode_inference_request_async(\n"
+    "            request,\n"
+    "            self._client_wrapper.serializer,\n"
+    "            binary_data=binary_data,\n"
+    "            executor=self._client_wrapper.codec_executor,\n"
+    "        )",
+}
+
+DECODE_RESPONSE = {
+    False: "decode_inference_response(_response, self._client_wrapper.serializer)",
+    True: "await decode_inference_response_async(\n"
+    "                _response, self._client_wrapper.serializer, self._client_wrapper.codec_executor\n"
+    "            )",
+}
+
+
+def encode_inference_bodies(client_content: str, is_async: bool) -> str:
+    return INFER_REQUEST.sub(
+        lambda match: f"        content, content_headers = {ENCODE_REQUEST[is_async]}\n"
+        + match.group(1)
+        + "            content=content,\n"
+        "            headers={**self._client_wrapper.get_headers(), **content_headers},\n",
+        client_content,
+    ).replace(
+        "pydantic.parse_obj_as(InferenceResponse, _response.json())  # type: ignore",
+        DECODE_RESPONSE[is_async],
+    )
+
+
+def patch_request_encoding(outputpath: pathlib.Path) -> None:
+    print(f"> Encoding inference bodies with the client serializer in {outputpath / 'client.py'}")
+    sync_content, async_class, async_content = (
+        (outputpath / "client.py").read_text().partition("class AsyncOpenInferenceClient:")
+    )
+    client_content = (
+        encode_inference_bodies(sync_content, is_async=False)
+        + async_class
+        + encode_inference_bodies(async_content, is_async=True)
+    )
+    (outputpath / "client.py").write_text(
+        client_content.replace(
+            "import httpx\n\n",
+            "import httpx\n\n"
+            "from .binary_data import (\n"
+            "    decode_inference_response,\n"
+            "    decode_inference_response_async,\n"
+            "    encode_inference_request,\n"
+            "    encode_inference_request_async,\n"
+            ")\n",
+        )
+        .replace("*, request: InferenceRequest", "*, request: InferenceRequest, binary_data: bool = False")
+        .replace(
+            "            - request: InferenceRequest.\n",
+            "            - request: InferenceRequest.\n"
+            "\n"
+            "            - binary_data: bool. Send array inputs and receive outputs with the binary tensor data extension.\n",
+        )
+    )
+
+
 def patch_remove_hardcoded_timeouts(outputpath: pathlib.Path) -> None:
     for path in itertools.chain(
         outputpath.glob("**/*.py"),
@@ -86,11 +362,75 @@ def patch_remove_hardcoded_timeouts(outputpath: pathlib.Path) -> None:
             path.write_text(path.read_text().replace("timeout=60,", ""))
 
 
+LAZY_PACKAGES = ["", "core", "errors", "types"]
+
+LAZY_INIT = """
+# This file was auto-generated by Fern from our API Definition.
+
+import importlib
+import typing
+{eager_imports}
+if typing.TYPE_CHECKING:
+{type_checking_imports}
+
+# Names are imported from their modules when first used (PEP 562), so that importing the package only imports the
+# modules, and builds the models, that are used
+_LAZY_IMPORTS = {lazy_imports}
+_SUBMODULES = frozenset({submodules})
+
+__all__ = {all}
+
+
+def __getattr__(name: str) -> typing.Any:
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f".{{name}}", __name__)
+    else:
+        raise AttributeError(f"module {{__name__!r}} has no attribute {{name!r}}")
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> typing.List[str]:
+    return sorted({{*globals(), *_LAZY_IMPORTS, *_SUBMODULES}})
+"""
+
+
+def patch_lazy_imports(outputpath: pathlib.Path) -> None:
+    for package in LAZY_PACKAGES:
+        path = outputpath / package / "__init__.py"
+        print(f"> Importing the names of {path} lazily")
+        module = ast.parse(path.read_text())
+        imports = [node for node in module.body if isinstance(node, ast.ImportFrom) and node.level == 1]
+        # A name shadowing its own module would be replaced by the module once anything else imports it
+        eager = [node for node in imports if any(alias.name == node.module for alias in node.names)]
+        imports = [node for node in imports if node not in eager]
+        exports = next(
+            ast.literal_eval(node.value)
+            for node in module.body
+            if isinstance(node, ast.Assign) and [target.id for target in node.targets] == ["__all__"]
+        )
+        lazy_imports = {alias.name: f".{node.module}" for node in imports for alias in node.names}
+        path.write_text(
+            LAZY_INIT.format(
+                eager_imports="".join(f"\n{ast.unparse(node)}" for node in eager) + "\n" * bool(eager),
+                type_checking_imports="\n".join(f"    {ast.unparse(node)}" for node in imports),
+                lazy_imports=repr(lazy_imports),
+                submodules=repr(sorted({node.module for node in imports})),
+                all=repr(exports),
+            ).lstrip()
+        )
+
+
 def prepend_apache_license(outputpath: pathlib.Path) -> None:
     for path in itertools.chain(
         outputpath.glob("**/*.py"),
         outputpath.glob("**/*.pyi"),
     ):
+        if path.read_text().startswith("# Copyright"):
+            # Hand-written modules alongside the generated ones already carry the license
+            continue
         print(f"> Prepending Apache License to {path}")
         path.write_text(
             dedent(
@@ -144,9 +484,14 @@ if __name__ == "__main__":
     outputpath = this_dir / "generated" / "open_inference" / "openapi"
 
     maybe_download_proto(protopath)
+    handwritten = stash_handwritten_modules(outputpath)
     build_client()
+    restore_handwritten_modules(outputpath, handwritten)
     patch_recursive_tensor(outputpath)
+    patch_client_init(outputpath)
+    patch_request_encoding(outputpath)
     patch_remove_hardcoded_timeouts(outputpath)
+    patch_lazy_imports(outputpath)
     prepend_apache_license(outputpath)
     format_generated_files(outputpath)
     add_py_typed(outputpath)
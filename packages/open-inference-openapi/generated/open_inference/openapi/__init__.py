@@ -14,22 +14,49 @@
 
 # This file was auto-generated by Fern from our API Definition.
 
-from .types import (
-    InferenceErrorResponse,
-    InferenceRequest,
-    InferenceResponse,
-    MetadataModelErrorResponse,
-    MetadataModelResponse,
-    MetadataServerErrorResponse,
-    MetadataServerResponse,
-    MetadataTensor,
-    Parameters,
-    RequestInput,
-    RequestOutput,
-    ResponseOutput,
-    TensorData,
-)
-from .errors import BadRequestError, InternalServerError, NotFoundError, ServiceUnavailableError
+import importlib
+import typing
+
+if typing.TYPE_CHECKING:
+    from .types import (
+        InferenceErrorResponse,
+        InferenceRequest,
+        InferenceResponse,
+        MetadataModelErrorResponse,
+        MetadataModelResponse,
+        MetadataServerErrorResponse,
+        MetadataServerResponse,
+        MetadataTensor,
+        Parameters,
+        RequestInput,
+        RequestOutput,
+        ResponseOutput,
+        TensorData,
+    )
+    from .errors import BadRequestError, InternalServerError, NotFoundError, ServiceUnavailableError
+
+# Names are imported from their modules when first used (PEP 562), so that importing the package only imports the
+# modules, and builds the models, that are used
+_LAZY_IMPORTS = {
+    "InferenceErrorResponse": ".types",
+    "InferenceRequest": ".types",
+    "InferenceResponse": ".types",
+    "MetadataModelErrorResponse": ".types",
+    "MetadataModelResponse": ".types",
+    "MetadataServerErrorResponse": ".types",
+    "MetadataServerResponse": ".types",
+    "MetadataTensor": ".types",
+    "Parameters": ".types",
+    "RequestInput": ".types",
+    "RequestOutput": ".types",
+    "ResponseOutput": ".types",
+    "TensorData": ".types",
+    "BadRequestError": ".errors",
+    "InternalServerError": ".errors",
+    "NotFoundError": ".errors",
+    "ServiceUnavailableError": ".errors",
+}
+_SUBMODULES = frozenset(["errors", "types"])
 
 __all__ = [
     "BadRequestError",
@@ -50,3 +77,18 @@ __all__ = [
     "ServiceUnavailableError",
     "TensorData",
 ]
+
+
+def __getattr__(name: str) -> typing.Any:
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> typing.List[str]:
+    return sorted({*globals(), *_LAZY_IMPORTS, *_SUBMODULES})
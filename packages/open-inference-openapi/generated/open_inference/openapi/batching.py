@@ -0,0 +1,329 @@
+# Copyright 2024 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Client-side dynamic batching of inference requests for ``AsyncOpenInferenceClient``.
+
+``BatchingClient`` merges concurrent ``model_infer`` and ``model_version_infer`` calls whose requests are compatible
+into one request, concatenating their inputs along the first dimension, and slices the outputs of the response back
+to each caller.
+
+Requests are compatible when they target the same model and version with the same parameters and requested outputs,
+and their inputs match in name, datatype, parameters and every dimension but the first. All inputs of a request must
+share their first dimension. Requests with tensors in shared memory, and other requests, are sent on their own, as are
+all other calls.
+
+``split_response`` slices a response to a merged request back into one response per request, for other ways of
+batching such as ``bulk``.
+"""
+
+import array
+import asyncio
+import json
+import math
+import time
+import typing
+
+from .tensors import flat_list, is_array
+from .types.inference_request import InferenceRequest
+from .types.inference_response import InferenceResponse
+from .types.request_input import RequestInput
+from .types.response_output import ResponseOutput
+from .types.tensor_data import TensorData
+
+if typing.TYPE_CHECKING:
+    # The client itself uses this module, through bulk_infer
+    from .client import AsyncOpenInferenceClient
+
+
+class BatchStats(typing.NamedTuple):
+    """Statistics of one batch sent by a ``BatchingClient``."""
+
+    model_name: str
+    #: Number of requests merged into the batch
+    requests: int
+    #: Number of rows in the batch, the size of its first dimension
+    rows: int
+    #: ``rows`` as a fraction of ``max_batch_size``
+    fill_ratio: float
+    #: Seconds the first request of the batch waited before the batch was sent
+    queue_delay: float
+    #: Seconds spent waiting for the response to the batch
+    latency: float
+
+
+class _Batch:
+    def __init__(self, model_name: str, model_version: typing.Optional[str], binary_data: bool) -> None:
+        self.model_name = model_name
+        self.model_version = model_version
+        self.binary_data = binary_data
+        self.requests: typing.List[InferenceRequest] = []
+        self.rows: typing.List[int] = []
+        self.futures: typing.List["asyncio.Future[InferenceResponse]"] = []
+        self.created = time.monotonic()
+        self.flush_handle: typing.Optional[asyncio.TimerHandle] = None
+
+
+class BatchingClient:
+    """
+    Batches concurrent inference calls made through an ``AsyncOpenInferenceClient``.
+
+    A batch is sent ``max_queue_delay`` seconds after its first request, or as soon as it holds ``max_batch_size``
+    rows. ``on_batch`` is called with the ``BatchStats`` of every batch once its response is received. Every other
+    method of the wrapped client is available unchanged.
+
+    ---
+    from open_inference.openapi.batching import BatchingClient
+    from open_inference.openapi.client import AsyncOpenInferenceClient
+
+    client = BatchingClient(
+        AsyncOpenInferenceClient(base_url="https://yourhost.com/path/to/api"),
+        max_batch_size=16,
+        on_batch=print,
+    )
+    """
+
+    def __init__(
+        self,
+        client: "AsyncOpenInferenceClient",
+        *,
+        max_batch_size: int = 8,
+        max_queue_delay: float = 0.005,
+        on_batch: typing.Optional[typing.Callable[[BatchStats], None]] = None,
+    ):
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be at least 1, got {max_batch_size}")
+        self._client = client
+        self.max_batch_size = max_batch_size
+        self.max_queue_delay = max_queue_delay
+        self.on_batch = on_batch
+        self._pending: typing.Dict[typing.Hashable, _Batch] = {}
+        self._tasks: typing.Set["asyncio.Task[None]"] = set()
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self._client, name)
+
+    async def model_infer(
+        self, model_name: str, *, request: InferenceRequest, binary_data: bool = False
+    ) -> InferenceResponse:
+        return await self._infer(model_name, None, request, binary_data)
+
+    async def model_version_infer(
+        self, model_name: str, model_version: str, *, request: InferenceRequest, binary_data: bool = False
+    ) -> InferenceResponse:
+        return await self._infer(model_name, model_version, request, binary_data)
+
+    async def _infer(
+        self, model_name: str, model_version: typing.Optional[str], request: InferenceRequest, binary_data: bool
+    ) -> InferenceResponse:
+        key, rows = _batch_key(model_name, model_version, request, binary_data)
+        if key is None or rows > self.max_batch_size:
+            return await self._send(model_name, model_version, request, binary_data)
+
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[InferenceResponse]" = loop.create_future()
+        batch = self._pending.get(key)
+        if batch is not None and sum(batch.rows) + rows > self.max_batch_size:
+            self._flush(key, batch)
+            batch = None
+        if batch is None:
+            batch = self._pending[key] = _Batch(model_name, model_version, binary_data)
+            batch.flush_handle = loop.call_later(self.max_queue_delay, self._flush, key, batch)
+        batch.requests.append(request)
+        batch.rows.append(rows)
+        batch.futures.append(future)
+        if sum(batch.rows) == self.max_batch_size:
+            self._flush(key, batch)
+        return await future
+
+    def _flush(self, key: typing.Hashable, batch: _Batch) -> None:
+        if self._pending.get(key) is not batch:
+            return
+        del self._pending[key]
+        if batch.flush_handle is not None:
+            batch.flush_handle.cancel()
+        task = asyncio.get_running_loop().create_task(self._send_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send_batch(self, batch: _Batch) -> None:
+        sent = time.monotonic()
+        try:
+            if len(batch.requests) == 1:
+                responses = [
+                    await self._send(batch.model_name, batch.model_version, batch.requests[0], batch.binary_data)
+                ]
+            else:
+                response = await self._send(batch.model_name, batch.model_version, _merge(batch), batch.binary_data)
+                responses = split_response(response, batch.rows, [request.id for request in batch.requests])
+        except Exception as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, response in zip(batch.futures, responses):
+            if not future.done():
+                future.set_result(response)
+        if self.on_batch is not None:
+            rows = sum(batch.rows)
+            self.on_batch(
+                BatchStats(
+                    model_name=batch.model_name,
+                    requests=len(batch.requests),
+                    rows=rows,
+                    fill_ratio=rows / self.max_batch_size,
+                    queue_delay=sent - batch.created,
+                    latency=time.monotonic() - sent,
+                )
+            )
+
+    async def _send(
+        self, model_name: str, model_version: typing.Optional[str], request: InferenceRequest, binary_data: bool
+    ) -> InferenceResponse:
+        if model_version is None:
+            return await self._client.model_infer(model_name, request=request, binary_data=binary_data)
+        return await self._client.model_version_infer(
+            model_name, model_version, request=request, binary_data=binary_data
+        )
+
+
+def _parameters_key(parameters: typing.Optional[typing.Dict[str, typing.Any]]) -> str:
+    return json.dumps(parameters or {}, sort_keys=True, default=str)
+
+
+def _batch_key(
+    model_name: str, model_version: typing.Optional[str], request: InferenceRequest, binary_data: bool
+) -> typing.Tuple[typing.Optional[typing.Hashable], int]:
+    """Return the key under which ``request`` can be batched, or None if it cannot be, and its number of rows."""
+    if not request.inputs or not request.inputs[0].shape:
+        return None, 0
+    rows = request.inputs[0].shape[0]
+    if any(not tensor.shape or tensor.shape[0] != rows for tensor in request.inputs):
+        return None, 0
+    if any(
+        tensor.parameters is not None and "shared_memory_region" in tensor.parameters
+        for tensor in (*request.inputs, *(request.outputs or ()))
+    ):
+        return None, 0
+
+    key = (
+        model_name,
+        model_version,
+        binary_data,
+        _parameters_key(request.parameters),
+        tuple(
+            (tensor.name, tensor.datatype, tuple(tensor.shape[1:]), _parameters_key(tensor.parameters))
+            for tensor in request.inputs
+        ),
+        tuple((output.name, _parameters_key(output.parameters)) for output in request.outputs or ()),
+    )
+    return key, rows
+
+
+def _flatten(data: typing.Any) -> typing.List[typing.Any]:
+    if is_array(data):
+        return flat_list(data)
+    flat: typing.List[typing.Any] = []
+    stack = [iter(data)]
+    while stack:
+        for item in stack[-1]:
+            if isinstance(item, TensorData):
+                stack.append(iter(item.__root__))
+                break
+            if isinstance(item, list):
+                stack.append(iter(item))
+                break
+            flat.append(item)
+        else:
+            stack.pop()
+    return flat
+
+
+def _concatenate(parts: typing.List[typing.Any]) -> typing.Any:
+    """Concatenate tensor data in row-major order, keeping arrays as arrays where they all share a type."""
+    if all(is_array(part) and not isinstance(part, array.array) for part in parts):
+        import numpy as np
+
+        return np.concatenate([part.reshape(-1) for part in parts])
+    if all(isinstance(part, array.array) and part.typecode == parts[0].typecode for part in parts):
+        merged = array.array(parts[0].typecode)
+        for part in parts:
+            merged.extend(part)
+        return merged
+    return [item for part in parts for item in _flatten(part)]
+
+
+def _merge(batch: _Batch) -> InferenceRequest:
+    """Concatenate the requests of a batch along their first dimension."""
+    first = batch.requests[0]
+    rows = sum(batch.rows)
+    inputs = [
+        RequestInput(
+            name=tensor.name,
+            shape=[rows, *tensor.shape[1:]],
+            datatype=tensor.datatype,
+            **({"parameters": tensor.parameters} if tensor.parameters is not None else {}),
+            data=_concatenate([request.inputs[index].data.__root__ for request in batch.requests]),
+        )
+        for index, tensor in enumerate(first.inputs)
+    ]
+    return first.copy(update={"inputs": inputs}, exclude={"id"})
+
+
+def split_response(
+    response: InferenceResponse, rows: typing.List[int], ids: typing.List[typing.Optional[str]]
+) -> typing.List[InferenceResponse]:
+    """Slice the outputs of ``response`` into one response per request of the given ``rows`` and ``ids``.
+
+    ``rows`` are the sizes of the first dimension of each request, in the order their inputs were concatenated. Raises
+    ``ValueError`` if an output's first dimension is not their sum.
+    """
+    total_rows = sum(rows)
+    outputs_by_request: typing.List[typing.List[ResponseOutput]] = [[] for _ in rows]
+    for output in response.outputs:
+        if not output.shape or output.shape[0] != total_rows:
+            raise ValueError(
+                f"Output {output.name!r} of shape {output.shape} cannot be split into batches of {rows} rows"
+            )
+        data = output.data.__root__
+        row_elements = math.prod(output.shape[1:])
+        ndarray = is_array(data) and not isinstance(data, array.array)
+        nested = not is_array(data) and len(data) > 0 and isinstance(data[0], (TensorData, list))
+        if nested and len(data) != total_rows:
+            data, nested = _flatten(data), False
+
+        update: typing.Dict[str, typing.Any] = {}
+        if output.parameters is not None and "binary_data_size" in output.parameters:
+            # Describes the binary data of the whole batch
+            update["parameters"] = {
+                name: value for name, value in output.parameters.items() if name != "binary_data_size"
+            }
+
+        offset = 0
+        for outputs, part_rows in zip(outputs_by_request, rows):
+            shape = [part_rows, *output.shape[1:]]
+            if ndarray:
+                part = typing.cast(typing.Any, data).reshape(total_rows, -1)[offset : offset + part_rows].reshape(shape)
+            elif nested:
+                part = data[offset : offset + part_rows]
+            else:
+                part = data[offset * row_elements : (offset + part_rows) * row_elements]
+            outputs.append(output.copy(update={**update, "shape": shape, "data": TensorData.construct(__root__=part)}))
+            offset += part_rows
+
+    return [
+        response.copy(update={"outputs": outputs, **({"id": request_id} if request_id is not None else {})})
+        for request_id, outputs in zip(ids, outputs_by_request)
+    ]
@@ -0,0 +1,225 @@
+# Copyright 2024 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The binary tensor data extension of the inference REST API, as implemented by KServe and Triton.
+
+A body using the extension starts with the JSON inference request or response, whose length in bytes is given by the
+``Inference-Header-Content-Length`` HTTP header. It is followed by the raw little-endian data of every tensor whose
+``parameters`` hold a ``binary_data_size``, in the order the tensors appear in the JSON. ``BYTES`` elements are each
+preceded by their length as a 4-byte little-endian integer. ``BF16`` tensors are sent as the upper 16 bits of their
+``float32`` values, rounded to the nearest even, and received as ``float32`` arrays.
+
+Outputs received as binary data are NumPy arrays over the response body, so decoding them requires NumPy.
+
+``tensor_to_buffer`` and ``tensor_from_buffer`` convert a single tensor, for other transports of the same layout such
+as ``shared_memory``.
+
+The ``_async`` variants encode and decode in a ``concurrent.futures`` executor, off the event loop. Everything they
+hand to the executor can be pickled, so it can be a ``ProcessPoolExecutor`` to spread JSON work, which holds the GIL,
+over several cores.
+"""
+
+import array
+import asyncio
+import concurrent.futures
+import functools
+import math
+import sys
+import typing
+
+import httpx
+
+from .bytes_codec import decode_bytes_tensor, encode_bytes_tensor
+from .core.serialization import JsonSerializer
+from .tensors import DATATYPES, from_bfloat16, is_array, to_bfloat16
+from .types.inference_request import InferenceRequest
+from .types.inference_response import InferenceResponse
+from .types.request_output import RequestOutput
+
+try:
+    import pydantic.v1 as pydantic  # type: ignore
+except ImportError:
+    import pydantic  # type: ignore
+
+HEADER_CONTENT_LENGTH = "Inference-Header-Content-Length"
+BINARY_CONTENT_TYPE = "application/octet-stream"
+
+
+def encode_inference_request(
+    request: InferenceRequest, serializer: JsonSerializer, *, binary_data: bool = False
+) -> typing.Tuple[bytes, typing.Dict[str, str]]:
+    """
+    Return the body and content headers of an inference request.
+
+    With ``binary_data``, inputs whose data is a NumPy array or an ``array.array`` are sent as binary data, and every
+    output is requested as binary data unless its parameters already set ``binary_data`` or a shared memory region.
+    Inputs given as lists are still written into the JSON.
+    """
+    if not binary_data:
+        return serializer.dumps(request), {"Content-Type": serializer.content_type}
+
+    buffers: typing.List[typing.Any] = []
+    inputs = []
+    for tensor in request.inputs:
+        # Inputs in shared memory have no data
+        data = tensor.data.__root__ if "data" in tensor.__fields_set__ else None
+        if not is_array(data):
+            inputs.append(tensor)
+            continue
+        buffer = tensor_to_buffer(data, tensor.datatype)
+        buffers.append(buffer)
+        # Constructed without data, which the field walk of jsonable_encoder then leaves out
+        fields = {name: getattr(tensor, name) for name in tensor.__fields_set__ if name != "data"}
+        fields["parameters"] = {**(tensor.parameters or {}), "binary_data_size": len(buffer)}
+        inputs.append(type(tensor).construct(**fields))
+
+    update: typing.Dict[str, typing.Any] = {"inputs": inputs}
+    if request.outputs:
+        update["outputs"] = [_binary_output(output) for output in request.outputs]
+    else:
+        # Asks for all outputs, which only the request parameters can mark as binary
+        update["parameters"] = {"binary_data_output": True, **(request.parameters or {})}
+
+    header = serializer.dumps(request.copy(update=update))
+    if not buffers:
+        return header, {"Content-Type": serializer.content_type}
+    return b"".join([header, *buffers]), {
+        "Content-Type": BINARY_CONTENT_TYPE,
+        HEADER_CONTENT_LENGTH: str(len(header)),
+    }
+
+
+async def encode_inference_request_async(
+    request: InferenceRequest,
+    serializer: JsonSerializer,
+    *,
+    binary_data: bool = False,
+    executor: typing.Optional[concurrent.futures.Executor] = None,
+) -> typing.Tuple[bytes, typing.Dict[str, str]]:
+    """Run ``encode_inference_request`` in ``executor``, or in the event loop when it is None."""
+    if executor is None:
+        return encode_inference_request(request, serializer, binary_data=binary_data)
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, functools.partial(encode_inference_request, request, serializer, binary_data=binary_data)
+    )
+
+
+def decode_inference_response(response: httpx.Response, serializer: JsonSerializer) -> InferenceResponse:
+    """
+    Parse an inference response, with or without binary data.
+
+    The data of binary outputs is a read-only NumPy array of the output's datatype and shape, viewing the response
+    body rather than copying it. ``BYTES`` outputs are arrays of ``bytes`` objects.
+    """
+    return decode_inference_body(response.content, response.headers.get(HEADER_CONTENT_LENGTH), serializer)
+
+
+async def decode_inference_response_async(
+    response: httpx.Response,
+    serializer: JsonSerializer,
+    executor: typing.Optional[concurrent.futures.Executor] = None,
+) -> InferenceResponse:
+    """Run ``decode_inference_response`` in ``executor``, or in the event loop when it is None."""
+    if executor is None:
+        return decode_inference_response(response, serializer)
+    # Only the body and header are sent to the executor, which can then be a process pool
+    return await asyncio.get_running_loop().run_in_executor(
+        executor,
+        decode_inference_body,
+        response.content,
+        response.headers.get(HEADER_CONTENT_LENGTH),
+        serializer,
+    )
+
+
+def decode_inference_body(
+    content: bytes, header_length: typing.Optional[str], serializer: JsonSerializer
+) -> InferenceResponse:
+    """
+    Parse the body of an inference response, given the value of its ``Inference-Header-Content-Length`` header.
+    """
+    if header_length is None:
+        body = serializer.loads(content)
+        _fill_shared_memory_outputs(body)
+        return pydantic.parse_obj_as(InferenceResponse, body)  # type: ignore
+
+    body = serializer.loads(content[: int(header_length)])
+    _fill_shared_memory_outputs(body)
+    view = memoryview(content)
+    offset = int(header_length)
+    for output in body.get("outputs", ()):
+        size = (output.get("parameters") or {}).get("binary_data_size")
+        if size is None:
+            continue
+        if offset + size > len(view):
+            raise ValueError(f"Output {output['name']!r} has {size} bytes of binary data, past the end of the body")
+        output["data"] = tensor_from_buffer(view[offset : offset + size], output["datatype"], output["shape"])
+        offset += size
+    return pydantic.parse_obj_as(InferenceResponse, body)  # type: ignore
+
+
+def _fill_shared_memory_outputs(body: typing.Dict[str, typing.Any]) -> None:
+    # Outputs written to shared memory have no data, which ResponseOutput requires
+    for output in body.get("outputs", ()):
+        if "data" not in output and "shared_memory_region" in (output.get("parameters") or {}):
+            output["data"] = []
+
+
+def _binary_output(output: RequestOutput) -> RequestOutput:
+    if output.parameters is not None and (
+        "binary_data" in output.parameters or "shared_memory_region" in output.parameters
+    ):
+        return output
+    return output.copy(update={"parameters": {**(output.parameters or {}), "binary_data": True}})
+
+
+def tensor_to_buffer(data: typing.Any, datatype: str) -> typing.Any:
+    """Return the little-endian bytes of a tensor of ``datatype``, as sent in binary data, as a bytes-like object.
+
+    ``data`` is a NumPy array, or an ``array.array`` for numeric datatypes. ``BYTES`` elements are length-prefixed.
+    """
+    if datatype == "BYTES":
+        return encode_bytes_tensor(data)
+    if datatype == "BF16":
+        return memoryview(to_bfloat16(data)).cast("B")
+    if isinstance(data, array.array):
+        if sys.byteorder == "big":
+            data = array.array(data.typecode, data)
+            data.byteswap()
+        return memoryview(data).cast("B")
+
+    import numpy as np
+
+    kind, itemsize = DATATYPES[datatype]
+    # Only copies arrays that are not already C-contiguous and little-endian
+    return memoryview(np.ascontiguousarray(data, dtype=np.dtype(f"<{kind}{itemsize}"))).cast("B")
+
+
+def tensor_from_buffer(view: memoryview, datatype: str, shape: typing.List[int]) -> typing.Any:
+    """Return the NumPy array of ``shape`` held by the binary data of a tensor of ``datatype`` in ``view``.
+
+    Numeric tensors are returned as views over ``view``, ``BYTES`` tensors as arrays of ``bytes`` objects and ``BF16``
+    tensors as new ``float32`` arrays.
+    """
+    import numpy as np
+
+    if datatype == "BYTES":
+        data = decode_bytes_tensor(view, count=math.prod(shape))
+    elif datatype == "BF16":
+        data = from_bfloat16(view)
+    else:
+        kind, itemsize = DATATYPES[datatype]
+        data = np.frombuffer(view, dtype=np.dtype(f"<{kind}{itemsize}"))
+    return data.reshape(shape)
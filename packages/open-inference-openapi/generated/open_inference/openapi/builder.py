@@ -0,0 +1,250 @@
+# Copyright 2024 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Inference requests built from a model's metadata.
+
+A ``RequestBuilder`` is created once per model from its ``MetadataModelResponse``, and checks the data of every input
+against the input's datatype and shape. Requests are then assembled with ``construct``, so that the data, names and
+shapes do not go through pydantic validation again.
+"""
+
+import array
+import math
+import typing
+
+from .tensors import DATATYPES, HALF_PRECISION_DATATYPES, check_array, is_array
+from .types.inference_request import InferenceRequest
+from .types.metadata_model_response import MetadataModelResponse
+from .types.parameters import Parameters
+from .types.request_input import RequestInput
+from .types.request_output import RequestOutput
+from .types.tensor_data import TensorData
+
+
+class _InputLayout(typing.NamedTuple):
+    name: str
+    datatype: str
+    # Dimensions of the input, with -1 for dynamic ones
+    shape: typing.Tuple[int, ...]
+    # Index of the only dynamic dimension, which flat data can fill, or None
+    dynamic: typing.Optional[int]
+
+
+class RequestBuilder:
+    """
+    Builds ``InferenceRequest`` objects for one model from tensor data keyed by input name.
+
+    Every input of the model must be given, as a NumPy array, an ``array.array`` or a (nested) list. ``array.array``
+    objects must match the input's datatype, and the elements of lists must be values of it, such as integers in the
+    range of an ``INT32`` input. NumPy arrays of another dtype are converted when NumPy allows it under the ``casting``
+    rule, and rejected otherwise. The default, ``"same_kind"``, accepts narrowing conversions such as ``float64`` to
+    ``FP32``, which rounds, or ``int64`` to ``INT32``, which wraps values out of range. ``casting="safe"`` only accepts
+    conversions that keep every value, such as ``int32`` to ``FP64``.
+
+    The shape of arrays and nested lists must match the input's shape, where dynamic dimensions (``-1``) can take any
+    size. Flat lists and ``array.array`` objects fill the input's shape
+    in row-major order, which requires every dimension but one to be fixed. ``BF16`` inputs take float arrays, which are
+    rounded to ``BF16`` when sent as binary data.
+
+    ``outputs`` optionally names the outputs to request, and ``parameters`` are sent with every request.
+
+    ---
+    from open_inference.openapi.builder import RequestBuilder
+    from open_inference.openapi.client import OpenInferenceClient
+
+    client = OpenInferenceClient(base_url="https://yourhost.com/path/to/api")
+    builder = RequestBuilder(client.read_model_metadata("iris-model"))
+    client.model_infer("iris-model", request=builder.build({"input-0": [[5.3, 3.7, 1.5, 0.2]]}))
+    """
+
+    def __init__(
+        self,
+        metadata: MetadataModelResponse,
+        *,
+        outputs: typing.Optional[typing.Iterable[str]] = None,
+        parameters: typing.Optional[Parameters] = None,
+        casting: typing.Literal["same_kind", "safe"] = "same_kind",
+    ) -> None:
+        if casting not in ("same_kind", "safe"):
+            raise ValueError(f"casting must be 'same_kind' or 'safe', not {casting!r}")
+        self.model_name = metadata.name
+        self.casting = casting
+        self._layouts = []
+        for tensor in metadata.inputs or ():
+            if tensor.datatype not in ("BYTES", "BF16") and tensor.datatype not in DATATYPES:
+                raise ValueError(f"Input {tensor.name!r} has unsupported datatype {tensor.datatype}")
+            dynamic = [index for index, dim in enumerate(tensor.shape) if dim < 0]
+            self._layouts.append(
+                _InputLayout(
+                    tensor.name, tensor.datatype, tuple(tensor.shape), dynamic[0] if len(dynamic) == 1 else None
+                )
+            )
+        self._names = frozenset(layout.name for layout in self._layouts)
+
+        self._fields: typing.Dict[str, typing.Any] = {}
+        if outputs is not None:
+            self._fields["outputs"] = [RequestOutput(name=output, parameters=None) for output in outputs]
+        if parameters is not None:
+            self._fields["parameters"] = parameters
+
+    def build(self, inputs: typing.Mapping[str, typing.Any], *, id: typing.Optional[str] = None) -> InferenceRequest:
+        """
+        Return an ``InferenceRequest`` holding ``inputs``.
+
+        Raises ``ValueError`` if an input is missing or unknown, or does not match its datatype or shape.
+        """
+        if inputs.keys() != self._names:
+            raise ValueError(
+                f"Model {self.model_name!r} takes inputs {sorted(self._names)}, got {sorted(inputs.keys())}"
+            )
+
+        request_inputs = []
+        for layout in self._layouts:
+            data, shape = self._check(layout, inputs[layout.name])
+            request_inputs.append(
+                RequestInput.construct(
+                    name=layout.name, shape=shape, datatype=layout.datatype, data=TensorData.construct(__root__=data)
+                )
+            )
+        fields = dict(self._fields)
+        if id is not None:
+            fields["id"] = id
+        return InferenceRequest.construct(inputs=request_inputs, **fields)
+
+    def _check(self, layout: _InputLayout, data: typing.Any) -> typing.Tuple[typing.Any, typing.List[int]]:
+        if is_array(data) and not isinstance(data, array.array):
+            data = self._convert(layout, data)
+            shape = list(data.shape)
+        elif isinstance(data, array.array):
+            check_array(data, layout.datatype, None)
+            shape = self._fill(layout, len(data))
+        elif isinstance(data, list):
+            _check_elements(layout, data)
+            shape = _nested_shape(data)
+            if len(shape) == 1 and len(layout.shape) != 1:
+                shape = self._fill(layout, len(data))
+        else:
+            raise ValueError(f"Input {layout.name!r} takes an array or a list, got {type(data).__name__}")
+
+        if len(shape) != len(layout.shape) or any(
+            expected not in (-1, actual) for expected, actual in zip(layout.shape, shape)
+        ):
+            raise ValueError(f"Input {layout.name!r} has shape {list(layout.shape)}, got data of shape {shape}")
+        return data, shape
+
+    def _convert(self, layout: _InputLayout, data: typing.Any) -> typing.Any:
+        import numpy as np
+
+        if layout.datatype in ("BYTES", "BF16"):
+            check_array(data, layout.datatype, None)
+            return data
+        kind, itemsize = DATATYPES[layout.datatype]
+        dtype = np.dtype(f"<{kind}{itemsize}")
+        if data.dtype == dtype:
+            return data
+        if not np.can_cast(data.dtype, dtype, casting=self.casting):
+            raise ValueError(f"Input {layout.name!r} is {layout.datatype}, which an array of {data.dtype} cannot hold")
+        return data.astype(dtype)
+
+    def _fill(self, layout: _InputLayout, size: int) -> typing.List[int]:
+        """Return the shape of the input holding ``size`` elements in row-major order."""
+        shape = list(layout.shape)
+        if layout.dynamic is not None:
+            fixed = math.prod(dim for dim in shape if dim >= 0)
+            if fixed == 0 or size % fixed:
+                raise ValueError(f"Input {layout.name!r} has shape {list(layout.shape)}, got {size} elements")
+            shape[layout.dynamic] = size // fixed
+        elif any(dim < 0 for dim in shape):
+            raise ValueError(
+                f"Input {layout.name!r} has several dynamic dimensions, pass its data as a NumPy array or nested list"
+            )
+        elif math.prod(shape) != size:
+            raise ValueError(f"Input {layout.name!r} has shape {shape}, got {size} elements")
+        return shape
+
+
+def downcast_inputs(request: InferenceRequest, metadata: MetadataModelResponse) -> InferenceRequest:
+    """
+    Return ``request`` with the ``float32`` and ``float64`` NumPy arrays of the inputs that ``metadata`` declares as
+    ``FP16`` or ``BF16`` down-cast to that datatype, and every other input unchanged.
+
+    The JSON body carries numbers whatever their datatype, so down-casting only makes requests smaller when they are
+    sent with ``binary_data=True``, where ``FP16`` and ``BF16`` tensors take half the bytes of ``FP32`` ones.
+
+    ---
+    from open_inference.openapi.builder import downcast_inputs
+
+    metadata = client.read_model_metadata("text-encoder")
+    client.model_infer("text-encoder", request=downcast_inputs(request, metadata), binary_data=True)
+    """
+    declared = {
+        tensor.name: tensor.datatype for tensor in metadata.inputs or () if tensor.datatype in HALF_PRECISION_DATATYPES
+    }
+    inputs = []
+    for tensor in request.inputs:
+        data: typing.Any = tensor.data.__root__ if "data" in tensor.__fields_set__ else None
+        datatype = declared.get(tensor.name)
+        if datatype is None or tensor.datatype not in ("FP32", "FP64") or not _is_float_ndarray(data):
+            inputs.append(tensor)
+            continue
+        if datatype == "FP16":
+            data = data.astype("<f2")
+        fields = {name: getattr(tensor, name) for name in tensor.__fields_set__}
+        fields.update(datatype=datatype, data=TensorData.construct(__root__=data))
+        inputs.append(type(tensor).construct(**fields))
+    return request.copy(update={"inputs": inputs})
+
+
+def _is_float_ndarray(data: typing.Any) -> bool:
+    return is_array(data) and not isinstance(data, array.array) and data.dtype.kind == "f"
+
+
+def _check_elements(layout: _InputLayout, data: typing.List[typing.Any]) -> None:
+    """Raise ``ValueError`` unless every element of the nested lists ``data`` is a value of the input's datatype."""
+    if layout.datatype == "BYTES":
+        types: typing.Tuple[type, ...] = (str, bytes)
+    elif layout.datatype == "BOOL":
+        types = (bool,)
+    elif layout.datatype == "BF16" or DATATYPES[layout.datatype][0] == "f":
+        types = (int, float)
+    else:
+        types = (int,)
+    bounds: typing.Optional[typing.Tuple[int, int]] = None
+    if types == (int,):
+        kind, itemsize = DATATYPES[layout.datatype]
+        bounds = (0, 1 << 8 * itemsize) if kind == "u" else (-(1 << 8 * itemsize - 1), 1 << 8 * itemsize - 1)
+
+    pending = [data]
+    while pending:
+        for item in pending.pop():
+            if isinstance(item, list):
+                pending.append(item)
+            elif not isinstance(item, types) or (isinstance(item, bool) and types != (bool,)):
+                raise ValueError(
+                    f"Input {layout.name!r} is {layout.datatype}, which a list of {type(item).__name__} cannot hold"
+                )
+            elif bounds is not None and not bounds[0] <= typing.cast(int, item) < bounds[1]:
+                raise ValueError(f"Input {layout.name!r} is {layout.datatype}, which cannot hold {item}")
+
+
+def _nested_shape(data: typing.List[typing.Any]) -> typing.List[int]:
+    """Return the shape of nested lists, from the lengths of their first elements."""
+    shape = []
+    while isinstance(data, list):
+        shape.append(len(data))
+        if not data:
+            break
+        data = data[0]
+    return shape
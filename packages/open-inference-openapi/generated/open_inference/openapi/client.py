@@ -14,15 +14,24 @@
 
 # This file was auto-generated by Fern from our API Definition.
 
+import concurrent.futures
 import typing
 import urllib.parse
 from json.decoder import JSONDecodeError
 
 import httpx
 
+from .binary_data import (
+    decode_inference_response,
+    decode_inference_response_async,
+    encode_inference_request,
+    encode_inference_request_async,
+)
+from .bulk import Rows, bulk_infer
+from .connections import build_httpx_client, prewarm, prewarm_async
 from .core.api_error import ApiError
 from .core.client_wrapper import AsyncClientWrapper, SyncClientWrapper
-from .core.jsonable_encoder import jsonable_encoder
+from .core.serialization import JsonSerializer, default_serializer
 from .errors.bad_request_error import BadRequestError
 from .errors.internal_server_error import InternalServerError
 from .errors.not_found_error import NotFoundError
@@ -31,6 +40,7 @@ from .types.inference_request import InferenceRequest
 from .types.inference_response import InferenceResponse
 from .types.metadata_model_response import MetadataModelResponse
 from .types.metadata_server_response import MetadataServerResponse
+from .types.parameters import Parameters
 
 try:
     import pydantic.v1 as pydantic  # type: ignore
@@ -43,11 +53,41 @@ OMIT = typing.cast(typing.Any, ...)
 
 class OpenInferenceClient:
     def __init__(
-        self, *, base_url: str, timeout: typing.Optional[float] = 60, httpx_client: typing.Optional[httpx.Client] = None
+        self,
+        *,
+        base_url: str,
+        timeout: typing.Optional[float] = 60,
+        httpx_client: typing.Optional[httpx.Client] = None,
+        serializer: typing.Optional[JsonSerializer] = None,
+        limits: typing.Optional[httpx.Limits] = None,
+        keepalive_expiry: typing.Optional[float] = None,
+        http2: bool = False,
+        share_connections: bool = False,
+        prewarm_connections: int = 0,
     ):
+        if httpx_client is None:
+            httpx_client = build_httpx_client(
+                httpx.Client,
+                base_url=base_url,
+                timeout=timeout,
+                limits=limits,
+                keepalive_expiry=keepalive_expiry,
+                http2=http2,
+                share_connections=share_connections,
+            )
         self._client_wrapper = SyncClientWrapper(
-            base_url=base_url, httpx_client=httpx.Client(timeout=timeout) if httpx_client is None else httpx_client
+            base_url=base_url,
+            httpx_client=httpx_client,
+            serializer=default_serializer() if serializer is None else serializer,
         )
+        if prewarm_connections:
+            self.prewarm(prewarm_connections)
+
+    def prewarm(self, connections: int) -> None:
+        """
+        Open up to `connections` connections to the server ahead of the first requests, by sending as many concurrent liveness checks.
+        """
+        prewarm(self._client_wrapper.httpx_client, self._client_wrapper.get_base_url(), connections)
 
     def check_server_liveness(self) -> None:
         """
@@ -269,7 +309,7 @@ class OpenInferenceClient:
         raise ApiError(status_code=_response.status_code, body=_response_json)
 
     def model_version_infer(
-        self, model_name: str, model_version: str, *, request: InferenceRequest
+        self, model_name: str, model_version: str, *, request: InferenceRequest, binary_data: bool = False
     ) -> InferenceResponse:
         """
         Send data to a model for inferencing via an [Inference Request JSON Object](#inference-request-json-object). Compliant servers return an [Inference Response JSON Object](#inference-response-json-object) or an [Inference Response JSON Error Object](#inference-response-json-error-object). The model name and version must be provided in the URL.
@@ -281,6 +321,8 @@ class OpenInferenceClient:
             - model_version: str.
 
             - request: InferenceRequest.
+
+            - binary_data: bool. Send array inputs and receive outputs with the binary tensor data extension.
         ---
         from open_inference import InferenceRequest, RequestInput
         from open_inference.client import OpenInferenceClient
@@ -303,16 +345,19 @@ class OpenInferenceClient:
             ),
         )
         """
+        content, content_headers = encode_inference_request(
+            request, self._client_wrapper.serializer, binary_data=binary_data
+        )
         _response = self._client_wrapper.httpx_client.request(
             "POST",
             urllib.parse.urljoin(
                 f"{self._client_wrapper.get_base_url()}/", f"v2/models/{model_name}/versions/{model_version}/infer"
             ),
-            json=jsonable_encoder(request),
-            headers=self._client_wrapper.get_headers(),
+            content=content,
+            headers={**self._client_wrapper.get_headers(), **content_headers},
         )
         if 200 <= _response.status_code < 300:
-            return pydantic.parse_obj_as(InferenceResponse, _response.json())  # type: ignore
+            return decode_inference_response(_response, self._client_wrapper.serializer)
         if _response.status_code == 400:
             raise BadRequestError(pydantic.parse_obj_as(typing.Any, _response.json()))  # type: ignore
         try:
@@ -321,7 +366,9 @@ class OpenInferenceClient:
             raise ApiError(status_code=_response.status_code, body=_response.text)
         raise ApiError(status_code=_response.status_code, body=_response_json)
 
-    def model_infer(self, model_name: str, *, request: InferenceRequest) -> InferenceResponse:
+    def model_infer(
+        self, model_name: str, *, request: InferenceRequest, binary_data: bool = False
+    ) -> InferenceResponse:
         """
         Send data to a model for inferencing via an [Inference Request JSON Object](#inference-request-json-object). Compliant servers return an [Inference Response JSON Object](#inference-response-json-object) or an [Inference Response JSON Error Object](#inference-response-json-error-object). The model name is provided in the URL. The server may choose a model version based on its own policies or return an error.
         See [Inference Request Examples](#inference-request-examples) for some example HTTP/REST requests and responses.
@@ -330,6 +377,8 @@ class OpenInferenceClient:
             - model_name: str.
 
             - request: InferenceRequest.
+
+            - binary_data: bool. Send array inputs and receive outputs with the binary tensor data extension.
         ---
         from open_inference import InferenceRequest, RequestInput
         from open_inference.client import OpenInferenceClient
@@ -351,14 +400,17 @@ class OpenInferenceClient:
             ),
         )
         """
+        content, content_headers = encode_inference_request(
+            request, self._client_wrapper.serializer, binary_data=binary_data
+        )
         _response = self._client_wrapper.httpx_client.request(
             "POST",
             urllib.parse.urljoin(f"{self._client_wrapper.get_base_url()}/", f"v2/models/{model_name}/infer"),
-            json=jsonable_encoder(request),
-            headers=self._client_wrapper.get_headers(),
+            content=content,
+            headers={**self._client_wrapper.get_headers(), **content_headers},
         )
         if 200 <= _response.status_code < 300:
-            return pydantic.parse_obj_as(InferenceResponse, _response.json())  # type: ignore
+            return decode_inference_response(_response, self._client_wrapper.serializer)
         if _response.status_code == 400:
             raise BadRequestError(pydantic.parse_obj_as(typing.Any, _response.json()))  # type: ignore
         try:
@@ -375,9 +427,90 @@ class AsyncOpenInferenceClient:
         base_url: str,
         timeout: typing.Optional[float] = 60,
         httpx_client: typing.Optional[httpx.AsyncClient] = None,
+        serializer: typing.Optional[JsonSerializer] = None,
+        limits: typing.Optional[httpx.Limits] = None,
+        keepalive_expiry: typing.Optional[float] = None,
+        http2: bool = False,
+        share_connections: bool = False,
+        codec_executor: typing.Optional[concurrent.futures.Executor] = None,
     ):
+        if httpx_client is None:
+            httpx_client = build_httpx_client(
+                httpx.AsyncClient,
+                base_url=base_url,
+                timeout=timeout,
+                limits=limits,
+                keepalive_expiry=keepalive_expiry,
+                http2=http2,
+                share_connections=share_connections,
+            )
         self._client_wrapper = AsyncClientWrapper(
-            base_url=base_url, httpx_client=httpx.AsyncClient(timeout=timeout) if httpx_client is None else httpx_client
+            base_url=base_url,
+            httpx_client=httpx_client,
+            serializer=default_serializer() if serializer is None else serializer,
+            codec_executor=codec_executor,
+        )
+
+    async def prewarm(self, connections: int) -> None:
+        """
+        Open up to `connections` connections to the server ahead of the first requests, by sending as many concurrent liveness checks.
+        """
+        await prewarm_async(self._client_wrapper.httpx_client, self._client_wrapper.get_base_url(), connections)
+
+    def bulk_infer(
+        self,
+        model_name: str,
+        rows: Rows,
+        *,
+        model_version: typing.Optional[str] = None,
+        concurrency: int = 4,
+        batch_size: int = 1,
+        ordered: bool = True,
+        outputs: typing.Optional[typing.Iterable[str]] = None,
+        parameters: typing.Optional[Parameters] = None,
+        binary_data: bool = False,
+    ) -> typing.AsyncIterator[typing.Tuple[int, InferenceResponse]]:
+        """
+        Infer every row of `rows` in requests of `batch_size` rows, keeping up to `concurrency` requests in flight, and yield the index of each row along with its response. Rows are only read as requests complete, so memory is bounded by the in-flight window.
+
+        Parameters:
+            - model_name: str.
+
+            - rows: Rows. An iterable or async iterable of rows, each mapping every input of the model to its data for that row, without the first (batch) dimension.
+
+            - model_version: typing.Optional[str]. The model version to infer with, or the version the server picks.
+
+            - concurrency: int. The number of requests in flight.
+
+            - batch_size: int. The number of rows in each request.
+
+            - ordered: bool. Yield responses in the order of the rows, rather than as their requests complete.
+
+            - outputs: typing.Optional[typing.Iterable[str]]. The outputs to request.
+
+            - parameters: typing.Optional[Parameters]. The parameters of every request.
+
+            - binary_data: bool. Send array inputs and receive outputs with the binary tensor data extension.
+        ---
+        from open_inference.openapi.client import AsyncOpenInferenceClient
+
+        client = AsyncOpenInferenceClient(
+            base_url="https://yourhost.com/path/to/api",
+        )
+        async for index, response in client.bulk_infer("MODEL_NAME", rows, concurrency=8, batch_size=32):
+            ...
+        """
+        return bulk_infer(
+            self,
+            model_name,
+            rows,
+            model_version=model_version,
+            concurrency=concurrency,
+            batch_size=batch_size,
+            ordered=ordered,
+            outputs=outputs,
+            parameters=parameters,
+            binary_data=binary_data,
         )
 
     async def check_server_liveness(self) -> None:
@@ -600,7 +733,7 @@ class AsyncOpenInferenceClient:
         raise ApiError(status_code=_response.status_code, body=_response_json)
 
     async def model_version_infer(
-        self, model_name: str, model_version: str, *, request: InferenceRequest
+        self, model_name: str, model_version: str, *, request: InferenceRequest, binary_data: bool = False
     ) -> InferenceResponse:
         """
         Send data to a model for inferencing via an [Inference Request JSON Object](#inference-request-json-object). Compliant servers return an [Inference Response JSON Object](#inference-response-json-object) or an [Inference Response JSON Error Object](#inference-response-json-error-object). The model name and version must be provided in the URL.
@@ -612,6 +745,8 @@ class AsyncOpenInferenceClient:
             - model_version: str.
 
             - request: InferenceRequest.
+
+            - binary_data: bool. Send array inputs and receive outputs with the binary tensor data extension.
         ---
         from open_inference import InferenceRequest, RequestInput
         from open_inference.client import AsyncOpenInferenceClient
@@ -634,16 +769,24 @@ class AsyncOpenInferenceClient:
             ),
         )
         """
+        content, content_headers = await encode_inference_request_async(
+            request,
+            self._client_wrapper.serializer,
+            binary_data=binary_data,
+            executor=self._client_wrapper.codec_executor,
+        )
         _response = await self._client_wrapper.httpx_client.request(
             "POST",
             urllib.parse.urljoin(
                 f"{self._client_wrapper.get_base_url()}/", f"v2/models/{model_name}/versions/{model_version}/infer"
             ),
-            json=jsonable_encoder(request),
-            headers=self._client_wrapper.get_headers(),
+            content=content,
+            headers={**self._client_wrapper.get_headers(), **content_headers},
         )
         if 200 <= _response.status_code < 300:
-            return pydantic.parse_obj_as(InferenceResponse, _response.json())  # type: ignore
+            return await decode_inference_response_async(
+                _response, self._client_wrapper.serializer, self._client_wrapper.codec_executor
+            )
         if _response.status_code == 400:
             raise BadRequestError(pydantic.parse_obj_as(typing.Any, _response.json()))  # type: ignore
         try:
@@ -652,7 +795,9 @@ class AsyncOpenInferenceClient:
             raise ApiError(status_code=_response.status_code, body=_response.text)
         raise ApiError(status_code=_response.status_code, body=_response_json)
 
-    async def model_infer(self, model_name: str, *, request: InferenceRequest) -> InferenceResponse:
+    async def model_infer(
+        self, model_name: str, *, request: InferenceRequest, binary_data: bool = False
+    ) -> InferenceResponse:
         """
         Send data to a model for inferencing via an [Inference Request JSON Object](#inference-request-json-object). Compliant servers return an [Inference Response JSON Object](#inference-response-json-object) or an [Inference Response JSON Error Object](#inference-response-json-error-object). The model name is provided in the URL. The server may choose a model version based on its own policies or return an error.
         See [Inference Request Examples](#inference-request-examples) for some example HTTP/REST requests and responses.
@@ -661,6 +806,8 @@ class AsyncOpenInferenceClient:
             - model_name: str.
 
             - request: InferenceRequest.
+
+            - binary_data: bool. Send array inputs and receive outputs with the binary tensor data extension.
         ---
         from open_inference import InferenceRequest, RequestInput
         from open_inference.client import AsyncOpenInferenceClient
@@ -682,14 +829,22 @@ class AsyncOpenInferenceClient:
             ),
         )
         """
+        content, content_headers = await encode_inference_request_async(
+            request,
+            self._client_wrapper.serializer,
+            binary_data=binary_data,
+            executor=self._client_wrapper.codec_executor,
+        )
         _response = await self._client_wrapper.httpx_client.request(
             "POST",
             urllib.parse.urljoin(f"{self._client_wrapper.get_base_url()}/", f"v2/models/{model_name}/infer"),
-            json=jsonable_encoder(request),
-            headers=self._client_wrapper.get_headers(),
+            content=content,
+            headers={**self._client_wrapper.get_headers(), **content_headers},
         )
         if 200 <= _response.status_code < 300:
-            return pydantic.parse_obj_as(InferenceResponse, _response.json())  # type: ignore
+            return await decode_inference_response_async(
+                _response, self._client_wrapper.serializer, self._client_wrapper.codec_executor
+            )
         if _response.status_code == 400:
             raise BadRequestError(pydantic.parse_obj_as(typing.Any, _response.json()))  # type: ignore
         try:
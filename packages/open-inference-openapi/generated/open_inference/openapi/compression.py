@@ -0,0 +1,257 @@
+# Copyright 2024 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compression of large inference request bodies, chosen per request from their size.
+
+``CompressingClient`` and ``AsyncCompressingClient`` wrap an ``OpenInferenceClient`` or ``AsyncOpenInferenceClient``,
+and compress the bodies of its inference requests with the ``encoding`` of a ``CompressionPolicy`` when they hold at
+least its ``min_bytes``, sending them with a ``Content-Encoding`` header. Smaller bodies, which compression would slow
+down more than it shrinks them, and every other request are sent uncompressed. The server must accept the encoding.
+
+``httpx`` asks for compressed responses with ``Accept-Encoding: gzip, deflate``, to which it adds ``br`` and ``zstd``
+when ``brotli`` and ``zstandard`` are installed, and decompresses them. A policy's ``accept_encoding`` overrides the
+header of the requests it compresses.
+
+``zstd`` requires the ``zstd`` extra, ``pip install open-inference-openapi[zstd]``, before Python 3.14.
+"""
+
+import contextvars
+import functools
+import gzip
+import re
+import threading
+import time
+import typing
+import urllib.parse
+import zlib
+
+import httpx
+
+from .client import AsyncOpenInferenceClient, OpenInferenceClient
+
+#: The methods whose requests are compressed, which are the ones sending tensor data
+INFER_METHODS = frozenset({"model_infer", "model_version_infer"})
+
+# The policy of the current request, set by the wrappers around the methods they compress
+_policy: "contextvars.ContextVar[typing.Optional[CompressionPolicy]]" = contextvars.ContextVar(
+    "open_inference_compression", default=None
+)
+
+_MODEL_PATH = re.compile(r"/v2/models/([^/]+)/")
+
+
+class CompressionStats(typing.NamedTuple):
+    """Counters of the requests seen by a ``CompressionPolicy``."""
+
+    requests: int
+    #: Number of requests sent compressed
+    compressed: int
+    #: Size of the bodies of the compressed requests, before and after compression
+    original_bytes: int
+    compressed_bytes: int
+    #: CPU time spent compressing them
+    cpu_seconds: float
+
+    @property
+    def ratio(self) -> float:
+        """
+        Compressed size of the compressed requests over their original size, or 1.0 before any is compressed.
+        """
+        return self.compressed_bytes / self.original_bytes if self.original_bytes else 1.0
+
+
+class CompressionPolicy:
+    """
+    Which request bodies are compressed, with which encoding, along with their compression statistics.
+
+    Bodies of at least ``min_bytes`` are compressed with ``encoding``, one of ``"gzip"``, ``"deflate"`` and ``"zstd"``,
+    at ``level``, or at the default level of the encoding when it is None. A body that does not shrink is sent
+    uncompressed. ``thresholds`` overrides ``min_bytes`` for some models, or disables compression for them with None.
+    Statistics are kept per model. A policy can be shared between clients, and used from several threads.
+    """
+
+    def __init__(
+        self,
+        encoding: str = "gzip",
+        *,
+        min_bytes: int = 32 * 1024,
+        level: typing.Optional[int] = None,
+        thresholds: typing.Optional[typing.Mapping[str, typing.Optional[int]]] = None,
+        accept_encoding: typing.Optional[str] = None,
+    ) -> None:
+        self.encoding = encoding
+        self.min_bytes = min_bytes
+        self.level = level
+        self.thresholds = dict(thresholds or {})
+        self.accept_encoding = accept_encoding
+        self._compress = _compressor(encoding, level)
+        self._lock = threading.Lock()
+        # Counters of each model, in the order of the fields of CompressionStats
+        self._counters: typing.Dict[str, typing.List[typing.Any]] = {}
+
+    def stats(self, model_name: typing.Optional[str] = None) -> CompressionStats:
+        """
+        Return the statistics of the requests to ``model_name``, or of all requests when it is None.
+        """
+        with self._lock:
+            if model_name is not None:
+                return CompressionStats(*self._counters.get(model_name, [0, 0, 0, 0, 0.0]))
+            return CompressionStats(*(sum(column) for column in zip([0, 0, 0, 0, 0.0], *self._counters.values())))
+
+    def compress(self, model_name: str, body: bytes) -> typing.Optional[bytes]:
+        """
+        Return ``body`` compressed, or None to send it uncompressed, and count it in the statistics of ``model_name``.
+        """
+        threshold = self.thresholds.get(model_name, self.min_bytes)
+        compressed = None
+        if threshold is not None and len(body) >= threshold:
+            start = time.thread_time()
+            compressed = self._compress(body)
+            elapsed = time.thread_time() - start
+        with self._lock:
+            counters = self._counters.setdefault(model_name, [0, 0, 0, 0, 0.0])
+            counters[0] += 1
+            if compressed is None or len(compressed) >= len(body):
+                return None
+            counters[1] += 1
+            counters[2] += len(body)
+            counters[3] += len(compressed)
+            counters[4] += elapsed
+        return compressed
+
+
+def _compressor(encoding: str, level: typing.Optional[int]) -> typing.Callable[[bytes], bytes]:
+    if encoding == "gzip":
+        return functools.partial(gzip.compress, compresslevel=6 if level is None else level, mtime=0)
+    if encoding == "deflate":
+        # HTTP's deflate is the zlib format, rather than raw deflate
+        return functools.partial(zlib.compress, level=-1 if level is None else level)
+    if encoding == "zstd":
+        try:
+            from compression import zstd  # type: ignore
+
+            return functools.partial(zstd.compress, level=level)
+        except ImportError:
+            pass
+        try:
+            import zstandard  # type: ignore
+        except ImportError:
+            raise ImportError(
+                "zstd compression requires the zstandard package: pip install open-inference-openapi[zstd]"
+            ) from None
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compress
+    raise ValueError(f"encoding must be 'gzip', 'deflate' or 'zstd', not {encoding!r}")
+
+
+def _compress_request(request: httpx.Request) -> None:
+    """
+    Compress the body of ``request`` according to the policy of the wrapped call sending it, if any.
+    """
+    policy = _policy.get()
+    if policy is None:
+        return
+    try:
+        body = request.content
+    except httpx.RequestNotRead:
+        # Streamed bodies are sent as they are
+        return
+    match = _MODEL_PATH.search(request.url.path)
+    compressed = policy.compress(urllib.parse.unquote(match.group(1)) if match else "", body)
+    if policy.accept_encoding is not None:
+        request.headers["Accept-Encoding"] = policy.accept_encoding
+    if compressed is None:
+        return
+    request.headers["Content-Encoding"] = policy.encoding
+    request.headers["Content-Length"] = str(len(compressed))
+    request.stream = httpx.ByteStream(compressed)
+    # The content read back by hooks, retries and redirects
+    request._content = compressed
+
+
+async def _compress_request_async(request: httpx.Request) -> None:
+    _compress_request(request)
+
+
+def _install_hook(httpx_client: typing.Union[httpx.Client, httpx.AsyncClient], hook: typing.Any) -> None:
+    # The hook does nothing outside of compressed calls, so clients sharing the httpx client are unaffected
+    hooks = httpx_client.event_hooks["request"]
+    if hook not in hooks:
+        hooks.append(hook)
+
+
+class CompressingClient:
+    """
+    Compresses the inference requests of an ``OpenInferenceClient`` according to a ``CompressionPolicy``.
+
+    Every other method of the wrapped client is available unchanged. The client's ``httpx`` client is given a request
+    hook that compresses the bodies of the wrapped calls.
+
+    ---
+    from open_inference.openapi.client import OpenInferenceClient
+    from open_inference.openapi.compression import CompressingClient, CompressionPolicy
+
+    client = CompressingClient(
+        OpenInferenceClient(base_url="https://yourhost.com/path/to/api"),
+        policy=CompressionPolicy("gzip", min_bytes=64 * 1024),
+    )
+    client.model_infer("mlflow-model", request=request)
+    client.policy.stats("mlflow-model").ratio
+    """
+
+    def __init__(self, client: OpenInferenceClient, *, policy: typing.Optional[CompressionPolicy] = None):
+        self._client = client
+        self.policy = CompressionPolicy() if policy is None else policy
+        _install_hook(client._client_wrapper.httpx_client, _compress_request)
+
+    def __getattr__(self, name: str) -> typing.Any:
+        method = getattr(self._client, name)
+        if name not in INFER_METHODS:
+            return method
+        return functools.partial(self._call, method)
+
+    def _call(self, method: typing.Callable[..., typing.Any], *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        token = _policy.set(self.policy)
+        try:
+            return method(*args, **kwargs)
+        finally:
+            _policy.reset(token)
+
+
+class AsyncCompressingClient:
+    """
+    Compresses the inference requests of an ``AsyncOpenInferenceClient`` according to a ``CompressionPolicy``.
+
+    Every other method of the wrapped client is available unchanged.
+    """
+
+    def __init__(self, client: AsyncOpenInferenceClient, *, policy: typing.Optional[CompressionPolicy] = None):
+        self._client = client
+        self.policy = CompressionPolicy() if policy is None else policy
+        _install_hook(client._client_wrapper.httpx_client, _compress_request_async)
+
+    def __getattr__(self, name: str) -> typing.Any:
+        method = getattr(self._client, name)
+        if name not in INFER_METHODS:
+            return method
+        return functools.partial(self._call, method)
+
+    async def _call(
+        self, method: typing.Callable[..., typing.Awaitable[typing.Any]], *args: typing.Any, **kwargs: typing.Any
+    ) -> typing.Any:
+        token = _policy.set(self.policy)
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            _policy.reset(token)
@@ -0,0 +1,105 @@
+# Copyright 2024 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Connection pool options of the clients' ``httpx`` clients.
+
+``build_httpx_client`` creates the ``httpx.Client`` or ``httpx.AsyncClient`` of an ``OpenInferenceClient`` or
+``AsyncOpenInferenceClient`` constructed without one. With ``share_connections``, clients for the same origin and with
+the same options reuse a single ``httpx`` client, and so a single connection pool. Shared ``httpx`` clients stay open
+for the lifetime of the process, and a shared ``httpx.AsyncClient`` must only be used from one event loop.
+
+HTTP/2 requires the ``http2`` extra: ``pip install open-inference-openapi[http2]``.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import typing
+import urllib.parse
+
+import httpx
+
+HttpxClient = typing.TypeVar("HttpxClient", httpx.Client, httpx.AsyncClient)
+
+_shared_clients: typing.Dict[typing.Hashable, typing.Any] = {}
+_shared_clients_lock = threading.Lock()
+
+_PREWARM_PATH = "v2/health/live"
+
+
+def build_httpx_client(
+    client_class: typing.Type[HttpxClient],
+    *,
+    base_url: str,
+    timeout: typing.Optional[float],
+    limits: typing.Optional[httpx.Limits] = None,
+    keepalive_expiry: typing.Optional[float] = None,
+    http2: bool = False,
+    share_connections: bool = False,
+) -> HttpxClient:
+    """
+    Create an ``httpx`` client with the given pool ``limits``, or return the shared one for ``base_url``.
+
+    ``keepalive_expiry`` overrides the expiry of idle connections in ``limits``, and ``http2`` multiplexes concurrent
+    requests over each connection.
+    """
+    if limits is None:
+        limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    if keepalive_expiry is not None:
+        limits = httpx.Limits(
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+
+    if not share_connections:
+        return client_class(timeout=timeout, limits=limits, http2=http2)
+
+    url = httpx.URL(base_url)
+    key = (
+        client_class,
+        url.scheme,
+        url.host,
+        url.port,
+        timeout,
+        limits.max_connections,
+        limits.max_keepalive_connections,
+        limits.keepalive_expiry,
+        http2,
+    )
+    with _shared_clients_lock:
+        client = _shared_clients.get(key)
+        if client is None or client.is_closed:
+            client = _shared_clients[key] = client_class(timeout=timeout, limits=limits, http2=http2)
+        return client
+
+
+def prewarm(httpx_client: httpx.Client, base_url: str, connections: int) -> None:
+    """Open up to ``connections`` connections by sending as many concurrent liveness checks, or none below 1."""
+    if connections < 1:
+        return
+    url = urllib.parse.urljoin(f"{base_url}/", _PREWARM_PATH)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=connections) as executor:
+        for response in executor.map(lambda _: httpx_client.get(url), range(connections)):
+            response.close()
+
+
+async def prewarm_async(httpx_client: httpx.AsyncClient, base_url: str, connections: int) -> None:
+    """Open up to ``connections`` connections by sending as many concurrent liveness checks, or none below 1."""
+    if connections < 1:
+        return
+    url = urllib.parse.urljoin(f"{base_url}/", _PREWARM_PATH)
+    for response in await asyncio.gather(*(httpx_client.get(url) for _ in range(connections))):
+        await response.aclose()
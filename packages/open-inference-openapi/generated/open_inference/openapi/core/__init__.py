@@ -14,12 +14,28 @@
 
 # This file was auto-generated by Fern from our API Definition.
 
-from .api_error import ApiError
-from .client_wrapper import AsyncClientWrapper, BaseClientWrapper, SyncClientWrapper
-from .datetime_utils import serialize_datetime
+import importlib
+import typing
+
 from .jsonable_encoder import jsonable_encoder
 from .remove_none_from_dict import remove_none_from_dict
 
+if typing.TYPE_CHECKING:
+    from .api_error import ApiError
+    from .client_wrapper import AsyncClientWrapper, BaseClientWrapper, SyncClientWrapper
+    from .datetime_utils import serialize_datetime
+
+# Names are imported from their modules when first used (PEP 562), so that importing the package only imports the
+# modules, and builds the models, that are used
+_LAZY_IMPORTS = {
+    "ApiError": ".api_error",
+    "AsyncClientWrapper": ".client_wrapper",
+    "BaseClientWrapper": ".client_wrapper",
+    "SyncClientWrapper": ".client_wrapper",
+    "serialize_datetime": ".datetime_utils",
+}
+_SUBMODULES = frozenset(["api_error", "client_wrapper", "datetime_utils"])
+
 __all__ = [
     "ApiError",
     "AsyncClientWrapper",
@@ -29,3 +45,18 @@ __all__ = [
     "remove_none_from_dict",
     "serialize_datetime",
 ]
+
+
+def __getattr__(name: str) -> typing.Any:
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> typing.List[str]:
+    return sorted({*globals(), *_LAZY_IMPORTS, *_SUBMODULES})
@@ -12,16 +12,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-# This file was auto-generated by Fern from our API Definition.
+# Originally generated by Fern, now maintained by hand: build.py keeps this module in place of the generated one.
 
+import concurrent.futures
 import typing
 
 import httpx
 
+from .serialization import JsonSerializer
+
 
 class BaseClientWrapper:
-    def __init__(self, *, base_url: str):
+    def __init__(self, *, base_url: str, serializer: JsonSerializer):
         self._base_url = base_url
+        self.serializer = serializer
 
     def get_headers(self) -> typing.Dict[str, str]:
         headers: typing.Dict[str, str] = {"X-Fern-Language": "Python"}
@@ -32,12 +36,21 @@ class BaseClientWrapper:
 
 
 class SyncClientWrapper(BaseClientWrapper):
-    def __init__(self, *, base_url: str, httpx_client: httpx.Client):
-        super().__init__(base_url=base_url)
+    def __init__(self, *, base_url: str, httpx_client: httpx.Client, serializer: JsonSerializer):
+        super().__init__(base_url=base_url, serializer=serializer)
         self.httpx_client = httpx_client
 
 
 class AsyncClientWrapper(BaseClientWrapper):
-    def __init__(self, *, base_url: str, httpx_client: httpx.AsyncClient):
-        super().__init__(base_url=base_url)
+    def __init__(
+        self,
+        *,
+        base_url: str,
+        httpx_client: httpx.AsyncClient,
+        serializer: JsonSerializer,
+        codec_executor: typing.Optional[concurrent.futures.Executor] = None,
+    ):
+        super().__init__(base_url=base_url, serializer=serializer)
         self.httpx_client = httpx_client
+        # Encodes request bodies and decodes response bodies off the event loop when set
+        self.codec_executor = codec_executor
@@ -12,7 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-# This file was auto-generated by Fern from our API Definition.
+# Originally generated by Fern, now maintained by hand: build.py keeps this module in place of the generated one.
 
 """
 jsonable_encoder converts a Python object to a JSON-friendly dict
@@ -20,25 +20,29 @@ jsonable_encoder converts a Python object to a JSON-friendly dict
 
 Taken from FastAPI, and made a bit simpler
 https://github.com/tiangolo/fastapi/blob/master/fastapi/encoders.py
+
+Unlike the FastAPI version this walks the object with an explicit stack instead of recursing, resolves how to encode
+each type once and caches it, and passes lists and tuples that only hold primitives through without visiting their
+elements. Tensor data is mostly made of such lists, see benchmarks/bench_jsonable_encoder.py.
 """
 
 import dataclasses
 import datetime as dt
+import functools
 from collections import defaultdict
 from enum import Enum
 from pathlib import PurePath
 from types import GeneratorType
-from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Set, Tuple, Type, Union
 
 try:
     import pydantic.v1 as pydantic  # type: ignore
 except ImportError:
     import pydantic  # type: ignore
 
-from .datetime_utils import serialize_datetime
-
 SetIntStr = Set[Union[int, str]]
 DictIntStrAny = Dict[Union[int, str], Any]
+Encoders = Dict[Any, Callable[[Any], Any]]
 
 
 def generate_encoders_by_class_tuples(
@@ -50,68 +54,197 @@ def generate_encoders_by_class_tuples(
     return encoders_by_class_tuples
 
 
-encoders_by_class_tuples = generate_encoders_by_class_tuples(pydantic.json.ENCODERS_BY_TYPE)
+@functools.lru_cache(maxsize=None)
+def _encoders_by_class_tuples() -> Dict[Callable[[Any], Any], Tuple[Any, ...]]:
+    # Only needed for types without a more specific encoding, so built on first use rather than on import
+    return generate_encoders_by_class_tuples(pydantic.json.ENCODERS_BY_TYPE)
 
 
-def jsonable_encoder(obj: Any, custom_encoder: Optional[Dict[Any, Callable[[Any], Any]]] = None) -> Any:
-    custom_encoder = custom_encoder or {}
-    if custom_encoder:
-        if type(obj) in custom_encoder:
-            return custom_encoder[type(obj)](obj)
-        else:
-            for encoder_type, encoder_instance in custom_encoder.items():
-                if isinstance(obj, encoder_type):
-                    return encoder_instance(obj)
-    if isinstance(obj, pydantic.BaseModel):
-        encoder = getattr(obj.__config__, "json_encoders", {})
-        if custom_encoder:
-            encoder.update(custom_encoder)
-        obj_dict = obj.dict(by_alias=True)
-        if "__root__" in obj_dict:
-            obj_dict = obj_dict["__root__"]
-        return jsonable_encoder(obj_dict, custom_encoder=encoder)
-    if dataclasses.is_dataclass(obj):
-        obj_dict = dataclasses.asdict(obj)
-        return jsonable_encoder(obj_dict, custom_encoder=custom_encoder)
-    if isinstance(obj, Enum):
-        return obj.value
-    if isinstance(obj, PurePath):
-        return str(obj)
-    if isinstance(obj, (str, int, float, type(None))):
-        return obj
-    if isinstance(obj, dt.date):
-        return str(obj)
-    if isinstance(obj, dt.datetime):
-        return serialize_datetime(obj)
-    if isinstance(obj, dict):
-        encoded_dict = {}
-        allowed_keys = set(obj.keys())
-        for key, value in obj.items():
-            if key in allowed_keys:
-                encoded_key = jsonable_encoder(key, custom_encoder=custom_encoder)
-                encoded_value = jsonable_encoder(value, custom_encoder=custom_encoder)
-                encoded_dict[encoded_key] = encoded_value
-        return encoded_dict
-    if isinstance(obj, (list, set, frozenset, GeneratorType, tuple)):
-        encoded_list = []
-        for item in obj:
-            encoded_list.append(jsonable_encoder(item, custom_encoder=custom_encoder))
-        return encoded_list
-
-    if type(obj) in pydantic.json.ENCODERS_BY_TYPE:
-        return pydantic.json.ENCODERS_BY_TYPE[type(obj)](obj)
-    for encoder, classes_tuple in encoders_by_class_tuples.items():
-        if isinstance(obj, classes_tuple):
-            return encoder(obj)
+def __getattr__(name: str) -> Any:
+    if name == "encoders_by_class_tuples":
+        return _encoders_by_class_tuples()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_PRIMITIVE_TYPES: FrozenSet[type] = frozenset({str, int, float, bool, type(None)})
+
+# Models generated into this package, whose dict() defaults to by_alias=True and exclude_unset=True
+_GENERATED_MODELS_PACKAGE = __name__.rsplit(".", 2)[0] + ".types."
+
+# How each type is encoded, in the order the checks are made
+_GENERATED_MODEL = 0
+_MODEL = 1
+_DATACLASS = 2
+_ENUM = 3
+_PATH = 4
+_PRIMITIVE = 5
+_DATE = 6
+_DICT = 7
+_SEQUENCE = 8
+_ENCODER = 9
+_FALLBACK = 10
+
+_dispatch_cache: Dict[type, Tuple[int, Optional[Callable[[Any], Any]]]] = {}
+
+
+def _dispatch(type_: type) -> Tuple[int, Optional[Callable[[Any], Any]]]:
+    if issubclass(type_, pydantic.BaseModel):
+        if type_.__module__.startswith(_GENERATED_MODELS_PACKAGE):
+            return _GENERATED_MODEL, None
+        return _MODEL, None
+    if dataclasses.is_dataclass(type_):
+        return _DATACLASS, None
+    if issubclass(type_, Enum):
+        return _ENUM, None
+    if issubclass(type_, PurePath):
+        return _PATH, None
+    if issubclass(type_, (str, int, float, type(None))):
+        return _PRIMITIVE, None
+    if issubclass(type_, dt.date):
+        # Also matches datetimes, which FastAPI has always encoded with str() as well
+        return _DATE, None
+    if issubclass(type_, dict):
+        return _DICT, None
+    if issubclass(type_, (list, set, frozenset, GeneratorType, tuple)):
+        return _SEQUENCE, None
+    if type_ in pydantic.json.ENCODERS_BY_TYPE:
+        return _ENCODER, pydantic.json.ENCODERS_BY_TYPE[type_]
+    for encoder, classes_tuple in _encoders_by_class_tuples().items():
+        if issubclass(type_, classes_tuple):
+            return _ENCODER, encoder
+    return _FALLBACK, None
+
+
+def _custom_encoder_for(type_: type, custom_encoder: Encoders) -> Optional[Callable[[Any], Any]]:
+    if type_ in custom_encoder:
+        return custom_encoder[type_]
+    for encoder_type, encoder_instance in custom_encoder.items():
+        if issubclass(type_, encoder_type):
+            return encoder_instance
+    return None
 
+
+def _passes_primitives_through(by_type: Dict[type, Optional[Callable[[Any], Any]]], encoders: Encoders) -> bool:
+    for type_ in _PRIMITIVE_TYPES:
+        if type_ not in by_type:
+            by_type[type_] = _custom_encoder_for(type_, encoders)
+        if by_type[type_] is not None:
+            return False
+    return True
+
+
+def _fallback_data(obj: Any) -> Any:
     try:
-        data = dict(obj)
+        return dict(obj)
     except Exception as e:
         errors: List[Exception] = []
         errors.append(e)
         try:
-            data = vars(obj)
+            return vars(obj)
         except Exception as e:
             errors.append(e)
             raise ValueError(errors) from e
-    return jsonable_encoder(data, custom_encoder=custom_encoder)
+
+
+def jsonable_encoder(obj: Any, custom_encoder: Optional[Dict[Any, Callable[[Any], Any]]] = None) -> Any:
+    """
+    Convert ``obj`` into a structure of dicts, lists and primitives that ``json.dumps`` accepts.
+
+    Lists and tuples holding only ``str``, ``int``, ``float``, ``bool`` and ``None`` are returned as they are (tuples
+    as lists) rather than copied, so the result can share those lists with ``obj``.
+    """
+    # Encoders in effect are per subtree, as pydantic models add their own json_encoders
+    custom_encoders_by_type: Dict[int, Dict[type, Optional[Callable[[Any], Any]]]] = {}
+    primitives_passed_through: Dict[int, bool] = {}
+    model_encoders: Dict[Tuple[Type[Any], int], Encoders] = {}
+
+    root: List[Any] = [None]
+    stack: List[Tuple[Any, Encoders, Any, Any]] = [(obj, custom_encoder or {}, root, 0)]
+    while stack:
+        value, encoders, target, key = stack.pop()
+        type_ = type(value)
+
+        passthrough = True
+        if encoders:
+            by_type = custom_encoders_by_type.setdefault(id(encoders), {})
+            if type_ not in by_type:
+                by_type[type_] = _custom_encoder_for(type_, encoders)
+            encoder = by_type[type_]
+            if encoder is not None:
+                target[key] = encoder(value)
+                continue
+            if id(encoders) not in primitives_passed_through:
+                primitives_passed_through[id(encoders)] = _passes_primitives_through(by_type, encoders)
+            passthrough = primitives_passed_through[id(encoders)]
+
+        dispatch = _dispatch_cache.get(type_)
+        if dispatch is None:
+            dispatch = _dispatch_cache[type_] = _dispatch(type_)
+        kind, encoder = dispatch
+
+        if kind == _PRIMITIVE:
+            target[key] = value
+        elif kind == _SEQUENCE:
+            items = value if type_ is list or type_ is tuple else list(value)
+            if not items or (passthrough and set(map(type, items)) <= _PRIMITIVE_TYPES):
+                target[key] = items if type_ is list else list(items)
+            else:
+                encoded_list: List[Any] = [None] * len(items)
+                target[key] = encoded_list
+                # Pushed in reverse so that items are encoded in order
+                for index in range(len(items) - 1, -1, -1):
+                    stack.append((items[index], encoders, encoded_list, index))
+        elif kind == _DICT:
+            encoded_dict: Dict[Any, Any] = {}
+            target[key] = encoded_dict
+            children = []
+            for dict_key, dict_value in value.items():
+                if passthrough and type(dict_key) is str:
+                    encoded_key = dict_key
+                else:
+                    encoded_key = jsonable_encoder(dict_key, custom_encoder=encoders)
+                # Reserve the slot now to keep the key order of the input
+                encoded_dict[encoded_key] = None
+                children.append((dict_value, encoders, encoded_dict, encoded_key))
+            stack.extend(reversed(children))
+        elif kind == _GENERATED_MODEL or kind == _MODEL:
+            cache_key = (type_, id(encoders))
+            merged = model_encoders.get(cache_key)
+            if merged is None:
+                merged = model_encoders[cache_key] = {**getattr(value.__config__, "json_encoders", {}), **encoders}
+            if kind == _GENERATED_MODEL and id(merged) not in primitives_passed_through:
+                primitives_passed_through[id(merged)] = _passes_primitives_through(
+                    custom_encoders_by_type.setdefault(id(merged), {}), merged
+                )
+            if kind == _MODEL or not primitives_passed_through[id(merged)]:
+                obj_dict = value.dict(by_alias=True)
+                if "__root__" in obj_dict:
+                    obj_dict = obj_dict["__root__"]
+                stack.append((obj_dict, merged, target, key))
+            elif value.__custom_root_type__:
+                stack.append((value.__root__, merged, target, key))
+            else:
+                # The same fields as value.dict(), without dict() first copying every nested list element by element
+                encoded_model: Dict[str, Any] = {}
+                target[key] = encoded_model
+                children = []
+                for name, field in value.__fields__.items():
+                    # Fields left out by copy(exclude=...) remain in __fields_set__
+                    if name in value.__fields_set__ and name in value.__dict__:
+                        encoded_model[field.alias] = None
+                        children.append((value.__dict__[name], merged, encoded_model, field.alias))
+                stack.extend(reversed(children))
+        elif kind == _DATACLASS:
+            stack.append((dataclasses.asdict(value), encoders, target, key))
+        elif kind == _ENUM:
+            target[key] = value.value
+        elif kind == _PATH:
+            target[key] = str(value)
+        elif kind == _DATE:
+            target[key] = str(value)
+        elif kind == _ENCODER:
+            target[key] = encoder(value)  # type: ignore
+        else:
+            stack.append((_fallback_data(value), encoders, target, key))
+
+    return root[0]
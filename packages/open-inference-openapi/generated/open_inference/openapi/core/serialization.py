@@ -0,0 +1,101 @@
+# Copyright 2024 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+JSON serializers for inference request and response bodies.
+
+The clients use ``default_serializer()`` unless given one: ``OrjsonSerializer`` when orjson is installed, otherwise
+``JsonSerializer`` on top of the standard library. Subclass ``JsonSerializer`` to plug in another JSON library.
+"""
+
+import json
+import sys
+import typing
+
+from ..tensors import is_array, json_encoders, to_list
+from .jsonable_encoder import jsonable_encoder
+
+
+class JsonSerializer:
+    """Serializes bodies with the standard library ``json`` module."""
+
+    content_type = "application/json"
+
+    def dumps(self, obj: typing.Any) -> bytes:
+        """
+        Encode a request body as compact JSON bytes.
+
+        Tensor data given as NumPy arrays or ``array.array`` objects is converted with one ``tolist`` call per tensor
+        rather than element by element.
+        """
+        return json.dumps(jsonable_encoder(obj, custom_encoder=json_encoders()), separators=(",", ":")).encode("utf-8")
+
+    def loads(self, content: bytes) -> typing.Any:
+        """Decode a response body."""
+        return json.loads(content)
+
+
+class OrjsonSerializer(JsonSerializer):
+    """
+    Serializes bodies with `orjson <https://github.com/ijl/orjson>`_, which writes NumPy arrays natively.
+
+    Non-finite floats are written as ``null``, where the standard library would write ``NaN`` or ``Infinity``.
+    """
+
+    def __init__(self) -> None:
+        import orjson
+
+        self._orjson = orjson
+
+    def dumps(self, obj: typing.Any) -> bytes:
+        encoders = json_encoders()
+        np = sys.modules.get("numpy")
+        if np is not None:
+            # Handed to orjson as-is, flattened to match JsonSerializer
+            encoders[np.ndarray] = _native_flat_array
+        return self._orjson.dumps(
+            jsonable_encoder(obj, custom_encoder=encoders),
+            default=_default,
+            option=self._orjson.OPT_SERIALIZE_NUMPY,
+        )
+
+    def loads(self, content: bytes) -> typing.Any:
+        return self._orjson.loads(content)
+
+    def __reduce__(self) -> typing.Tuple[typing.Any, ...]:
+        # Modules cannot be pickled, so serializers sent to a process pool import orjson again
+        return (type(self), ())
+
+
+def default_serializer() -> JsonSerializer:
+    """Return an ``OrjsonSerializer`` if orjson can be imported, otherwise a ``JsonSerializer``."""
+    try:
+        return OrjsonSerializer()
+    except ImportError:
+        return JsonSerializer()
+
+
+def _native_flat_array(value: typing.Any) -> typing.Any:
+    if value.dtype.kind in ("O", "S", "U", "T"):
+        # orjson would write object arrays of bytes elements, or fail on them, rather than decode them
+        return to_list(value)
+    # orjson only reads C-contiguous arrays in native byte order
+    return value.astype(value.dtype.newbyteorder("="), copy=False).ravel()
+
+
+def _default(value: typing.Any) -> typing.Any:
+    # Arrays of a dtype orjson does not support natively
+    if is_array(value):
+        return to_list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
@@ -14,9 +14,38 @@
 
 # This file was auto-generated by Fern from our API Definition.
 
-from .bad_request_error import BadRequestError
-from .internal_server_error import InternalServerError
-from .not_found_error import NotFoundError
-from .service_unavailable_error import ServiceUnavailableError
+import importlib
+import typing
+
+if typing.TYPE_CHECKING:
+    from .bad_request_error import BadRequestError
+    from .internal_server_error import InternalServerError
+    from .not_found_error import NotFoundError
+    from .service_unavailable_error import ServiceUnavailableError
+
+# Names are imported from their modules when first used (PEP 562), so that importing the package only imports the
+# modules, and builds the models, that are used
+_LAZY_IMPORTS = {
+    "BadRequestError": ".bad_request_error",
+    "InternalServerError": ".internal_server_error",
+    "NotFoundError": ".not_found_error",
+    "ServiceUnavailableError": ".service_unavailable_error",
+}
+_SUBMODULES = frozenset(["bad_request_error", "internal_server_error", "not_found_error", "service_unavailable_error"])
 
 __all__ = ["BadRequestError", "InternalServerError", "NotFoundError", "ServiceUnavailableError"]
+
+
+def __getattr__(name: str) -> typing.Any:
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> typing.List[str]:
+    return sorted({*globals(), *_LAZY_IMPORTS, *_SUBMODULES})
@@ -0,0 +1,278 @@
+# Copyright 2024 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Caching of model metadata, which rarely changes while a model stays loaded.
+
+``MetadataCachingClient`` and ``AsyncMetadataCachingClient`` wrap an ``OpenInferenceClient`` or
+``AsyncOpenInferenceClient``, and answer ``read_model_metadata`` and ``read_model_version_metadata`` from a
+``MetadataCache``. Entries expire after a time to live, the least recently used are evicted beyond the cache size, and
+concurrent misses for the same model share a single request.
+
+The model readiness checks made through the wrappers are recorded, and a model's entries are dropped when its
+readiness changes, as that is when the server loads or unloads it.
+"""
+
+import asyncio
+import collections
+import threading
+import time
+import typing
+from concurrent.futures import Future
+
+from .client import AsyncOpenInferenceClient, OpenInferenceClient
+from .errors.not_found_error import NotFoundError
+from .errors.service_unavailable_error import ServiceUnavailableError
+from .types.metadata_model_response import MetadataModelResponse
+
+T = typing.TypeVar("T")
+Key = typing.Tuple[str, typing.Optional[str]]
+
+
+class MetadataCache:
+    """
+    A time-to-live and least-recently-used cache of model metadata, keyed by model name and version.
+
+    A version of None stands for the version the server picks when none is given. The cache can be shared between
+    clients of the same server, and used from several threads or from coroutines of one event loop.
+    """
+
+    def __init__(
+        self, *, ttl: float = 300.0, maxsize: int = 256, clock: typing.Callable[[], float] = time.monotonic
+    ) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "collections.OrderedDict[Key, typing.Tuple[float, typing.Any]]" = collections.OrderedDict()
+        self._loading: typing.Dict[Key, typing.Any] = {}
+        self._ready: typing.Dict[Key, bool] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, model_name: str, model_version: typing.Optional[str] = None) -> typing.Optional[typing.Any]:
+        """Return the cached metadata of a model, or None if it is missing or expired."""
+        key = (model_name, model_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, model_name: str, model_version: typing.Optional[str], metadata: typing.Any) -> None:
+        with self._lock:
+            self._put((model_name, model_version), metadata)
+
+    def get_or_load(self, model_name: str, model_version: typing.Optional[str], load: typing.Callable[[], T]) -> T:
+        """Return the cached metadata of a model, calling ``load`` on a miss unless another thread already is."""
+        key = (model_name, model_version)
+        cached = self.get(model_name, model_version)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            loading = self._loading.get(key)
+            if loading is None:
+                loading = self._loading[key] = Future()
+                leader = True
+            else:
+                leader = False
+        if not leader:
+            return loading.result()
+
+        try:
+            metadata = load()
+        except BaseException as e:
+            self._finish(key, loading)
+            loading.set_exception(e)
+            raise
+        self._finish(key, loading, metadata)
+        loading.set_result(metadata)
+        return metadata
+
+    async def get_or_load_async(
+        self, model_name: str, model_version: typing.Optional[str], load: typing.Callable[[], typing.Awaitable[T]]
+    ) -> T:
+        """Return the cached metadata of a model, awaiting ``load`` on a miss unless another coroutine already is."""
+        key = (model_name, model_version)
+        cached = self.get(model_name, model_version)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            loading = self._loading.get(key)
+            if loading is None:
+                loading = self._loading[key] = asyncio.get_running_loop().create_future()
+                leader = True
+            else:
+                leader = False
+        if not leader:
+            try:
+                return await asyncio.shield(loading)
+            except asyncio.CancelledError:
+                if not loading.cancelled():
+                    raise
+            # The coroutine loading the metadata was cancelled, rather than this one
+            return await self.get_or_load_async(model_name, model_version, load)
+
+        try:
+            metadata = await load()
+        except asyncio.CancelledError:
+            self._finish(key, loading)
+            loading.cancel()
+            raise
+        except BaseException as e:
+            self._finish(key, loading)
+            loading.set_exception(e)
+            # Marks the exception as retrieved when no other coroutine was waiting for it
+            loading.exception()
+            raise
+        self._finish(key, loading, metadata)
+        loading.set_result(metadata)
+        return metadata
+
+    def record_readiness(self, model_name: str, model_version: typing.Optional[str], ready: bool) -> None:
+        """Record the readiness of a model, and invalidate its entries if it changed since it was last recorded."""
+        key = (model_name, model_version)
+        with self._lock:
+            previous = self._ready.get(key)
+            self._ready[key] = ready
+        if previous is not None and previous != ready:
+            self.invalidate(model_name, model_version)
+
+    def invalidate(self, model_name: str, model_version: typing.Optional[str] = None) -> None:
+        """
+        Drop the entries of a model version, along with the entry of the model's default version.
+
+        Without ``model_version``, drops the entries of every version of the model.
+        """
+        with self._lock:
+            for key in list(self._entries) + list(self._loading):
+                if key[0] == model_name and (model_version is None or key[1] in (model_version, None)):
+                    self._entries.pop(key, None)
+                    # A load in progress no longer fills the cache, and the next miss starts a new one
+                    self._loading.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._loading.clear()
+            self._ready.clear()
+
+    def _put(self, key: Key, metadata: typing.Any) -> None:
+        self._entries[key] = (self._clock() + self.ttl, metadata)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _finish(self, key: Key, loading: typing.Any, metadata: typing.Optional[typing.Any] = None) -> None:
+        with self._lock:
+            if self._loading.get(key) is loading:
+                del self._loading[key]
+                if metadata is not None:
+                    self._put(key, metadata)
+
+
+class MetadataCachingClient:
+    """
+    Answers model metadata requests of an ``OpenInferenceClient`` from a ``MetadataCache``.
+
+    Every other method of the wrapped client is available unchanged.
+
+    ---
+    from open_inference.openapi.client import OpenInferenceClient
+    from open_inference.openapi.metadata_cache import MetadataCache, MetadataCachingClient
+
+    client = MetadataCachingClient(
+        OpenInferenceClient(base_url="https://yourhost.com/path/to/api"),
+        cache=MetadataCache(ttl=60),
+    )
+    """
+
+    def __init__(self, client: OpenInferenceClient, *, cache: typing.Optional[MetadataCache] = None):
+        self._client = client
+        self.cache = MetadataCache() if cache is None else cache
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self._client, name)
+
+    def read_model_metadata(self, model_name: str) -> MetadataModelResponse:
+        return self.cache.get_or_load(model_name, None, lambda: self._client.read_model_metadata(model_name))
+
+    def read_model_version_metadata(self, model_name: str, model_version: str) -> MetadataModelResponse:
+        return self.cache.get_or_load(
+            model_name, model_version, lambda: self._client.read_model_version_metadata(model_name, model_version)
+        )
+
+    def check_model_readiness(self, model_name: str) -> None:
+        try:
+            self._client.check_model_readiness(model_name)
+        except (NotFoundError, ServiceUnavailableError):
+            self.cache.record_readiness(model_name, None, False)
+            raise
+        self.cache.record_readiness(model_name, None, True)
+
+    def check_model_version_readiness(self, model_name: str, model_version: str) -> None:
+        try:
+            self._client.check_model_version_readiness(model_name, model_version)
+        except (NotFoundError, ServiceUnavailableError):
+            self.cache.record_readiness(model_name, model_version, False)
+            raise
+        self.cache.record_readiness(model_name, model_version, True)
+
+
+class AsyncMetadataCachingClient:
+    """
+    Answers model metadata requests of an ``AsyncOpenInferenceClient`` from a ``MetadataCache``.
+
+    Every other method of the wrapped client is available unchanged.
+    """
+
+    def __init__(self, client: AsyncOpenInferenceClient, *, cache: typing.Optional[MetadataCache] = None):
+        self._client = client
+        self.cache = MetadataCache() if cache is None else cache
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self._client, name)
+
+    async def read_model_metadata(self, model_name: str) -> MetadataModelResponse:
+        return await self.cache.get_or_load_async(
+            model_name, None, lambda: self._client.read_model_metadata(model_name)
+        )
+
+    async def read_model_version_metadata(self, model_name: str, model_version: str) -> MetadataModelResponse:
+        return await self.cache.get_or_load_async(
+            model_name, model_version, lambda: self._client.read_model_version_metadata(model_name, model_version)
+        )
+
+    async def check_model_readiness(self, model_name: str) -> None:
+        try:
+            await self._client.check_model_readiness(model_name)
+        except (NotFoundError, ServiceUnavailableError):
+            self.cache.record_readiness(model_name, None, False)
+            raise
+        self.cache.record_readiness(model_name, None, True)
+
+    async def check_model_version_readiness(self, model_name: str, model_version: str) -> None:
+        try:
+            await self._client.check_model_version_readiness(model_name, model_version)
+        except (NotFoundError, ServiceUnavailableError):
+            self.cache.record_readiness(model_name, model_version, False)
+            raise
+        self.cache.record_readiness(model_name, model_version, True)
@@ -0,0 +1,358 @@
+# Copyright 2024 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Latency-aware routing of requests over replicas of a model server, with optional request hedging.
+
+``ReplicaClient`` and ``AsyncReplicaClient`` take an ``OpenInferenceClient`` or ``AsyncOpenInferenceClient`` for each
+of several servers serving the same models, and can be used in place of one. They track an exponentially weighted
+moving average (EWMA) of the latency of each replica, and send every request to the better of two replicas picked at
+random, weighing their latency by their requests in flight (power of two choices). The latency of a replica left
+idle decays, so that a replica once slow is tried again. Replicas that fail
+``check_server_readiness`` in ``check_readiness``, or whose requests fail to connect or as unavailable, are left out
+until they are found ready again.
+
+With ``hedge_quantile``, an ``AsyncReplicaClient`` sends a ``model_infer`` or ``model_version_infer`` request still
+unanswered after that quantile of recent inference latencies again to a second replica. The first response wins, and
+the other request is cancelled. ``ReplicaClient`` does not hedge, as a blocking ``httpx`` request cannot be cancelled.
+"""
+
+import asyncio
+import collections
+import random
+import threading
+import time
+import typing
+
+import httpx
+
+from .bulk import Rows, bulk_infer
+from .client import AsyncOpenInferenceClient, OpenInferenceClient
+from .errors.service_unavailable_error import ServiceUnavailableError
+from .types.inference_request import InferenceRequest
+from .types.inference_response import InferenceResponse
+from .types.parameters import Parameters
+
+# Requests sent again to a second replica when hedging
+HEDGED_METHODS = frozenset({"model_infer", "model_version_infer"})
+# Hedging starts once this many latencies are known
+_MIN_HEDGE_SAMPLES = 20
+# Latencies kept to estimate the hedging delay, and how often it is estimated again
+_HEDGE_WINDOW = 512
+_HEDGE_REFRESH = 16
+# Seconds over which the latency of a replica left idle counts half as much, so that a replica once slow is tried again
+_IDLE_HALF_LIFE = 5.0
+
+
+class ReplicaStats(typing.NamedTuple):
+    """State of one replica of a ``ReplicaClient``."""
+
+    base_url: str
+    ready: bool
+    #: Moving average of the latency of the replica's requests in seconds, or None before its first request
+    latency: typing.Optional[float]
+    #: Number of requests in flight on the replica
+    outstanding: int
+
+
+class _Replica:
+    def __init__(self, client: typing.Any):
+        self.client = client
+        self.base_url = client._client_wrapper.get_base_url()
+        self.latency: typing.Optional[float] = None
+        self.updated = 0.0
+        self.outstanding = 0
+        self.ready = True
+
+    def cost(self, now: float) -> float:
+        # Replicas without a known latency are tried first
+        if self.latency is None:
+            return 0.0
+        return self.latency * 0.5 ** ((now - self.updated) / _IDLE_HALF_LIFE) * (self.outstanding + 1)
+
+
+class _ReplicaClientBase:
+    def __init__(self, clients: typing.Sequence[typing.Any], *, alpha: float, hedge_quantile: typing.Optional[float]):
+        if not clients:
+            raise ValueError("At least one client is required")
+        if not 0 < alpha <= 1:
+            raise ValueError(f"alpha must be in (0, 1], got {alpha}")
+        if hedge_quantile is not None and not 0 < hedge_quantile < 1:
+            raise ValueError(f"hedge_quantile must be in (0, 1), got {hedge_quantile}")
+        self.alpha = alpha
+        self.hedge_quantile = hedge_quantile
+        self.replicas = [_Replica(client) for client in clients]
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self._latencies: typing.Deque[float] = collections.deque(maxlen=_HEDGE_WINDOW)
+        self._hedge_delay: typing.Optional[float] = None
+        self._since_estimate = 0
+
+    @property
+    def stats(self) -> typing.List[ReplicaStats]:
+        with self._lock:
+            return [
+                ReplicaStats(replica.base_url, replica.ready, replica.latency, replica.outstanding)
+                for replica in self.replicas
+            ]
+
+    @property
+    def hedge_delay(self) -> typing.Optional[float]:
+        """Seconds after which a hedged request is sent to a second replica, or None while it is not hedged."""
+        return self._hedge_delay if self.hedge_quantile is not None else None
+
+    def __getattr__(self, name: str) -> typing.Any:
+        if name.startswith("_"):
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        # Any other method is called on one replica, without tracking its latency
+        replica = self._acquire()
+        self._release(replica, name, None)
+        return getattr(replica.client, name)
+
+    def _acquire(self, exclude: typing.Optional[_Replica] = None) -> _Replica:
+        """Pick the cheaper of two random ready replicas, or of all replicas if none is ready, and count a request."""
+        with self._lock:
+            candidates = [replica for replica in self.replicas if replica.ready and replica is not exclude]
+            if not candidates:
+                candidates = [replica for replica in self.replicas if replica is not exclude] or self.replicas
+            # Sampled even when there are only two, so that ties, such as between replicas without a latency yet, are
+            # broken at random rather than in favour of the first replica
+            candidates = self._random.sample(candidates, min(len(candidates), 2))
+            now = time.monotonic()
+            replica = min(candidates, key=lambda candidate: (candidate.cost(now), candidate.outstanding))
+            replica.outstanding += 1
+            return replica
+
+    def _release(self, replica: _Replica, name: str, latency: typing.Optional[float]) -> None:
+        """Count a request off ``replica``, recording the ``latency`` of a successful one or None for a failed one."""
+        with self._lock:
+            replica.outstanding -= 1
+            if latency is None:
+                return
+            replica.latency = (
+                latency if replica.latency is None else replica.latency + self.alpha * (latency - replica.latency)
+            )
+            replica.updated = time.monotonic()
+            if name in HEDGED_METHODS and self.hedge_quantile is not None:
+                self._latencies.append(latency)
+                self._since_estimate += 1
+                if self._since_estimate >= _HEDGE_REFRESH and len(self._latencies) >= _MIN_HEDGE_SAMPLES:
+                    ordered = sorted(self._latencies)
+                    self._hedge_delay = ordered[int(self.hedge_quantile * (len(ordered) - 1))]
+                    self._since_estimate = 0
+
+    def _release_cancelled(self, replica: _Replica, elapsed: float) -> None:
+        """Count a cancelled request off ``replica``, such as the loser of a hedge, whose latency was at least ``elapsed``.
+
+        Without it, a replica slow enough to always lose would never get a latency, and be picked first every time.
+        """
+        with self._lock:
+            replica.outstanding -= 1
+            replica.latency = elapsed if replica.latency is None else max(replica.latency, elapsed)
+            replica.updated = time.monotonic()
+
+    def _fail(self, replica: _Replica, error: BaseException) -> None:
+        if isinstance(error, (httpx.TransportError, ServiceUnavailableError)):
+            with self._lock:
+                replica.ready = False
+
+    def _set_ready(self, replica: _Replica, ready: bool) -> None:
+        with self._lock:
+            replica.ready = ready
+
+
+class ReplicaClient(_ReplicaClientBase):
+    """
+    Routes requests over replicas, each with its ``OpenInferenceClient``, picking each request's replica by latency
+    and load.
+
+    ``alpha`` is the weight of each new latency in the moving averages. The client has the methods of
+    ``OpenInferenceClient``.
+
+    ---
+    from open_inference.openapi.client import OpenInferenceClient
+    from open_inference.openapi.replicas import ReplicaClient
+
+    client = ReplicaClient(
+        [OpenInferenceClient(base_url=f"http://replica-{index}:8000") for index in range(6)],
+    )
+    client.check_readiness()
+    """
+
+    def __init__(self, clients: typing.Sequence[OpenInferenceClient], *, alpha: float = 0.3):
+        super().__init__(clients, alpha=alpha, hedge_quantile=None)
+
+    def check_readiness(self) -> typing.List[bool]:
+        """Check the readiness of every replica, routing requests only to the ready ones, and return their readiness."""
+        readiness = []
+        for replica in self.replicas:
+            try:
+                replica.client.check_server_readiness()
+                ready = True
+            except Exception:
+                ready = False
+            self._set_ready(replica, ready)
+            readiness.append(ready)
+        return readiness
+
+    def model_infer(
+        self, model_name: str, *, request: InferenceRequest, binary_data: bool = False
+    ) -> InferenceResponse:
+        return self._call("model_infer", model_name, request=request, binary_data=binary_data)
+
+    def model_version_infer(
+        self, model_name: str, model_version: str, *, request: InferenceRequest, binary_data: bool = False
+    ) -> InferenceResponse:
+        return self._call("model_version_infer", model_name, model_version, request=request, binary_data=binary_data)
+
+    def _call(self, name: str, *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        replica = self._acquire()
+        start = time.perf_counter()
+        try:
+            response = getattr(replica.client, name)(*args, **kwargs)
+        except BaseException as e:
+            self._release(replica, name, None)
+            self._fail(replica, e)
+            raise
+        self._release(replica, name, time.perf_counter() - start)
+        return response
+
+
+class AsyncReplicaClient(_ReplicaClientBase):
+    """
+    Routes requests over replicas, each with its ``AsyncOpenInferenceClient``, picking each request's replica by
+    latency and load.
+
+    ``alpha`` is the weight of each new latency in the moving averages. With ``hedge_quantile``, such as 0.95,
+    inference requests unanswered after that quantile of recent latencies are hedged to a second replica. The client
+    has the methods of ``AsyncOpenInferenceClient``, and ``bulk_infer`` spreads its requests over the replicas.
+
+    ---
+    from open_inference.openapi.client import AsyncOpenInferenceClient
+    from open_inference.openapi.replicas import AsyncReplicaClient
+
+    client = AsyncReplicaClient(
+        [AsyncOpenInferenceClient(base_url=f"http://replica-{index}:8000") for index in range(6)],
+        hedge_quantile=0.95,
+    )
+    await client.check_readiness()
+    """
+
+    def __init__(
+        self,
+        clients: typing.Sequence[AsyncOpenInferenceClient],
+        *,
+        alpha: float = 0.3,
+        hedge_quantile: typing.Optional[float] = None,
+    ):
+        super().__init__(clients, alpha=alpha, hedge_quantile=hedge_quantile)
+
+    async def check_readiness(self) -> typing.List[bool]:
+        """Check the readiness of every replica, routing requests only to the ready ones, and return their readiness."""
+
+        async def check(replica: _Replica) -> bool:
+            try:
+                await replica.client.check_server_readiness()
+                ready = True
+            except Exception:
+                ready = False
+            self._set_ready(replica, ready)
+            return ready
+
+        return list(await asyncio.gather(*(check(replica) for replica in self.replicas)))
+
+    async def model_infer(
+        self, model_name: str, *, request: InferenceRequest, binary_data: bool = False
+    ) -> InferenceResponse:
+        return await self._infer("model_infer", (model_name,), {"request": request, "binary_data": binary_data})
+
+    async def model_version_infer(
+        self, model_name: str, model_version: str, *, request: InferenceRequest, binary_data: bool = False
+    ) -> InferenceResponse:
+        return await self._infer(
+            "model_version_infer", (model_name, model_version), {"request": request, "binary_data": binary_data}
+        )
+
+    def bulk_infer(
+        self,
+        model_name: str,
+        rows: Rows,
+        *,
+        model_version: typing.Optional[str] = None,
+        concurrency: int = 4,
+        batch_size: int = 1,
+        ordered: bool = True,
+        outputs: typing.Optional[typing.Iterable[str]] = None,
+        parameters: typing.Optional[Parameters] = None,
+        binary_data: bool = False,
+    ) -> typing.AsyncIterator[typing.Tuple[int, InferenceResponse]]:
+        return bulk_infer(
+            self,  # type: ignore
+            model_name,
+            rows,
+            model_version=model_version,
+            concurrency=concurrency,
+            batch_size=batch_size,
+            ordered=ordered,
+            outputs=outputs,
+            parameters=parameters,
+            binary_data=binary_data,
+        )
+
+    async def _infer(
+        self, name: str, args: typing.Tuple[typing.Any, ...], kwargs: typing.Dict[str, typing.Any]
+    ) -> typing.Any:
+        if self.hedge_delay is None or len(self.replicas) < 2:
+            return await self._call(self._acquire(), name, args, kwargs)
+
+        loop = asyncio.get_running_loop()
+        first = self._acquire()
+        tasks = {loop.create_task(self._call(first, name, args, kwargs))}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+            if not done:
+                tasks.add(loop.create_task(self._call(self._acquire(exclude=first), name, args, kwargs)))
+                done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                if pending and _first_success(done) is None:
+                    # The other request may still succeed
+                    done, _ = await asyncio.wait(tasks)
+            winner = _first_success(done)
+            # Raises the error of a failed request when none succeeded
+            return (winner or next(iter(done))).result()
+        finally:
+            for task in tasks:
+                if not task.cancel() and not task.cancelled():
+                    # Retrieves the error of the losing request, which asyncio would log
+                    task.exception()
+
+    async def _call(
+        self, replica: _Replica, name: str, args: typing.Tuple[typing.Any, ...], kwargs: typing.Dict[str, typing.Any]
+    ) -> typing.Any:
+        start = time.perf_counter()
+        try:
+            response = await getattr(replica.client, name)(*args, **kwargs)
+        except asyncio.CancelledError:
+            self._release_cancelled(replica, time.perf_counter() - start)
+            raise
+        except BaseException as e:
+            self._release(replica, name, None)
+            self._fail(replica, e)
+            raise
+        self._release(replica, name, time.perf_counter() - start)
+        return response
+
+
+def _first_success(tasks: typing.Iterable["asyncio.Task[typing.Any]"]) -> typing.Optional["asyncio.Task[typing.Any]"]:
+    """Return the first of the finished ``tasks`` that succeeded, or None if all of them failed."""
+    return next((task for task in tasks if not task.cancelled() and task.exception() is None), None)
@@ -0,0 +1,336 @@
+# Copyright 2024 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Caching of inference responses for deterministic models, keyed by the content of their requests.
+
+``ResponseCachingClient`` and ``AsyncResponseCachingClient`` wrap an ``OpenInferenceClient`` or
+``AsyncOpenInferenceClient``, and answer ``model_infer`` and ``model_version_infer`` from a ``ResponseCache`` when the
+same model and version were already sent the same inputs, parameters and requested outputs. Input data given as NumPy
+arrays or ``array.array`` objects is hashed in place, without converting or copying it. Entries optionally expire after
+a time to live, and the least recently used are evicted beyond a budget of bytes.
+
+Only models whose outputs depend on nothing but their inputs should be cached. Cached responses are shared between
+callers, and must not be modified.
+"""
+
+import array
+import collections
+import functools
+import hashlib
+import json
+import math
+import struct
+import threading
+import time
+import typing
+
+from .client import AsyncOpenInferenceClient, OpenInferenceClient
+from .tensors import is_array
+from .types.inference_request import InferenceRequest
+from .types.inference_response import InferenceResponse
+from .types.tensor_data import TensorData
+
+Key = typing.Tuple[str, typing.Optional[str], bool, bytes]
+
+_LENGTH_PREFIX = struct.Struct("<Q")
+
+
+class CacheStats(typing.NamedTuple):
+    """Counters of a ``ResponseCache``."""
+
+    hits: int
+    misses: int
+    #: Number of entries evicted to stay within the byte budget, or expired
+    evictions: int
+    entries: int
+    #: Estimated size of the tensor data of the cached responses
+    nbytes: int
+
+
+class ResponseCache:
+    """
+    A least-recently-used cache of inference responses, bounded by the estimated size of their tensor data.
+
+    Entries expire ``ttl`` seconds after they are stored, or never when it is None. Responses larger than ``max_bytes``
+    are not cached. ``hasher`` creates the ``hashlib``-like object that digests requests, and can be swapped for a
+    faster non-cryptographic hash such as ``xxhash.xxh3_128``. The cache can be shared between clients of the same
+    server, and used from several threads or from coroutines of one event loop.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: typing.Optional[float] = None,
+        hasher: typing.Callable[[], typing.Any] = functools.partial(hashlib.blake2b, digest_size=16),
+        clock: typing.Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hasher = hasher
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "collections.OrderedDict[Key, typing.Tuple[float, int, InferenceResponse]]" = (
+            collections.OrderedDict()
+        )
+        self._nbytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._evictions, len(self._entries), self._nbytes)
+
+    def key(
+        self,
+        model_name: str,
+        model_version: typing.Optional[str],
+        request: InferenceRequest,
+        binary_data: bool = False,
+    ) -> typing.Optional[Key]:
+        """
+        Return the key of ``request``, or None if its outputs cannot be cached.
+
+        Requests with tensors in shared memory are not cached, as their contents are not in the request.
+        """
+        if any(
+            tensor.parameters is not None and "shared_memory_region" in tensor.parameters
+            for tensor in (*request.inputs, *(request.outputs or ()))
+        ):
+            return None
+
+        digest = self.hasher()
+        _update(digest, _dumps([request.parameters, [output.dict() for output in request.outputs or ()]]))
+        for tensor in request.inputs:
+            _update(digest, _dumps([tensor.name, tensor.shape, tensor.datatype, tensor.parameters]))
+            data = tensor.data.__root__
+            if isinstance(data, array.array):
+                _update(digest, data.typecode.encode("ascii"))
+                _update(digest, memoryview(data))
+            elif is_array(data):
+                import numpy as np
+
+                ndarray = typing.cast(typing.Any, data)
+                _update(digest, ndarray.dtype.str.encode("ascii"))
+                # Only copies arrays that are not already C-contiguous
+                _update(digest, np.ascontiguousarray(ndarray).data.cast("B"))
+            else:
+                _update(digest, _dumps(data))
+        return model_name, model_version, binary_data, digest.digest()
+
+    def get(self, key: Key) -> typing.Optional[InferenceResponse]:
+        """Return the cached response for ``key``, or None if it is missing or expired, counting a hit or a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                self._remove(key)
+                self._evictions += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[2]
+
+    def put(self, key: Key, response: InferenceResponse) -> None:
+        size = _response_size(response)
+        if size > self.max_bytes:
+            return
+        expires = float("inf") if self.ttl is None else self._clock() + self.ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires, size, response)
+            self._nbytes += size
+            while self._nbytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def invalidate(self, model_name: str, model_version: typing.Optional[str] = None) -> None:
+        """Drop the entries of a model version, or of every version of the model without ``model_version``."""
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] == model_name and model_version in (None, key[1]):
+                    self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def _remove(self, key: Key) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._nbytes -= size
+
+
+def _update(digest: typing.Any, data: typing.Any) -> None:
+    # Length-prefixed, so that consecutive fields cannot run into each other
+    digest.update(_LENGTH_PREFIX.pack(len(data) if isinstance(data, bytes) else data.nbytes))
+    digest.update(data)
+
+
+def _dumps(value: typing.Any) -> bytes:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+def _json_default(value: typing.Any) -> typing.Any:
+    if isinstance(value, TensorData):
+        return value.__root__
+    return str(value)
+
+
+def _response_size(response: InferenceResponse) -> int:
+    size = 0
+    for output in response.outputs:
+        data = output.data.__root__
+        if isinstance(data, array.array):
+            size += data.itemsize * len(data)
+        elif is_array(data):
+            size += typing.cast(typing.Any, data).nbytes
+        else:
+            # A reference to a Python scalar per element
+            size += 8 * math.prod(output.shape)
+    return size
+
+
+def _with_id(response: InferenceResponse, request_id: typing.Optional[str]) -> InferenceResponse:
+    """Return ``response`` answering a request of ``request_id``, copying it if it answered another one."""
+    if response.id == request_id:
+        return response
+    return response.copy(update={"id": request_id})
+
+
+class ResponseCachingClient:
+    """
+    Answers inference requests of an ``OpenInferenceClient`` from a ``ResponseCache``.
+
+    ``models`` names the models whose responses are cached, or None to cache every model called through the client. A
+    hit is returned as cached, unless the request has another id, in which case a shallow copy carries the request's id.
+    Every other method of the wrapped client is available unchanged.
+
+    ---
+    from open_inference.openapi.client import OpenInferenceClient
+    from open_inference.openapi.response_cache import ResponseCachingClient
+
+    client = ResponseCachingClient(
+        OpenInferenceClient(base_url="https://yourhost.com/path/to/api"),
+        models={"mlflow-model"},
+    )
+    """
+
+    def __init__(
+        self,
+        client: OpenInferenceClient,
+        *,
+        cache: typing.Optional[ResponseCache] = None,
+        models: typing.Optional[typing.Collection[str]] = None,
+    ):
+        self._client = client
+        self.cache = ResponseCache() if cache is None else cache
+        self.models = None if models is None else frozenset(models)
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self._client, name)
+
+    def model_infer(
+        self, model_name: str, *, request: InferenceRequest, binary_data: bool = False
+    ) -> InferenceResponse:
+        return self._infer(model_name, None, request, binary_data)
+
+    def model_version_infer(
+        self, model_name: str, model_version: str, *, request: InferenceRequest, binary_data: bool = False
+    ) -> InferenceResponse:
+        return self._infer(model_name, model_version, request, binary_data)
+
+    def _infer(
+        self, model_name: str, model_version: typing.Optional[str], request: InferenceRequest, binary_data: bool
+    ) -> InferenceResponse:
+        key = None
+        if self.models is None or model_name in self.models:
+            key = self.cache.key(model_name, model_version, request, binary_data)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return _with_id(cached, request.id)
+
+        if model_version is None:
+            response = self._client.model_infer(model_name, request=request, binary_data=binary_data)
+        else:
+            response = self._client.model_version_infer(
+                model_name, model_version, request=request, binary_data=binary_data
+            )
+        if key is not None:
+            self.cache.put(key, response)
+        return response
+
+
+class AsyncResponseCachingClient:
+    """
+    Answers inference requests of an ``AsyncOpenInferenceClient`` from a ``ResponseCache``.
+
+    ``models`` names the models whose responses are cached, or None to cache every model called through the client.
+    Every other method of the wrapped client is available unchanged.
+    """
+
+    def __init__(
+        self,
+        client: AsyncOpenInferenceClient,
+        *,
+        cache: typing.Optional[ResponseCache] = None,
+        models: typing.Optional[typing.Collection[str]] = None,
+    ):
+        self._client = client
+        self.cache = ResponseCache() if cache is None else cache
+        self.models = None if models is None else frozenset(models)
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self._client, name)
+
+    async def model_infer(
+        self, model_name: str, *, request: InferenceRequest, binary_data: bool = False
+    ) -> InferenceResponse:
+        return await self._infer(model_name, None, request, binary_data)
+
+    async def model_version_infer(
+        self, model_name: str, model_version: str, *, request: InferenceRequest, binary_data: bool = False
+    ) -> InferenceResponse:
+        return await self._infer(model_name, model_version, request, binary_data)
+
+    async def _infer(
+        self, model_name: str, model_version: typing.Optional[str], request: InferenceRequest, binary_data: bool
+    ) -> InferenceResponse:
+        key = None
+        if self.models is None or model_name in self.models:
+            key = self.cache.key(model_name, model_version, request, binary_data)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return _with_id(cached, request.id)
+
+        if model_version is None:
+            response = await self._client.model_infer(model_name, request=request, binary_data=binary_data)
+        else:
+            response = await self._client.model_version_infer(
+                model_name, model_version, request=request, binary_data=binary_data
+            )
+        if key is not None:
+            self.cache.put(key, response)
+        return response
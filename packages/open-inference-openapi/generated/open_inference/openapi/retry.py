@@ -0,0 +1,271 @@
+# Copyright 2024 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Retries of failed requests, with exponential backoff, a deadline budget and retry throttling.
+
+``RetryingClient`` and ``AsyncRetryingClient`` wrap an ``OpenInferenceClient`` or ``AsyncOpenInferenceClient``, and
+retry the requests of a ``RetryPolicy``'s methods that fail to reach the server, or that it answers with one of the
+policy's status codes. By default only the health and metadata requests, which are idempotent, are retried, and only
+on transport errors and ``ServiceUnavailableError``.
+
+Attempts are spaced by exponential backoff with full jitter. The policy's ``deadline`` bounds all the attempts and
+backoffs of a request together: each attempt is sent with what remains of it as its connect, read, write and pool
+timeouts. A ``RetryThrottle`` shared by the requests stops retrying while most of them fail, so that retries do not add
+to the load of a server that is already failing.
+"""
+
+import asyncio
+import contextvars
+import functools
+import random
+import threading
+import time
+import typing
+
+import httpx
+
+from .client import AsyncOpenInferenceClient, OpenInferenceClient
+from .core.api_error import ApiError
+
+#: The methods retried by default, which have no side effects on the server
+IDEMPOTENT_METHODS = frozenset(
+    {
+        "check_server_liveness",
+        "check_server_readiness",
+        "check_model_readiness",
+        "check_model_version_readiness",
+        "read_server_metadata",
+        "read_model_metadata",
+        "read_model_version_metadata",
+    }
+)
+#: The status codes retried by default, raised as ``ServiceUnavailableError``
+RETRYABLE_STATUS_CODES = frozenset({503})
+
+# When the current request must be answered by, on the clock of time.monotonic
+_deadline: "contextvars.ContextVar[typing.Optional[float]]" = contextvars.ContextVar(
+    "open_inference_deadline", default=None
+)
+
+
+class RetryThrottle:
+    """
+    A token bucket that allows retries while fewer than about ``token_ratio`` of the requests fail.
+
+    Each retryable failure takes a token, and each success gives back ``token_ratio`` of one, up to ``max_tokens``.
+    Retries are allowed while more than half of ``max_tokens`` are left, as in gRPC's retry throttling. A throttle can be
+    shared between clients of the same server, and used from several threads.
+    """
+
+    def __init__(self, max_tokens: float = 10.0, token_ratio: float = 0.1):
+        self.max_tokens = max_tokens
+        self.token_ratio = token_ratio
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+    def allow_retry(self) -> bool:
+        return self._tokens > self.max_tokens / 2
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._tokens = max(self._tokens - 1, 0.0)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._tokens = min(self._tokens + self.token_ratio, self.max_tokens)
+
+
+class RetryPolicy:
+    """
+    Which requests are retried, how many times, and how long to wait between attempts.
+
+    A request is sent at most ``max_attempts`` times. The n-th retry waits for a random time between 0 and
+    ``initial_backoff * multiplier ** (n - 1)`` seconds, capped at ``max_backoff``. ``deadline`` is the time budget of
+    each request, or None to keep the client's timeouts. ``methods`` names the client methods retried, and
+    ``status_codes`` the error statuses they are retried on, besides transport errors such as refused connections and
+    timeouts. Add 500 to retry ``InternalServerError``. The policy, and its ``throttle``, can be shared between clients.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_attempts: int = 4,
+        initial_backoff: float = 0.05,
+        max_backoff: float = 2.0,
+        multiplier: float = 2.0,
+        deadline: typing.Optional[float] = None,
+        methods: typing.Collection[str] = IDEMPOTENT_METHODS,
+        status_codes: typing.Collection[int] = RETRYABLE_STATUS_CODES,
+        throttle: typing.Optional[RetryThrottle] = None,
+    ):
+        if max_attempts < 1:
+            raise ValueError(f"max_attempts must be at least 1, not {max_attempts}")
+        self.max_attempts = max_attempts
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.multiplier = multiplier
+        self.deadline = deadline
+        self.methods = frozenset(methods)
+        self.status_codes = frozenset(status_codes)
+        self.throttle = RetryThrottle() if throttle is None else throttle
+
+    def backoff(self, retry: int) -> float:
+        """
+        Return a random wait before the ``retry``-th retry, counting from 1.
+        """
+        return random.uniform(0, min(self.initial_backoff * self.multiplier ** (retry - 1), self.max_backoff))
+
+    def is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, httpx.TransportError):
+            return True
+        return isinstance(error, ApiError) and error.status_code in self.status_codes
+
+    def _retry_delay(self, error: Exception, attempts: int, deadline: typing.Optional[float]) -> typing.Optional[float]:
+        """
+        Return how long to wait before retrying a request that failed with ``error``, or None to raise it.
+        """
+        if not self.is_retryable(error):
+            return None
+        self.throttle.record_failure()
+        if attempts >= self.max_attempts or not self.throttle.allow_retry():
+            return None
+        delay = self.backoff(attempts)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+
+def _bound_timeouts(request: httpx.Request) -> None:
+    """
+    Lower the timeouts of ``request`` to what remains of the deadline of the retried call sending it, if any.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return
+    remaining = max(deadline - time.monotonic(), 0.0)
+    timeouts = request.extensions.get("timeout") or dict.fromkeys(("connect", "read", "write", "pool"))
+    request.extensions["timeout"] = {
+        phase: remaining if timeout is None else min(timeout, remaining) for phase, timeout in timeouts.items()
+    }
+
+
+async def _bound_timeouts_async(request: httpx.Request) -> None:
+    _bound_timeouts(request)
+
+
+def _install_hook(httpx_client: typing.Union[httpx.Client, httpx.AsyncClient], hook: typing.Any) -> None:
+    # The hook does nothing outside of retried calls, so clients sharing the httpx client are unaffected
+    hooks = httpx_client.event_hooks["request"]
+    if hook not in hooks:
+        hooks.append(hook)
+
+
+class RetryingClient:
+    """
+    Retries failed requests of an ``OpenInferenceClient`` according to a ``RetryPolicy``.
+
+    The policy's methods take the same arguments as the client's, and raise the error of their last attempt. Every
+    other method of the wrapped client is available unchanged. The client's ``httpx`` client is given a request hook
+    that applies the deadline of retried requests.
+
+    ---
+    from open_inference.openapi.client import OpenInferenceClient
+    from open_inference.openapi.retry import RetryingClient, RetryPolicy
+
+    client = RetryingClient(
+        OpenInferenceClient(base_url="https://yourhost.com/path/to/api"),
+        policy=RetryPolicy(deadline=5.0),
+    )
+    client.check_model_readiness("mlflow-model")
+    """
+
+    def __init__(self, client: OpenInferenceClient, *, policy: typing.Optional[RetryPolicy] = None):
+        self._client = client
+        self.policy = RetryPolicy() if policy is None else policy
+        _install_hook(client._client_wrapper.httpx_client, _bound_timeouts)
+
+    def __getattr__(self, name: str) -> typing.Any:
+        method = getattr(self._client, name)
+        if name not in self.policy.methods:
+            return method
+        return functools.partial(self._call, method)
+
+    def _call(self, method: typing.Callable[..., typing.Any], *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        policy = self.policy
+        deadline = None if policy.deadline is None else time.monotonic() + policy.deadline
+        token = _deadline.set(deadline)
+        try:
+            attempts = 0
+            while True:
+                attempts += 1
+                try:
+                    response = method(*args, **kwargs)
+                except Exception as e:
+                    delay = policy._retry_delay(e, attempts, deadline)
+                    if delay is None:
+                        raise
+                    time.sleep(delay)
+                    continue
+                policy.throttle.record_success()
+                return response
+        finally:
+            _deadline.reset(token)
+
+
+class AsyncRetryingClient:
+    """
+    Retries failed requests of an ``AsyncOpenInferenceClient`` according to a ``RetryPolicy``.
+
+    The policy's methods are coroutines taking the same arguments as the client's. Every other method of the wrapped
+    client is available unchanged.
+    """
+
+    def __init__(self, client: AsyncOpenInferenceClient, *, policy: typing.Optional[RetryPolicy] = None):
+        self._client = client
+        self.policy = RetryPolicy() if policy is None else policy
+        _install_hook(client._client_wrapper.httpx_client, _bound_timeouts_async)
+
+    def __getattr__(self, name: str) -> typing.Any:
+        method = getattr(self._client, name)
+        if name not in self.policy.methods:
+            return method
+        return functools.partial(self._call, method)
+
+    async def _call(
+        self, method: typing.Callable[..., typing.Awaitable[typing.Any]], *args: typing.Any, **kwargs: typing.Any
+    ) -> typing.Any:
+        policy = self.policy
+        deadline = None if policy.deadline is None else time.monotonic() + policy.deadline
+        token = _deadline.set(deadline)
+        try:
+            attempts = 0
+            while True:
+                attempts += 1
+                try:
+                    response = await method(*args, **kwargs)
+                except Exception as e:
+                    delay = policy._retry_delay(e, attempts, deadline)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+                    continue
+                policy.throttle.record_success()
+                return response
+        finally:
+            _deadline.reset(token)
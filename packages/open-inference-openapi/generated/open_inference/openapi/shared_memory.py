@@ -0,0 +1,247 @@
+# Copyright 2024 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Tensors passed through system shared memory, as implemented by KServe and Triton.
+
+A ``SharedMemoryRegion`` is created by the client and registered with a server running on the same host, through the
+``v2/systemsharedmemory`` endpoints. Inputs are written into the region and refer to it through their
+``shared_memory_region``, ``shared_memory_offset`` and ``shared_memory_byte_size`` parameters instead of their data,
+and requested outputs with these parameters are written into the region by the server instead of the response. Tensors
+then never go through HTTP, which only carries their description.
+
+Outputs written to shared memory have empty ``data`` in the response, and are read with ``read_output``, which
+returns NumPy arrays and so requires NumPy.
+"""
+
+import typing
+import urllib.parse
+import uuid
+from json.decoder import JSONDecodeError
+from multiprocessing import shared_memory
+
+import httpx
+
+from .binary_data import tensor_to_buffer
+from .core.api_error import ApiError
+from .tensors import DATATYPES, check_array, is_array
+from .types.parameters import Parameters
+from .types.request_input import RequestInput
+from .types.request_output import RequestOutput
+from .types.response_output import ResponseOutput
+
+if typing.TYPE_CHECKING:
+    from .client import AsyncOpenInferenceClient, OpenInferenceClient
+
+REGION_PARAMETER = "shared_memory_region"
+OFFSET_PARAMETER = "shared_memory_offset"
+BYTE_SIZE_PARAMETER = "shared_memory_byte_size"
+
+
+class SharedMemoryRegion:
+    """
+    A region of system shared memory of ``byte_size`` bytes, registered with servers under ``name``.
+
+    The underlying memory object is created with ``key``, a name unique to the host that defaults to a random one, and
+    is removed on ``close``. Tensors are laid out in the region by the caller, at the offsets passed to ``input`` and
+    ``output``. Arrays read from the region are views of its memory, which must be released or copied before the region
+    is closed.
+
+    ---
+    from open_inference.openapi.client import OpenInferenceClient
+    from open_inference.openapi.shared_memory import SharedMemoryRegion
+    from open_inference.openapi.types import InferenceRequest
+
+    client = OpenInferenceClient(base_url="http://localhost:8000")
+    with SharedMemoryRegion("iris-data", 1024) as region:
+        region.register(client)
+        response = client.model_infer(
+            "iris-model",
+            request=InferenceRequest(
+                inputs=[region.input("input-0", [5.3, 3.7, 1.5, 0.2], datatype="FP32", shape=[1, 4])],
+                outputs=[region.output("output-0", offset=16, byte_size=8)],
+            ),
+        )
+        scores = region.read_output(response.outputs[0], offset=16).copy()
+        region.unregister(client)
+    """
+
+    def __init__(self, name: str, byte_size: int, *, key: typing.Optional[str] = None):
+        if byte_size < 1:
+            raise ValueError(f"byte_size must be at least 1, got {byte_size}")
+        self.name = name
+        self.byte_size = byte_size
+        self._memory = shared_memory.SharedMemory(
+            name=(key or f"oip-{uuid.uuid4().hex}").lstrip("/"), create=True, size=byte_size
+        )
+        #: Key of the underlying memory object, as servers open it
+        self.key = "/" + self._memory.name.lstrip("/")
+
+    @property
+    def buf(self) -> memoryview:
+        """The memory of the region."""
+        return typing.cast(memoryview, self._memory.buf)[: self.byte_size]
+
+    def write(self, data: typing.Any, datatype: str, offset: int = 0) -> int:
+        """
+        Write ``data`` at ``offset`` as little-endian data of ``datatype``, returning the number of bytes written.
+
+        ``data`` is a NumPy array, an ``array.array`` or a list, which NumPy converts. Only fixed-size datatypes that
+        NumPy represents can be written, so not ``BYTES`` or ``BF16``.
+        """
+        _check_datatype(datatype)
+        buffer = tensor_to_buffer(data, datatype)
+        byte_size = len(buffer)
+        self._check_range(offset, byte_size)
+        self.buf[offset : offset + byte_size] = buffer
+        return byte_size
+
+    def read(self, datatype: str, shape: typing.Sequence[int], offset: int = 0) -> typing.Any:
+        """Return a NumPy array viewing the tensor of ``datatype`` and ``shape`` at ``offset``, without copying it."""
+        import numpy as np
+
+        _check_datatype(datatype)
+        kind, itemsize = DATATYPES[datatype]
+        dtype = np.dtype(f"<{kind}{itemsize}")
+        self._check_range(offset, itemsize * int(np.prod(shape, dtype=np.int64)))
+        return np.ndarray(tuple(shape), dtype=dtype, buffer=self._memory.buf, offset=offset)
+
+    def input(
+        self,
+        name: str,
+        data: typing.Any,
+        *,
+        datatype: str,
+        shape: typing.Optional[typing.List[int]] = None,
+        offset: int = 0,
+        parameters: typing.Optional[Parameters] = None,
+    ) -> RequestInput:
+        """
+        Write ``data`` at ``offset`` and return the input ``name`` pointing at it.
+
+        ``shape`` defaults to the shape of a NumPy array, or to the length of an ``array.array`` or flat list.
+        """
+        _check_datatype(datatype)
+        if shape is None:
+            shape = list(data.shape) if is_array(data) and hasattr(data, "shape") else [len(data)]
+        if is_array(data):
+            check_array(data, datatype, shape)
+        byte_size = self.write(data, datatype, offset)
+        # Constructed without data, which requests then leave out
+        return RequestInput.construct(
+            name=name,
+            shape=list(shape),
+            datatype=datatype,
+            parameters={**(parameters or {}), **self._parameters(offset, byte_size)},
+        )
+
+    def output(
+        self,
+        name: str,
+        *,
+        offset: int = 0,
+        byte_size: typing.Optional[int] = None,
+        parameters: typing.Optional[Parameters] = None,
+    ) -> RequestOutput:
+        """
+        Return the requested output ``name``, to be written at ``offset`` in at most ``byte_size`` bytes.
+
+        ``byte_size`` defaults to the rest of the region.
+        """
+        if byte_size is None:
+            byte_size = self.byte_size - offset
+        self._check_range(offset, byte_size)
+        return RequestOutput(name=name, parameters={**(parameters or {}), **self._parameters(offset, byte_size)})
+
+    def read_output(self, output: ResponseOutput, offset: int = 0) -> typing.Any:
+        """Return a NumPy array viewing ``output`` of a response, written at the ``offset`` given to ``output``."""
+        return self.read(output.datatype, output.shape, offset)
+
+    def register(self, client: "OpenInferenceClient") -> None:
+        """Register the region with the server of ``client``."""
+        wrapper = client._client_wrapper
+        _raise_for_status(
+            wrapper.httpx_client.post(
+                self._url(wrapper.get_base_url(), "register"),
+                json={"key": self.key, "offset": 0, "byte_size": self.byte_size},
+                headers=wrapper.get_headers(),
+            )
+        )
+
+    async def register_async(self, client: "AsyncOpenInferenceClient") -> None:
+        """Register the region with the server of ``client``."""
+        wrapper = client._client_wrapper
+        _raise_for_status(
+            await wrapper.httpx_client.post(
+                self._url(wrapper.get_base_url(), "register"),
+                json={"key": self.key, "offset": 0, "byte_size": self.byte_size},
+                headers=wrapper.get_headers(),
+            )
+        )
+
+    def unregister(self, client: "OpenInferenceClient") -> None:
+        """Unregister the region from the server of ``client``."""
+        wrapper = client._client_wrapper
+        _raise_for_status(
+            wrapper.httpx_client.post(self._url(wrapper.get_base_url(), "unregister"), headers=wrapper.get_headers())
+        )
+
+    async def unregister_async(self, client: "AsyncOpenInferenceClient") -> None:
+        """Unregister the region from the server of ``client``."""
+        wrapper = client._client_wrapper
+        _raise_for_status(
+            await wrapper.httpx_client.post(
+                self._url(wrapper.get_base_url(), "unregister"), headers=wrapper.get_headers()
+            )
+        )
+
+    def close(self) -> None:
+        """Remove the underlying memory object and unmap the region."""
+        self._memory.unlink()
+        self._memory.close()
+
+    def __enter__(self) -> "SharedMemoryRegion":
+        return self
+
+    def __exit__(self, *args: typing.Any) -> None:
+        self.close()
+
+    def _url(self, base_url: str, action: str) -> str:
+        return urllib.parse.urljoin(
+            f"{base_url}/", f"v2/systemsharedmemory/region/{urllib.parse.quote(self.name, safe='')}/{action}"
+        )
+
+    def _parameters(self, offset: int, byte_size: int) -> typing.Dict[str, typing.Any]:
+        return {REGION_PARAMETER: self.name, OFFSET_PARAMETER: offset, BYTE_SIZE_PARAMETER: byte_size}
+
+    def _check_range(self, offset: int, byte_size: int) -> None:
+        if offset < 0 or byte_size < 0 or offset + byte_size > self.byte_size:
+            raise ValueError(f"{byte_size} bytes at offset {offset} do not fit in a region of {self.byte_size} bytes")
+
+
+def _check_datatype(datatype: str) -> None:
+    if datatype not in DATATYPES:
+        raise ValueError(
+            f"Only fixed-size datatypes that NumPy represents can go through shared memory, not {datatype}"
+        )
+
+
+def _raise_for_status(response: httpx.Response) -> None:
+    if 200 <= response.status_code < 300:
+        return
+    try:
+        body = response.json()
+    except JSONDecodeError:
+        body = response.text
+    raise ApiError(status_code=response.status_code, body=body)
@@ -0,0 +1,179 @@
+# Copyright 2024 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Helpers for passing tensor data as NumPy arrays or ``array.array`` objects instead of nested lists.
+
+NumPy is not a dependency of this package. It is only looked up when an array is passed in, at which point it has
+necessarily been imported already.
+"""
+
+import array
+import math
+import sys
+import typing
+
+# Element kind and itemsize accepted for each datatype, using the same kind codes as numpy.dtype.kind
+DATATYPES: typing.Dict[str, typing.Tuple[str, int]] = {
+    "BOOL": ("b", 1),
+    "UINT8": ("u", 1),
+    "UINT16": ("u", 2),
+    "UINT32": ("u", 4),
+    "UINT64": ("u", 8),
+    "INT8": ("i", 1),
+    "INT16": ("i", 2),
+    "INT32": ("i", 4),
+    "INT64": ("i", 8),
+    "FP16": ("f", 2),
+    "FP32": ("f", 4),
+    "FP64": ("f", 8),
+}
+
+_ARRAY_TYPECODE_KINDS = {
+    "b": "i",
+    "h": "i",
+    "i": "i",
+    "l": "i",
+    "q": "i",
+    "B": "u",
+    "H": "u",
+    "I": "u",
+    "L": "u",
+    "Q": "u",
+    "f": "f",
+    "d": "f",
+}
+
+_BYTES_KINDS = ("O", "S", "U", "T")
+
+# Half-precision datatypes that FP32 and FP64 arrays are down-cast to, when a model declares them
+HALF_PRECISION_DATATYPES = frozenset({"FP16", "BF16"})
+
+
+def is_array(value: typing.Any) -> bool:
+    """Whether ``value`` is an ``array.array`` or a NumPy ``ndarray``."""
+    if isinstance(value, array.array):
+        return True
+    np = sys.modules.get("numpy")
+    return np is not None and isinstance(value, np.ndarray)
+
+
+def check_array(
+    value: typing.Any, datatype: typing.Optional[str], shape: typing.Optional[typing.Sequence[int]]
+) -> None:
+    """Raise ``ValueError`` unless the array ``value`` can hold a tensor of ``datatype`` and ``shape``."""
+    if isinstance(value, array.array):
+        kind, itemsize, size = _ARRAY_TYPECODE_KINDS.get(value.typecode), value.itemsize, len(value)
+    else:
+        kind, itemsize, size = value.dtype.kind, value.dtype.itemsize, value.size
+
+    if datatype == "BYTES":
+        if kind not in _BYTES_KINDS:
+            raise ValueError(f"Array of kind {kind!r} cannot hold BYTES data")
+    elif datatype == "BF16":
+        # Float arrays are rounded to BF16 when they are sent
+        if kind != "f" and getattr(value, "dtype", None) != "bfloat16":
+            raise ValueError(f"Array of kind {kind!r} cannot hold BF16 data")
+    elif datatype is not None and DATATYPES.get(datatype) != (kind, itemsize):
+        raise ValueError(f"Array of kind {kind!r} and itemsize {itemsize} cannot hold {datatype} data")
+
+    if shape is not None and size != math.prod(shape):
+        raise ValueError(f"Array of {size} elements cannot fill shape {list(shape)}")
+
+
+def flat_list(value: typing.Any) -> typing.List[typing.Any]:
+    """Flatten an array into a list of Python scalars, in row-major order."""
+    if isinstance(value, array.array):
+        return value.tolist()
+    return value.ravel().tolist()
+
+
+def to_list(value: typing.Any) -> typing.List[typing.Any]:
+    """
+    Flatten an array into a list of JSON values, in row-major order.
+
+    JSON has no bytes, so the ``bytes`` elements of object and fixed-width bytes arrays are decoded from UTF-8, as
+    pydantic does for lists of ``bytes``.
+    """
+    items = flat_list(value)
+    if not isinstance(value, array.array) and value.dtype.kind in ("O", "S"):
+        return [item.decode("utf-8") if isinstance(item, bytes) else item for item in items]
+    return items
+
+
+def json_encoders() -> typing.Dict[typing.Any, typing.Callable[[typing.Any], typing.Any]]:
+    """Encoders for ``jsonable_encoder`` that convert arrays with a single ``tolist`` call."""
+    encoders: typing.Dict[typing.Any, typing.Callable[[typing.Any], typing.Any]] = {array.array: to_list}
+    np = sys.modules.get("numpy")
+    if np is not None:
+        encoders[np.ndarray] = to_list
+    return encoders
+
+
+def as_array(tensor: typing.Any) -> typing.Any:
+    """
+    Return the data of a ``RequestInput`` or ``ResponseOutput`` as a NumPy array of its datatype and shape.
+
+    Requires NumPy to be installed.
+    """
+    import numpy as np
+
+    data = tensor.data.__root__
+    if not is_array(data) and any(hasattr(item, "__root__") for item in data[:1]):
+        # Nested lists were validated into nested TensorData models
+        data = tensor.data.dict()["__root__"]
+
+    if tensor.datatype == "BYTES":
+        dtype = np.dtype(object)
+    elif tensor.datatype == "BF16":
+        dtype = np.dtype(np.float32)
+    else:
+        kind, itemsize = DATATYPES[tensor.datatype]
+        dtype = np.dtype(f"<{kind}{itemsize}")
+    return np.asarray(data, dtype=dtype).reshape(tensor.shape)
+
+
+def to_bfloat16(value: typing.Any) -> typing.Any:
+    """
+    Return the ``BF16`` bit patterns of a float array as a NumPy array of ``<u2`` integers, rounding to the nearest
+    even.
+
+    Requires NumPy to be installed.
+    """
+    import numpy as np
+
+    value = np.asarray(value)
+    if value.dtype.name == "bfloat16":
+        return value.view(np.uint16).astype("<u2", copy=False)
+    bits = np.asarray(value, dtype=np.float32).view(np.uint32)
+    # Adds half of the dropped 16 bits, minus one when the kept bits are even, so that ties round to even
+    rounded = ((bits + (0x7FFF + ((bits >> 16) & 1))) >> 16).astype("<u2")
+    nan = np.isnan(value)
+    if nan.any():
+        # Rounding could carry a NaN's payload into infinity, keep it quiet instead
+        rounded[nan] = ((bits[nan] >> 16) | 0x0040).astype("<u2")
+    return rounded
+
+
+def from_bfloat16(bits: typing.Any) -> typing.Any:
+    """
+    Return the ``float32`` values of ``BF16`` bit patterns, given as 16-bit unsigned integers or a buffer of them.
+
+    Requires NumPy to be installed.
+    """
+    import numpy as np
+
+    if not isinstance(bits, np.ndarray):
+        bits = np.frombuffer(bits, dtype="<u2")
+    return (bits.astype(np.uint32) << 16).view(np.float32)
@@ -0,0 +1,287 @@
+# Copyright 2024 The Open Inference Protocol Working Group
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A local inference server to test clients against.
+
+``FakeInferenceServer`` serves models given as Python functions from input arrays to output arrays, as an ``httpx``
+transport handler, so that clients reach it without a network. It takes and returns tensors as JSON, with the binary
+tensor data extension, or in registered regions of system shared memory, and accepts inference requests compressed
+with gzip or deflate, or with zstd when ``compression.zstd`` or ``zstandard`` is available. It is meant for tests, not
+for serving models, and requires NumPy.
+"""
+
+import gzip
+import json
+import re
+import sys
+import threading
+import typing
+import urllib.parse
+import zlib
+from multiprocessing import shared_memory
+
+import httpx
+
+from .binary_data import BINARY_CONTENT_TYPE, HEADER_CONTENT_LENGTH, tensor_from_buffer, tensor_to_buffer
+from .shared_memory import BYTE_SIZE_PARAMETER, OFFSET_PARAMETER, REGION_PARAMETER
+from .tensors import DATATYPES
+
+Model = typing.Callable[[typing.Dict[str, typing.Any]], typing.Mapping[str, typing.Any]]
+
+_INFER_PATH = re.compile(r"/v2/models/(?P<model_name>[^/]+)(?:/versions/(?P<model_version>[^/]+))?/infer$")
+_REGION_PATH = re.compile(r"/v2/systemsharedmemory(?:/region/(?P<name>[^/]+))?/(?P<action>register|unregister|status)$")
+_HEALTH_PATH = re.compile(r"/v2/health/(?:live|ready)$")
+
+
+class _InferError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+class _Region(typing.NamedTuple):
+    key: str
+    offset: int
+    byte_size: int
+    memory: shared_memory.SharedMemory
+
+
+class FakeInferenceServer:
+    """
+    Serves ``models``, each called with the inputs of a request as NumPy arrays and returning its outputs as arrays.
+
+    Only the outputs named by a request are returned, or all of them when it names none.
+
+    ---
+    import httpx
+    from open_inference.openapi.client import OpenInferenceClient
+    from open_inference.openapi.testing import FakeInferenceServer
+
+    server = FakeInferenceServer({"add-one": lambda inputs: {"output-0": inputs["input-0"] + 1}})
+    client = OpenInferenceClient(
+        base_url="http://testserver",
+        httpx_client=httpx.Client(transport=httpx.MockTransport(server)),
+    )
+    """
+
+    def __init__(self, models: typing.Mapping[str, Model]):
+        self.models = dict(models)
+        self._regions: typing.Dict[str, _Region] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        try:
+            match = _INFER_PATH.search(path)
+            if match is not None and request.method == "POST":
+                return self._infer(urllib.parse.unquote(match.group("model_name")), request)
+            match = _REGION_PATH.search(path)
+            if match is not None:
+                name = urllib.parse.unquote(match.group("name") or "")
+                return self._shared_memory(match.group("action"), name, request)
+            if _HEALTH_PATH.search(path) is not None:
+                return httpx.Response(200)
+            raise _InferError(404, f"No route for {request.method} {path}")
+        except _InferError as e:
+            return httpx.Response(e.status_code, json={"error": e.message})
+
+    def _shared_memory(self, action: str, name: str, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            if action == "status":
+                if name and name not in self._regions:
+                    raise _InferError(404, f"Unable to find system shared memory region: '{name}'")
+                return httpx.Response(
+                    200,
+                    json=[
+                        {"name": region_name, "key": region.key, "offset": region.offset, "byte_size": region.byte_size}
+                        for region_name, region in self._regions.items()
+                        if name in ("", region_name)
+                    ],
+                )
+            if action == "unregister":
+                for region_name in [name] if name else list(self._regions):
+                    region = self._regions.pop(region_name, None)
+                    if region is not None:
+                        region.memory.close()
+                return httpx.Response(200)
+
+            if not name:
+                raise _InferError(400, "A region name is required to register shared memory")
+            if name in self._regions:
+                raise _InferError(400, f"Shared memory region '{name}' is already registered")
+            body = json.loads(request.content)
+            key, offset, byte_size = body["key"], body.get("offset", 0), body["byte_size"]
+            try:
+                memory = _attach(key)
+            except OSError as e:
+                raise _InferError(400, f"Unable to open shared memory '{key}': {e}") from None
+            if offset + byte_size > memory.size:
+                memory.close()
+                raise _InferError(
+                    400, f"Shared memory '{key}' of {memory.size} bytes has no {byte_size} bytes at offset {offset}"
+                )
+            self._regions[name] = _Region(key, offset, byte_size, memory)
+            return httpx.Response(200)
+
+    def _infer(self, model_name: str, request: httpx.Request) -> httpx.Response:
+        import numpy as np
+
+        model = self.models.get(model_name)
+        if model is None:
+            raise _InferError(404, f"Model {model_name!r} is not served")
+
+        header_length = request.headers.get(HEADER_CONTENT_LENGTH)
+        content = _decoded_content(request)
+        body = json.loads(content if header_length is None else content[: int(header_length)])
+        view = memoryview(content)
+        binary_offset = len(view) if header_length is None else int(header_length)
+
+        inputs = {}
+        for tensor in body["inputs"]:
+            parameters = tensor.get("parameters") or {}
+            datatype, shape = tensor["datatype"], tensor["shape"]
+            if REGION_PARAMETER in parameters:
+                inputs[tensor["name"]] = self._region_view(parameters, datatype, shape).copy()
+            elif "binary_data_size" in parameters:
+                size = parameters["binary_data_size"]
+                inputs[tensor["name"]] = tensor_from_buffer(view[binary_offset : binary_offset + size], datatype, shape)
+                binary_offset += size
+            elif datatype == "BYTES":
+                inputs[tensor["name"]] = np.array(tensor["data"], dtype=object).reshape(shape)
+            elif datatype == "BF16":
+                inputs[tensor["name"]] = np.asarray(tensor["data"], dtype=np.float32).reshape(shape)
+            else:
+                inputs[tensor["name"]] = np.asarray(tensor["data"], dtype=_dtype(datatype)).reshape(shape)
+
+        arrays = {name: np.asarray(array) for name, array in model(inputs).items()}
+        binary_output = bool((body.get("parameters") or {}).get("binary_data_output", False))
+        requested = {output["name"]: output.get("parameters") or {} for output in body.get("outputs") or ()}
+        outputs, buffers = [], []
+        for name, parameters in (requested or dict.fromkeys(arrays, {})).items():
+            if name not in arrays:
+                raise _InferError(400, f"Model {model_name!r} has no output {name!r}")
+            array = arrays[name]
+            datatype = _datatype(array)
+            output: typing.Dict[str, typing.Any] = {"name": name, "datatype": datatype, "shape": list(array.shape)}
+            if REGION_PARAMETER in parameters:
+                if array.nbytes > parameters.get(BYTE_SIZE_PARAMETER, 0):
+                    raise _InferError(
+                        400,
+                        f"Output {name!r} of {array.nbytes} bytes does not fit in"
+                        f" {parameters.get(BYTE_SIZE_PARAMETER, 0)} bytes of shared memory",
+                    )
+                self._region_view(parameters, datatype, array.shape)[...] = array
+                output["parameters"] = {
+                    parameter: parameters[parameter]
+                    for parameter in (REGION_PARAMETER, OFFSET_PARAMETER, BYTE_SIZE_PARAMETER)
+                    if parameter in parameters
+                }
+            elif parameters.get("binary_data", binary_output):
+                buffer = bytes(tensor_to_buffer(array, datatype))
+                buffers.append(buffer)
+                output["parameters"] = {"binary_data_size": len(buffer)}
+            elif datatype == "BYTES":
+                output["data"] = [item.decode("utf-8") if isinstance(item, bytes) else item for item in array.ravel()]
+            elif datatype == "BF16":
+                output["data"] = array.astype(np.float32).ravel().tolist()
+            else:
+                output["data"] = array.ravel().tolist()
+            outputs.append(output)
+
+        response: typing.Dict[str, typing.Any] = {"model_name": model_name, "outputs": outputs}
+        if "id" in body:
+            response["id"] = body["id"]
+        header = json.dumps(response).encode("utf-8")
+        if not buffers:
+            return httpx.Response(200, content=header, headers={"Content-Type": "application/json"})
+        return httpx.Response(
+            200,
+            content=b"".join([header, *buffers]),
+            headers={"Content-Type": BINARY_CONTENT_TYPE, HEADER_CONTENT_LENGTH: str(len(header))},
+        )
+
+    def _region_view(
+        self, parameters: typing.Dict[str, typing.Any], datatype: str, shape: typing.Sequence[int]
+    ) -> typing.Any:
+        import numpy as np
+
+        name = parameters[REGION_PARAMETER]
+        with self._lock:
+            region = self._regions.get(name)
+        if region is None:
+            raise _InferError(400, f"Shared memory region {name!r} is not registered")
+        if datatype not in DATATYPES:
+            raise _InferError(400, f"Datatype {datatype} cannot go through shared memory region {name!r}")
+        offset = parameters.get(OFFSET_PARAMETER, 0)
+        dtype = _dtype(datatype)
+        byte_size = dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+        if offset + byte_size > region.byte_size:
+            raise _InferError(400, f"{byte_size} bytes at offset {offset} do not fit in shared memory region {name!r}")
+        return np.ndarray(tuple(shape), dtype=dtype, buffer=region.memory.buf, offset=region.offset + offset)
+
+
+def _decoded_content(request: httpx.Request) -> bytes:
+    encoding = request.headers.get("Content-Encoding", "identity")
+    if encoding == "gzip":
+        return gzip.decompress(request.content)
+    if encoding == "deflate":
+        return zlib.decompress(request.content)
+    if encoding == "zstd":
+        return _zstd_decompress(request.content)
+    if encoding != "identity":
+        raise _InferError(415, f"Content-Encoding {encoding!r} is not supported")
+    return request.content
+
+
+def _zstd_decompress(content: bytes) -> bytes:
+    try:
+        from compression import zstd  # type: ignore
+
+        return zstd.decompress(content)
+    except ImportError:
+        pass
+    try:
+        import zstandard  # type: ignore
+    except ImportError:
+        raise _InferError(415, "Content-Encoding 'zstd' requires the zstandard package") from None
+    return zstandard.ZstdDecompressor().decompress(content)
+
+
+def _dtype(datatype: str) -> typing.Any:
+    import numpy as np
+
+    if datatype not in DATATYPES:
+        raise _InferError(400, f"Datatype {datatype!r} is not supported")
+    kind, itemsize = DATATYPES[datatype]
+    return np.dtype(f"<{kind}{itemsize}")
+
+
+def _datatype(array: typing.Any) -> str:
+    if array.dtype.kind in ("O", "S", "U", "T"):
+        return "BYTES"
+    if array.dtype.name == "bfloat16":
+        return "BF16"
+    for datatype, (kind, itemsize) in DATATYPES.items():
+        if (kind, itemsize) == (array.dtype.kind, array.dtype.itemsize):
+            return datatype
+    raise _InferError(500, f"Output arrays of {array.dtype} have no datatype")
+
+
+def _attach(key: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        # The memory object belongs to the client, which removes it
+        return shared_memory.SharedMemory(name=key.lstrip("/"), track=False)
+    return shared_memory.SharedMemory(name=key.lstrip("/"))
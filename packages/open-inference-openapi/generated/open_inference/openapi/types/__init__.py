@@ -14,19 +14,58 @@
 
 # This file was auto-generated by Fern from our API Definition.
 
-from .inference_error_response import InferenceErrorResponse
-from .inference_request import InferenceRequest
-from .inference_response import InferenceResponse
-from .metadata_model_error_response import MetadataModelErrorResponse
-from .metadata_model_response import MetadataModelResponse
-from .metadata_server_error_response import MetadataServerErrorResponse
-from .metadata_server_response import MetadataServerResponse
-from .metadata_tensor import MetadataTensor
-from .parameters import Parameters
-from .request_input import RequestInput
-from .request_output import RequestOutput
-from .response_output import ResponseOutput
-from .tensor_data import TensorData
+import importlib
+import typing
+
+if typing.TYPE_CHECKING:
+    from .inference_error_response import InferenceErrorResponse
+    from .inference_request import InferenceRequest
+    from .inference_response import InferenceResponse
+    from .metadata_model_error_response import MetadataModelErrorResponse
+    from .metadata_model_response import MetadataModelResponse
+    from .metadata_server_error_response import MetadataServerErrorResponse
+    from .metadata_server_response import MetadataServerResponse
+    from .metadata_tensor import MetadataTensor
+    from .parameters import Parameters
+    from .request_input import RequestInput
+    from .request_output import RequestOutput
+    from .response_output import ResponseOutput
+    from .tensor_data import TensorData
+
+# Names are imported from their modules when first used (PEP 562), so that importing the package only imports the
+# modules, and builds the models, that are used
+_LAZY_IMPORTS = {
+    "InferenceErrorResponse": ".inference_error_response",
+    "InferenceRequest": ".inference_request",
+    "InferenceResponse": ".inference_response",
+    "MetadataModelErrorResponse": ".metadata_model_error_response",
+    "MetadataModelResponse": ".metadata_model_response",
+    "MetadataServerErrorResponse": ".metadata_server_error_response",
+    "MetadataServerResponse": ".metadata_server_response",
+    "MetadataTensor": ".metadata_tensor",
+    "Parameters": ".parameters",
+    "RequestInput": ".request_input",
+    "RequestOutput": ".request_output",
+    "ResponseOutput": ".response_output",
+    "TensorData": ".tensor_data",
+}
+_SUBMODULES = frozenset(
+    [
+        "inference_error_response",
+        "inference_request",
+        "inference_response",
+        "metadata_model_error_response",
+        "metadata_model_response",
+        "metadata_server_error_response",
+        "metadata_server_response",
+        "metadata_tensor",
+        "parameters",
+        "request_input",
+        "request_output",
+        "response_output",
+        "tensor_data",
+    ]
+)
 
 __all__ = [
     "InferenceErrorResponse",
@@ -43,3 +82,18 @@ __all__ = [
     "ResponseOutput",
     "TensorData",
 ]
+
+
+def __getattr__(name: str) -> typing.Any:
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> typing.List[str]:
+    return sorted({*globals(), *_LAZY_IMPORTS, *_SUBMODULES})
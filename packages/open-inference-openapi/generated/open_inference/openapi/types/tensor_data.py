@@ -16,6 +16,8 @@
 from __future__ import annotations
 import typing
 
+from ..tensors import check_array, is_array
+
 try:
     import pydantic.v1 as pydantic  # type: ignore
 except ImportError:
@@ -23,4 +25,30 @@ except ImportError:
 
 
 class TensorData(pydantic.BaseModel):
+    """
+    Tensor data as a (nested) list of values, or as a NumPy array or ``array.array`` holding the tensor in
+    row-major order.
+
+    Arrays are only checked against the datatype and shape of the enclosing tensor, and flat lists of a
+    single scalar type are converted in bulk; neither goes through per-element validation.
+    """
+
     __root__: typing.List[typing.Union[TensorData, float, str, bool]]
+
+    @classmethod
+    def __get_validators__(cls) -> typing.Generator[typing.Callable[..., typing.Any], None, None]:
+        yield cls.validate_tensor
+
+    @classmethod
+    def validate_tensor(cls, value: typing.Any, values: typing.Dict[str, typing.Any]) -> TensorData:
+        if is_array(value):
+            check_array(value, values.get("datatype"), values.get("shape"))
+            return cls.construct(__root__=value)
+        if type(value) is list and value:
+            first = type(value[0])
+            if first in (float, str) and all(type(item) is first for item in value):
+                return cls.construct(__root__=value)
+            if first in (int, bool) and all(type(item) in (int, bool) for item in value):
+                # Matches the coercion of integers and booleans through the float member of the union
+                return cls.construct(__root__=list(map(float, value)))
+        return cls.validate(value)